@@ -1,183 +1,419 @@
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from rolling_state import IndicatorStateCache
+import kernels
+import metrics
+from data_access import load_prices, load_investor_trends, load_fundamentals, sorted_key_join, NET_BUY_COLUMNS
+import price_cube
+
+# 파동 단계 판정 임계값 (analyze_stock / score_stocks 공용)
+WAVE_THRESHOLDS = {
+    # 1. 2단계 중기 (Strong Uptrend)
+    'strong_pos_min': 0.6,
+    'strong_pos_max': 0.9,
+    'strong_vol_mult': 1.3,
+    'strong_rsi_min': 55,
+    'strong_rsi_max': 75,
+    'strong_return_min': 10,
+    # 2. 2단계 초기 (Early Uptrend)
+    'early_pos_min': 0.4,
+    'early_pos_max': 0.75,
+    'early_vol_mult': 1.2,
+    # 3. 1단계 -> 2단계 전환 (Transition)
+    'transition_ma_gap': 0.05,
+    'transition_pos_min': 0.25,
+    'transition_pos_max': 0.6,
+    'transition_rsi_min': 45,
+    'transition_rsi_max': 65,
+    # 4. 일반 상승 추세 (General Uptrend)
+    'general_pos_min': 0.3,
+    'general_pos_max': 0.7,
+}
+
+# 단계 번호별 기본 점수와 단계명 (classify_wave_stages 의 반환값 기준)
+WAVE_STAGE_SCORES = np.array([0, 90, 80, 70, 60, 40])
+WAVE_STAGE_LABELS = np.array(["Insufficient Data", "Strong Uptrend", "Early Uptrend",
+                              "Transition", "General Uptrend", "Weak/Downtrend"], dtype=object)
+
+def evaluate_wave_stages(df, thresholds=None):
+    """
+    파동 단계 조건을 컬럼 단위 불리언 마스크로 평가합니다.
+    :return: (기본 점수 배열, 단계명 배열)
+    """
+    stage_idx = classify_wave_stages(df, thresholds)
+    return WAVE_STAGE_SCORES[stage_idx], WAVE_STAGE_LABELS[stage_idx]
+
+def classify_wave_stages(df, thresholds=None):
+    """
+    파동 단계 번호(WAVE_STAGE_LABELS 인덱스)를 계산합니다.
+    위 단계부터 먼저 만족하는 조건이 선택됩니다 (if/elif 사다리와 동일).
+    :param df: ma20, ma50, ma200, 52w_pos, close, volume, vol_ma20, rsi, return_20d
+               컬럼을 가진 DataFrame (또는 컬럼명 -> 배열 dict)
+    :param thresholds: WAVE_THRESHOLDS 중 덮어쓸 값
+    :return: 단계 번호 배열
+    """
+    t = dict(WAVE_THRESHOLDS, **(thresholds or {}))
+
+    ma20 = np.asarray(df['ma20'], dtype=float)
+    ma50 = np.asarray(df['ma50'], dtype=float)
+    ma200 = np.asarray(df['ma200'], dtype=float)
+    pos = np.asarray(df['52w_pos'], dtype=float)
+    close = np.asarray(df['close'], dtype=float)
+    volume = np.asarray(df['volume'], dtype=float)
+    vol_ma20 = np.asarray(df['vol_ma20'], dtype=float)
+    rsi = np.asarray(df['rsi'], dtype=float)
+    return_20d = np.asarray(df['return_20d'], dtype=float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 1. 2단계 중기 (Strong Uptrend) - 90점
+        # 정배열, 신고가 근처, 거래량 급증, RSI 적정
+        strong = (ma20 > ma50) & (ma50 > ma200) & \
+                 (t['strong_pos_min'] <= pos) & (pos <= t['strong_pos_max']) & \
+                 (volume > vol_ma20 * t['strong_vol_mult']) & \
+                 (t['strong_rsi_min'] <= rsi) & (rsi <= t['strong_rsi_max']) & \
+                 (return_20d >= t['strong_return_min'])
+
+        # 2. 2단계 초기 (Early Uptrend) - 80점
+        # 골든크로스 이후, 20일선 지지
+        early = (ma20 > ma50) & \
+                (t['early_pos_min'] <= pos) & (pos <= t['early_pos_max']) & \
+                (close > ma20) & \
+                (volume > vol_ma20 * t['early_vol_mult'])
+
+        # 3. 1단계 -> 2단계 전환 (Transition) - 70점
+        # 수렴/교차 직전, 바닥 탈출
+        transition = (np.abs(ma20 - ma50) / ma50 < t['transition_ma_gap']) & \
+                     (t['transition_pos_min'] <= pos) & (pos <= t['transition_pos_max']) & \
+                     (t['transition_rsi_min'] <= rsi) & (rsi <= t['transition_rsi_max'])
+
+        # 4. 일반 상승 추세 (General Uptrend) - 60점
+        general = (ma20 > ma50) & \
+                  (t['general_pos_min'] <= pos) & (pos <= t['general_pos_max'])
+
+    # 기본 데이터 확인
+    insufficient = np.isnan(ma20) | np.isnan(ma50)
+
+    conditions = [insufficient, strong, early, transition, general]
+    return np.select(conditions, [0, 1, 2, 3, 4], default=5)
+
+def calculate_bonus_scores(df):
+    """
+    수급/재무 가산점을 컬럼 단위로 계산합니다.
+    :param df: inst_5d, for_5d (최근 5일 순매수 합계) 및 선택적으로 PER, PBR, ROE 컬럼
+    :return: 가산점 배열
+    """
+    def column(name):
+        if name not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+
+    with np.errstate(invalid='ignore'):
+        # 수급 가산점 (기관/외국인 순매수 지속 시)
+        bonus = (column('inst_5d') > 0) * 5 + (column('for_5d') > 0) * 5
+
+        # 재무 가산점 (Fundamental Bonus)
+        per = column('PER')
+        pbr = column('PBR')
+        roe = column('ROE')
+        bonus += ((per < 15) & (per > 0)) * 5   # PER < 15 (저평가)
+        bonus += ((pbr < 1.0) & (pbr > 0)) * 5  # PBR < 1.0 (자산가치)
+        bonus += (roe > 10) * 5                 # ROE > 10 (수익성)
+    return bonus
+
+def code_keys(codes):
+    """세그먼트 경계 계산용 키 (category 면 문자열 비교 대신 정수 코드 사용)"""
+    if isinstance(codes.dtype, pd.CategoricalDtype):
+        return codes.cat.codes.to_numpy()
+    return codes.to_numpy()
+
+INDICATOR_COLUMNS = ['ma20', 'ma50', 'ma200', 'vol_ma20', 'rsi', '52w_high', '52w_low', '52w_pos', 'return_20d']
+
+def calculate_indicator_arrays(close, volume, offsets):
+    """
+    종목별로 연속 배치된 종가/거래량 배열에서 기술적 지표를 계산합니다.
+    :param offsets: 종목 경계 오프셋 (kernels 모듈 참고)
+    :return: 지표명 -> 배열 dict
+    """
+    result = {}
+
+    # 이동평균선
+    result['ma20'] = kernels.rolling_mean(close, offsets, 20)
+    result['ma50'] = kernels.rolling_mean(close, offsets, 50)
+    result['ma200'] = kernels.rolling_mean(close, offsets, 200)
+
+    # 거래량 이동평균
+    result['vol_ma20'] = kernels.rolling_mean(volume, offsets, 20)
+
+    # RSI (14일)
+    result['rsi'] = kernels.rsi(close, offsets, 14)
+
+    # 52주 최고/최저
+    result['52w_high'] = kernels.rolling_max(close, offsets, 250, min_periods=1)
+    result['52w_low'] = kernels.rolling_min(close, offsets, 250, min_periods=1)
+
+    # 52주 위치 (0~1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['52w_pos'] = (close - result['52w_low']) / (result['52w_high'] - result['52w_low'])
+
+    # 수익률 (20일)
+    result['return_20d'] = kernels.pct_change(close, offsets, 20) * 100
+
+    return result
+
+# 전체 재계산 청크당 최대 행 수 (대략적인 기준)
+FULL_CHUNK_ROWS = 250_000
+
+def _latest_indicator_chunk(lengths, close, volume):
+    """
+    프로세스 풀 워커: 압축 배열로 받은 종목 청크의 최신 지표를 계산합니다.
+    :param lengths: 종목별 행 수 (청크 내 순서)
+    :param close, volume: float64 - 종목별로 연속 배치
+    :return: (종목 수, 지표 수) 배열
+    """
+    offsets = np.r_[0, np.cumsum(lengths)]
+    indicators = calculate_indicator_arrays(close, volume, offsets)
+    return np.column_stack([indicators[col] for col in INDICATOR_COLUMNS])[offsets[1:] - 1]
 
 class EnhancedWaveTransitionAnalyzerV3:
-    def __init__(self):
-        pass
+    def __init__(self, state_path=None, full_recompute=False, workers=1, use_cube=True):
+        """
+        :param state_path: 종목별 롤링 지표 상태 캐시 파일 (None 이면 매번 전체 계산)
+        :param full_recompute: True 이면 캐시를 무시하고 전체 재계산 후 다시 저장
+        :param workers: 지표 전체 계산에 사용할 프로세스 수
+        :param use_cube: True 이면 최신 가격 큐브(price_cube)가 있을 때 그것을 읽음
+        """
+        self.state_path = state_path
+        self.full_recompute = full_recompute
+        self.workers = max(1, int(workers))
+        self.use_cube = use_cube
 
     def load_data(self):
+        start_time = time.time()
         try:
-            self.prices_df = pd.read_csv('daily_prices.csv', dtype={'code': str})
-            self.investor_df = pd.read_csv('all_institutional_trend_data.csv', dtype={'code': str})
-            
-            # 재무 데이터 로드 (Optional)
-            try:
-                self.fundamentals_df = pd.read_csv('fundamentals.csv', dtype={'code': str})
-            except FileNotFoundError:
-                self.fundamentals_df = pd.DataFrame()
-            
-            # 날짜 형식 변환
-            self.prices_df['date'] = pd.to_datetime(self.prices_df['date'])
-            self.investor_df['date'] = pd.to_datetime(self.investor_df['date'])
-            
-            # 데이터 병합
-            self.merged_df = pd.merge(self.prices_df, self.investor_df, on=['date', 'code'], how='left')
-            
-            # 결측치 처리 (투자자 데이터가 없는 경우 0으로 채움)
-            self.merged_df['institution_net_buy'] = self.merged_df['institution_net_buy'].fillna(0)
-            self.merged_df['foreigner_net_buy'] = self.merged_df['foreigner_net_buy'].fillna(0)
+            # 원본이 바뀌지 않은 가격 큐브가 있으면 파싱/병합 없이 memmap 에서 바로 구성
+            cube = price_cube.open_fresh() if self.use_cube else None
+            if cube is not None:
+                with metrics.span('parse'):
+                    self.merged_df = cube.frame()
+                metrics.incr('cache_hits')
+            else:
+                with metrics.span('parse'):
+                    self.prices_df = load_prices(typed=True)
+                    self.investor_df = load_investor_trends(typed=True)
+                metrics.incr('rows_parsed', len(self.prices_df) + len(self.investor_df))
+
+                # 데이터 병합 (정렬된 (code, date) 키 조인, 결과는 code, date 순)
+                # 투자자 데이터가 없는 경우 순매수는 0으로 채움
+                with metrics.span('merge'):
+                    self.merged_df = sorted_key_join(self.prices_df, self.investor_df, fill_zero=NET_BUY_COLUMNS)
+
+            # 재무 데이터 로드 (Optional, 없으면 빈 DataFrame)
+            self.fundamentals_df = load_fundamentals()
             
         except FileNotFoundError as e:
             print(f"Error loading data: {e}")
             return False
+        print(f"Loaded {len(self.merged_df):,} rows in {time.time() - start_time:.1f} seconds "
+              f"({self.merged_df.memory_usage(deep=True).sum() / 2**20:.0f} MB, peak RSS {metrics.peak_rss_mb():.0f} MB)")
         return True
 
     def _calculate_technical_indicators(self, df):
-        df = df.sort_values('date').copy()
-        
-        # 이동평균선
-        df['ma20'] = df['close'].rolling(window=20).mean()
-        df['ma50'] = df['close'].rolling(window=50).mean()
-        df['ma200'] = df['close'].rolling(window=200).mean()
-        
-        # 거래량 이동평균
-        df['vol_ma20'] = df['volume'].rolling(window=20).mean()
-        
-        # RSI (14일)
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        # 52주 최고/최저
-        df['52w_high'] = df['close'].rolling(window=250, min_periods=1).max()
-        df['52w_low'] = df['close'].rolling(window=250, min_periods=1).min()
-        
-        # 52주 위치 (0~1)
-        df['52w_pos'] = (df['close'] - df['52w_low']) / (df['52w_high'] - df['52w_low'])
-        
-        # 수익률 (20일)
-        df['return_20d'] = df['close'].pct_change(periods=20) * 100
-        
+        return self._calculate_indicators_batch(df)
+
+    def _calculate_indicators_batch(self, df):
+        """
+        전 종목의 기술적 지표를 한 번에 계산합니다.
+        :param df: code, date, close, volume 컬럼을 가진 (여러 종목) DataFrame
+        :return: (code, date) 순으로 정렬된 DataFrame + 지표 컬럼
+        """
+        df = df.sort_values(['code', 'date'], kind='mergesort').reset_index(drop=True)
+        offsets = kernels.segment_offsets(code_keys(df['code']))
+        indicators = calculate_indicator_arrays(df['close'].to_numpy(dtype=np.float64),
+                                                df['volume'].to_numpy(dtype=np.float64), offsets)
+        for col in INDICATOR_COLUMNS:
+            df[col] = indicators[col]
         return df
 
+    def _calculate_latest_indicators(self, df):
+        """
+        종목별 최신 봉의 지표를 계산합니다.
+        상태 캐시가 있으면 새 봉만 O(1)로 반영하고, 캐시가 없거나
+        과거 이력이 바뀐 종목(백필, 수정된 봉 등)만 전체 재계산합니다.
+        :param df: (code, date) 순으로 정렬된 DataFrame
+        :return: 종목별 최신 행 + 지표 컬럼 (code 순)
+        """
+        codes = df['code'].to_numpy()
+        dates = df['date'].to_numpy().astype('datetime64[ns]').view('int64')
+        close = df['close'].to_numpy(dtype=float)
+        volume = df['volume'].to_numpy(dtype=float)
+        starts = kernels.segment_offsets(code_keys(df['code']))[:-1]
+        ends = np.append(starts[1:], len(df)) if len(starts) else starts
+
+        indicators = np.full((len(starts), len(INDICATOR_COLUMNS)), np.nan)
+        stale = np.ones(len(starts), dtype=bool)
+
+        cache = None
+        if self.state_path is not None:
+            cache = IndicatorStateCache(self.state_path, load=not self.full_recompute)
+            for i, (start, end) in enumerate(zip(starts, ends)):
+                cached = cache.advance(codes[start], dates[start:end], close[start:end], volume[start:end])
+                if cached is not None:
+                    indicators[i] = [cached[col] for col in INDICATOR_COLUMNS]
+                    stale[i] = False
+
+        # 캐시를 쓸 수 없는 종목은 전체 재계산 (workers > 1 이면 프로세스 풀로 분산)
+        stale_idx = np.flatnonzero(stale)
+        if len(stale_idx):
+            indicators[stale_idx] = self._calculate_full_indicators(
+                starts[stale_idx], ends[stale_idx], close, volume)
+
+        if cache is not None:
+            for i in stale_idx:
+                start, end = starts[i], ends[i]
+                cache.rebuild(codes[start], dates[start:end], close[start:end], volume[start:end])
+            cache.retain(codes[starts])
+            cache.save()
+            metrics.incr('cache_hits', len(starts) - len(stale_idx))
+            print(f"Indicator state cache: {len(starts) - len(stale_idx)} incremental, {len(stale_idx)} full recompute")
+
+        latest_df = df.iloc[ends - 1].reset_index(drop=True)
+        latest_df[INDICATOR_COLUMNS] = indicators
+        return latest_df
+
+    def _calculate_full_indicators(self, starts, ends, close, volume):
+        """
+        지정한 종목 구간의 전체 이력으로 최신 지표를 계산합니다.
+        종목 구간을 연속된 청크로 나눠 압축 배열 형태로 워커에 보내고,
+        청크 순서대로 결과를 합치므로 워커 수와 무관하게 결과가 같습니다.
+        :return: (종목 수, 지표 수) 배열
+        """
+        lengths = ends - starts
+        chunks = []
+        # 단일 프로세스에서도 청크 단위로 계산해 커널 중간 배열의 최대 메모리를 제한
+        n_chunks = max(self.workers * 4 if self.workers > 1 else 1, -(-int(lengths.sum()) // FULL_CHUNK_ROWS))
+        n_chunks = min(len(starts), n_chunks)
+        # 행 수 기준으로 균등하게 연속 분할
+        bounds = np.searchsorted(np.cumsum(lengths), np.linspace(0, lengths.sum(), n_chunks + 1)[1:-1])
+        for part in np.split(np.arange(len(starts)), bounds):
+            if len(part) == 0:
+                continue
+            rows = np.concatenate([np.arange(starts[i], ends[i]) for i in part])
+            chunks.append((lengths[part], close[rows], volume[rows]))
+
+        if self.workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(_latest_indicator_chunk, *zip(*chunks)))
+        else:
+            results = [_latest_indicator_chunk(*chunk) for chunk in chunks]
+        return np.concatenate(results)
+
     def analyze_stock(self, df, fundamentals=None):
         # 최근 데이터 기준 분석
-        latest = df.iloc[-1]
-        prev = df.iloc[-2] if len(df) > 1 else latest
-        
-        score = 0
-        wave_stage = "Unknown"
-        
-        # 기본 데이터 확인
-        if pd.isna(latest['ma20']) or pd.isna(latest['ma50']):
-            return 0, "Insufficient Data"
+        latest = df.iloc[[-1]].copy()
 
-        # 1. 2단계 중기 (Strong Uptrend) - 90점
-        # 정배열, 신고가 근처, 거래량 급증, RSI 적정
-        if (latest['ma20'] > latest['ma50'] > latest['ma200']) and \
-           (0.6 <= latest['52w_pos'] <= 0.9) and \
-           (latest['volume'] > latest['vol_ma20'] * 1.3) and \
-           (55 <= latest['rsi'] <= 75) and \
-           (latest['return_20d'] >= 10):
-            score = 90
-            wave_stage = "Strong Uptrend"
-            
-        # 2. 2단계 초기 (Early Uptrend) - 80점
-        # 골든크로스 이후, 20일선 지지
-        elif (latest['ma20'] > latest['ma50']) and \
-             (0.4 <= latest['52w_pos'] <= 0.75) and \
-             (latest['close'] > latest['ma20']) and \
-             (latest['volume'] > latest['vol_ma20'] * 1.2):
-            score = 80
-            wave_stage = "Early Uptrend"
-            
-        # 3. 1단계 -> 2단계 전환 (Transition) - 70점
-        # 수렴/교차 직전, 바닥 탈출
-        elif (abs(latest['ma20'] - latest['ma50']) / latest['ma50'] < 0.05) and \
-             (0.25 <= latest['52w_pos'] <= 0.6) and \
-             (45 <= latest['rsi'] <= 65):
-            score = 70
-            wave_stage = "Transition"
-            
-        # 4. 일반 상승 추세 (General Uptrend) - 60점
-        elif (latest['ma20'] > latest['ma50']) and \
-             (0.3 <= latest['52w_pos'] <= 0.7):
-            score = 60
-            wave_stage = "General Uptrend"
-        else:
-            score = 40
-            wave_stage = "Weak/Downtrend"
-            
-        # 수급 가산점 (기관/외국인 순매수 지속 시)
-        # 최근 5일간 순매수 합계가 양수이면 가산점
+        # 수급: 최근 5일간 순매수 합계
         recent_5d = df.tail(5)
-        inst_sum = recent_5d['institution_net_buy'].sum()
-        for_sum = recent_5d['foreigner_net_buy'].sum()
-        
-        if inst_sum > 0:
-            score += 5
-        if for_sum > 0:
-            score += 5
-            
-        # 재무 가산점 (Fundamental Bonus)
+        latest['inst_5d'] = recent_5d['institution_net_buy'].sum()
+        latest['for_5d'] = recent_5d['foreigner_net_buy'].sum()
+
+        # 재무 데이터
         if fundamentals is not None and not fundamentals.empty:
-            # PER < 15 (저평가)
-            if pd.notna(fundamentals['PER']) and fundamentals['PER'] < 15 and fundamentals['PER'] > 0:
-                score += 5
-            # PBR < 1.0 (자산가치)
-            if pd.notna(fundamentals['PBR']) and fundamentals['PBR'] < 1.0 and fundamentals['PBR'] > 0:
-                score += 5
-            # ROE > 10 (수익성)
-            if pd.notna(fundamentals['ROE']) and fundamentals['ROE'] > 10:
-                score += 5
-            
-        return score, wave_stage
+            for col in ['PER', 'PBR', 'ROE']:
+                latest[col] = fundamentals.get(col, np.nan)
+
+        scores, stages = self.score_stocks(latest)
+        return int(scores[0]), stages[0]
+
+    def score_stocks(self, latest_df, thresholds=None):
+        """
+        종목별 최신 행을 모은 DataFrame 전체를 한 번에 채점합니다.
+        :param latest_df: 지표 컬럼 + inst_5d, for_5d (+ PER, PBR, ROE)
+        :return: (점수 배열, 단계명 배열)
+        """
+        score, stage = evaluate_wave_stages(latest_df, thresholds)
+        # 데이터 부족 종목은 가산점 없이 0점
+        score = np.where(stage == "Insufficient Data", 0, score + calculate_bonus_scores(latest_df))
+        return score, stage
+
+    def select_eligible(self):
+        """
+        데이터 부족 종목 제외 (기준 완화: 200 -> 50, 신규 상장주 등 고려)
+        :return: (code, date) 순으로 정렬된 분석 대상 행
+        """
+        counts = self.merged_df.groupby('code', observed=True)['code'].transform('size')
+        eligible_df = self.merged_df[counts >= 50]
+        return eligible_df.sort_values(['code', 'date'], kind='mergesort').reset_index(drop=True)
+
+    def build_results(self, eligible_df, latest_df):
+        """
+        종목별 최신 지표에 수급/재무 데이터를 붙여 채점합니다.
+        :param latest_df: _calculate_latest_indicators() 결과 (code 인덱스)
+        :return: 점수 내림차순 결과 DataFrame
+        """
+        # 최근 5일 수급 합계
+        recent_5d = eligible_df.groupby('code', sort=True, observed=True).tail(5) \
+            .groupby('code', sort=True, observed=True)[['institution_net_buy', 'foreigner_net_buy']].sum()
+        latest_df['inst_5d'] = recent_5d['institution_net_buy']
+        latest_df['for_5d'] = recent_5d['foreigner_net_buy']
+
+        # 재무 데이터 결합 (종목별 첫 행)
+        if not self.fundamentals_df.empty:
+            fund_lookup = self.fundamentals_df.drop_duplicates(subset=['code']).set_index('code')
+            for col in ['PER', 'PBR', 'ROE']:
+                if col in fund_lookup.columns:
+                    latest_df[col] = fund_lookup[col].reindex(latest_df.index)
+
+        scores, stages = self.score_stocks(latest_df)
+
+        results = pd.DataFrame({
+            'code': latest_df['code'].to_numpy(),
+            'name': latest_df['name'].to_numpy(),
+            'date': latest_df['date'].to_numpy(),
+            'close': latest_df['close'].to_numpy(),
+            'score': scores,
+            'wave_stage': stages,
+            'rsi': latest_df['rsi'].to_numpy(),
+            '52w_pos': latest_df['52w_pos'].to_numpy()
+        })
+        return results.sort_values('score', ascending=False)
+
+    def save_results(self, results_df, path='wave_transition_analysis_results.csv'):
+        results_df.to_csv(path, index=False)
+        print(f"Analysis complete. Saved {len(results_df)} results to {path}")
 
     def run(self):
         if not self.load_data():
             return
-            
-        results = []
-        
-        # 종목별로 그룹화하여 분석
-        grouped = self.merged_df.groupby('code')
-        
-        for code, group in tqdm(grouped, desc="Analyzing Stocks"):
-            if len(group) < 50: # 데이터 부족 시 스킵 (기준 완화: 200 -> 50, 신규 상장주 등 고려)
-                continue
-                
-            processed_df = self._calculate_technical_indicators(group)
-            
-            # 재무 데이터 찾기
-            fund_data = None
-            if not self.fundamentals_df.empty:
-                fund_rows = self.fundamentals_df[self.fundamentals_df['code'] == code]
-                if not fund_rows.empty:
-                    fund_data = fund_rows.iloc[0]
-            
-            score, stage = self.analyze_stock(processed_df, fund_data)
-            
-            latest = processed_df.iloc[-1]
-            
-            results.append({
-                'code': code,
-                'name': latest['name'],
-                'date': latest['date'],
-                'close': latest['close'],
-                'score': score,
-                'wave_stage': stage,
-                'rsi': latest['rsi'],
-                '52w_pos': latest['52w_pos']
-            })
-            
-        results_df = pd.DataFrame(results)
-        results_df = results_df.sort_values('score', ascending=False)
-        results_df.to_csv('wave_transition_analysis_results.csv', index=False)
-        print(f"Analysis complete. Saved {len(results_df)} results to wave_transition_analysis_results.csv")
+
+        with metrics.span('indicators'):
+            eligible_df = self.select_eligible()
+            # 전 종목 최신 지표 계산 (상태 캐시가 있으면 새 봉만 반영)
+            latest_df = self._calculate_latest_indicators(eligible_df).set_index('code', drop=False)
+
+        with metrics.span('scoring'):
+            results_df = self.build_results(eligible_df, latest_df)
+
+        with metrics.span('write'):
+            self.save_results(results_df)
+        metrics.write('analysis2')
 
 if __name__ == "__main__":
-    analyzer = EnhancedWaveTransitionAnalyzerV3()
+    parser = argparse.ArgumentParser(description="Wave transition analysis")
+    parser.add_argument('--state-cache', default='indicator_state.pkl',
+                        help="종목별 롤링 지표 상태 캐시 파일 ('' 이면 사용 안 함)")
+    parser.add_argument('--full-recompute', action='store_true',
+                        help="캐시를 무시하고 전 종목 지표를 다시 계산")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="지표 계산 프로세스 수 (종목 청크 단위 분산)")
+    parser.add_argument('--no-cube', action='store_true',
+                        help="가격 큐브를 쓰지 않고 원본 저장소/CSV 에서 읽기")
+    args = parser.parse_args()
+
+    analyzer = EnhancedWaveTransitionAnalyzerV3(state_path=args.state_cache or None,
+                                                full_recompute=args.full_recompute,
+                                                workers=args.workers,
+                                                use_cube=not args.no_cube)
     analyzer.run()
@@ -0,0 +1,140 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from analysis2 import EnhancedWaveTransitionAnalyzerV3, evaluate_wave_stages, calculate_bonus_scores, code_keys
+
+FORWARD_HORIZONS = (5, 20, 60)
+MIN_HISTORY = 50  # analysis2.run() 과 동일한 최소 봉 수
+
+def prepare_backtest_frame(merged_df, horizons=FORWARD_HORIZONS, analyzer=None):
+    """
+    모든 (종목, 날짜)에 대해 지표, 5일 수급 합계, 미래 수익률을 한 번에 계산합니다.
+    :param merged_df: analysis2.load_data() 의 merged_df
+    :param horizons: 미래 수익률 기간 (거래일)
+    :return: (code, date) 순 DataFrame
+    """
+    analyzer = analyzer or EnhancedWaveTransitionAnalyzerV3()
+    columns = ['code', 'date', 'close', 'volume', 'institution_net_buy', 'foreigner_net_buy']
+    df = analyzer._calculate_indicators_batch(merged_df[columns])
+    offsets = kernels.segment_offsets(code_keys(df['code']))
+
+    # 해당 날짜 기준 최근 5일 순매수 합계 (analyze_stock 의 tail(5) 와 동일)
+    for col, name in [('institution_net_buy', 'inst_5d'), ('foreigner_net_buy', 'for_5d')]:
+        df[name] = kernels.rolling_sum(df[col].to_numpy(dtype=np.float64), offsets, 5, min_periods=1)
+
+    # 당시까지 봉 수가 부족한 날짜는 채점 대상에서 제외 (미래 정보 사용 방지)
+    df['eligible'] = np.arange(len(df)) - np.repeat(offsets[:-1], np.diff(offsets)) >= MIN_HISTORY - 1
+
+    # 미래 수익률 (%) - 종가가 0 이하인 행은 제외
+    close = df['close'].to_numpy(dtype=np.float64)
+    base = np.where(close > 0, close, np.nan)
+    for h in horizons:
+        df[f'fwd_{h}d'] = (kernels.shift(close, offsets, -h) / base - 1) * 100
+
+    return df
+
+def score_frame(df, thresholds=None, fundamentals_df=None):
+    """
+    준비된 프레임의 모든 행을 채점합니다.
+    :param fundamentals_df: 재무 가산점에 쓸 데이터 (현재 시점 값이므로 기본적으로 사용하지 않음)
+    :return: (점수 배열, 단계명 배열)
+    """
+    score, stage = evaluate_wave_stages(df, thresholds)
+
+    bonus_df = df[['inst_5d', 'for_5d']]
+    if fundamentals_df is not None and not fundamentals_df.empty:
+        fund_lookup = fundamentals_df.drop_duplicates(subset=['code']).set_index('code')
+        bonus_df = bonus_df.copy()
+        for col in ['PER', 'PBR', 'ROE']:
+            if col in fund_lookup.columns:
+                bonus_df[col] = fund_lookup[col].reindex(df['code']).to_numpy()
+
+    score = np.where(stage == "Insufficient Data", 0, score + calculate_bonus_scores(bonus_df))
+    return score, stage
+
+def stage_turnover(codes, stages):
+    """종목별로 직전 날짜와 단계가 달라진(신규 진입) 행 표시"""
+    changed = np.ones(len(stages), dtype=bool)
+    changed[1:] = (stages[1:] != stages[:-1]) | (codes[1:] != codes[:-1])
+    return changed
+
+def summarize_by_stage(df, horizons=FORWARD_HORIZONS):
+    """
+    단계별 미래 수익률, 적중률(수익률 > 0), 회전율을 집계합니다.
+    :param df: score, wave_stage, entry, fwd_{h}d 컬럼을 가진 채점 대상 행
+    """
+    grouped = df.groupby('wave_stage', sort=False)
+    summary = pd.DataFrame({
+        'signals': grouped.size(),
+        'codes': grouped['code'].nunique(),
+        'avg_score': grouped['score'].mean(),
+        # 회전율: 해당 단계 관측치 중 새로 진입한 비율 / 평균 유지 기간
+        'turnover': grouped['entry'].mean(),
+        'avg_hold_days': grouped.size() / grouped['entry'].sum(),
+    })
+    for h in horizons:
+        col = f'fwd_{h}d'
+        hits = (df[col] > 0).astype(float).where(df[col].notna())
+        summary[f'mean_{h}d'] = grouped[col].mean()
+        summary[f'median_{h}d'] = grouped[col].median()
+        summary[f'hit_rate_{h}d'] = hits.groupby(df['wave_stage'], sort=False).mean()
+    return summary.sort_values('avg_score', ascending=False)
+
+def run_backtest(merged_df, fundamentals_df=None, horizons=FORWARD_HORIZONS, start=None, end=None, thresholds=None):
+    """
+    전체 (종목, 날짜) 파동 단계/점수와 단계별 성과 요약을 계산합니다.
+    :return: (채점된 행 DataFrame, 단계별 요약 DataFrame)
+    """
+    df = prepare_backtest_frame(merged_df, horizons)
+    df['score'], df['wave_stage'] = score_frame(df, thresholds, fundamentals_df)
+    df['entry'] = stage_turnover(code_keys(df['code']), df['wave_stage'].to_numpy())
+
+    mask = df['eligible'].to_numpy()
+    if start is not None:
+        mask &= (df['date'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df['date'] <= pd.Timestamp(end)).to_numpy()
+    signals = df[mask]
+    return signals, summarize_by_stage(signals, horizons)
+
+def main():
+    parser = argparse.ArgumentParser(description="파동 단계 점수 히스토리 백테스트")
+    parser.add_argument('--start', help="집계 시작일 (YYYY-MM-DD)")
+    parser.add_argument('--end', help="집계 종료일 (YYYY-MM-DD)")
+    parser.add_argument('--horizons', default=','.join(map(str, FORWARD_HORIZONS)),
+                        help="미래 수익률 기간 (거래일, 쉼표 구분)")
+    parser.add_argument('--with-fundamentals', action='store_true',
+                        help="현재 재무 데이터로 가산점 부여 (미래 정보 포함 주의)")
+    parser.add_argument('--output', default='backtest_stage_summary.csv')
+    parser.add_argument('--signals-output', help="(종목, 날짜)별 점수/단계 저장 경로")
+    args = parser.parse_args()
+
+    horizons = tuple(int(h) for h in args.horizons.split(','))
+
+    analyzer = EnhancedWaveTransitionAnalyzerV3()
+    start_time = time.time()
+    if not analyzer.load_data():
+        return
+    fundamentals_df = analyzer.fundamentals_df if args.with_fundamentals else None
+
+    signals, summary = run_backtest(analyzer.merged_df, fundamentals_df, horizons, args.start, args.end)
+
+    print(f"Scored {len(signals):,} (code, date) rows for {signals['code'].nunique():,} stocks "
+          f"in {time.time() - start_time:.1f} seconds.")
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.3f}'.format):
+        print(summary)
+
+    summary.to_csv(args.output, index_label='wave_stage')
+    print(f"Saved stage summary to {args.output}")
+
+    if args.signals_output:
+        cols = ['code', 'date', 'close', 'score', 'wave_stage'] + [f'fwd_{h}d' for h in horizons]
+        signals[cols].to_csv(args.signals_output, index=False)
+        print(f"Saved {len(signals):,} signals to {args.signals_output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+분석 엔진 처리량 벤치마크.
+
+합성 유니버스(종목 수 x 기간)를 만들어 load_data, 지표 계산, 채점, CSV 저장 단계를
+각각 측정하고 결과(초, 초당 행 수, 최대 메모리)를 JSON 이력 파일에 누적합니다.
+저장된 기준값보다 허용 오차 이상 느려지거나 메모리를 더 쓰면 종료 코드 1 을 반환합니다.
+
+    python benchmarks/bench_analysis.py                      # 전체 (100/1000/5000 종목 x 1/5/10년)
+    python benchmarks/bench_analysis.py --tickers 100 --years 1,5
+    python benchmarks/bench_analysis.py --update-baseline    # 현재 결과를 기준값으로 저장
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+from analysis2 import EnhancedWaveTransitionAnalyzerV3
+from metrics import peak_rss_mb
+
+TICKER_COUNTS = (100, 1000, 5000)
+YEAR_COUNTS = (1, 5, 10)
+TRADING_DAYS = 252
+STAGES = ('load', 'indicators', 'scoring', 'csv_output')
+# 기준값과 비교할 측정 항목
+CHECKED_METRICS = ('seconds', 'peak_rss_mb')
+
+def case_name(tickers, years):
+    return f"{tickers}x{years}y"
+
+def generate_universe(path, tickers, years, seed=0, chunk_tickers=500):
+    """
+    실제 수집 파일과 같은 형식의 합성 데이터 생성.
+    - 80% 국내 종목 (정수 가격, 수급 데이터 있음), 20% 해외 종목 (소수점 가격)
+    - 20% 종목은 상장 기간이 짧음
+    :param path: daily_prices.csv 등을 저장할 디렉터리
+    :param chunk_tickers: 한 번에 생성해 파일에 이어 쓸 종목 수 (메모리 제한)
+    :return: 생성된 가격 행 수
+    """
+    rng = np.random.default_rng(seed)
+    bars = years * TRADING_DAYS
+    dates = pd.bdate_range(end='2025-12-31', periods=bars).strftime('%Y-%m-%d').to_numpy()
+
+    is_us = np.arange(tickers) % 5 == 0
+    codes = np.where(is_us, [f"U{i:05d}" for i in range(tickers)], [f"{i:06d}" for i in range(tickers)])
+    lengths = np.where(rng.random(tickers) < 0.2, rng.integers(30, bars + 1, tickers), bars)
+
+    price_path = os.path.join(path, 'daily_prices.csv')
+    investor_path = os.path.join(path, 'all_institutional_trend_data.csv')
+    rows = 0
+    for first in range(0, tickers, chunk_tickers):
+        ids = np.arange(first, min(first + chunk_tickers, tickers))
+        seg = np.repeat(ids, lengths[ids])
+        offsets = np.r_[0, np.cumsum(lengths[ids])]
+        local = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths[ids])
+        day_idx = bars - lengths[seg] + local
+
+        # 종목별 드리프트를 가진 로그 정규 랜덤워크
+        log_ret = rng.normal(rng.normal(0.0003, 0.001, tickers)[seg], 0.02)
+        log_ret[offsets[:-1]] = 0
+        cum = np.cumsum(log_ret)
+        cum -= np.repeat(cum[offsets[:-1]], lengths[ids])
+        close = rng.uniform(5000, 100000, tickers)[seg] * np.exp(cum)
+        close = np.where(is_us[seg], np.round(close / 1000, 2), np.round(close))
+
+        prices = pd.DataFrame({
+            'date': dates[day_idx],
+            'close': close,
+            'diff': 0,
+            'open': close,
+            'high': close,
+            'low': close,
+            'volume': rng.integers(1000, 1_000_000, len(seg)),
+            'code': codes[seg],
+            'name': np.char.add('Name', seg.astype(str)),
+        })
+        prices.to_csv(price_path, index=False, mode='w' if first == 0 else 'a', header=first == 0)
+
+        kr = ~is_us[seg]
+        investor = pd.DataFrame({
+            'date': prices['date'][kr],
+            'institution_net_buy': rng.integers(-100_000, 100_000, int(kr.sum())),
+            'foreigner_net_buy': rng.integers(-100_000, 100_000, int(kr.sum())),
+            'code': prices['code'][kr],
+        })
+        investor.to_csv(investor_path, index=False, mode='w' if first == 0 else 'a', header=first == 0)
+        rows += len(prices)
+
+    pd.DataFrame({
+        'code': codes,
+        'PER': rng.uniform(-5, 40, tickers).round(2),
+        'PBR': rng.uniform(0.1, 5, tickers).round(2),
+        'ROE': rng.uniform(-10, 30, tickers).round(2),
+    }).to_csv(os.path.join(path, 'fundamentals.csv'), index=False)
+    return rows
+
+def ensure_universe(data_dir, tickers, years):
+    """케이스별 합성 데이터 디렉터리 (이미 있으면 재사용)"""
+    path = os.path.join(data_dir, case_name(tickers, years))
+    if not os.path.exists(os.path.join(path, 'fundamentals.csv')):
+        os.makedirs(path, exist_ok=True)
+        start_time = time.time()
+        rows = generate_universe(path, tickers, years)
+        print(f"Generated {case_name(tickers, years)} ({rows:,} rows) in {time.time() - start_time:.1f} seconds.")
+    return path
+
+def run_case(path, repeat=1):
+    """
+    한 케이스의 단계별 측정 (별도 프로세스에서 실행해 최대 메모리를 케이스별로 분리).
+    peak_rss_mb 는 해당 단계까지의 프로세스 최대 메모리입니다.
+    :return: 단계명 -> {seconds, rows_per_sec, peak_rss_mb}
+    """
+    os.chdir(path)
+    timings = {stage: [] for stage in STAGES}
+    peaks = {}
+    rows = 0
+    for _ in range(repeat):
+        analyzer = EnhancedWaveTransitionAnalyzerV3()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            analyzer.load_data()
+            timings['load'].append(time.perf_counter() - start)
+            peaks['load'] = peak_rss_mb()
+            rows = len(analyzer.merged_df)
+
+            start = time.perf_counter()
+            eligible_df = analyzer.select_eligible()
+            latest_df = analyzer._calculate_latest_indicators(eligible_df).set_index('code', drop=False)
+            timings['indicators'].append(time.perf_counter() - start)
+            peaks['indicators'] = peak_rss_mb()
+
+            start = time.perf_counter()
+            results_df = analyzer.build_results(eligible_df, latest_df)
+            timings['scoring'].append(time.perf_counter() - start)
+            peaks['scoring'] = peak_rss_mb()
+
+            start = time.perf_counter()
+            analyzer.save_results(results_df, os.devnull)
+            timings['csv_output'].append(time.perf_counter() - start)
+            peaks['csv_output'] = peak_rss_mb()
+
+    result = {}
+    for stage in STAGES:
+        seconds = min(timings[stage])
+        result[stage] = {
+            'seconds': round(seconds, 4),
+            'rows_per_sec': round(rows / seconds) if seconds > 0 else None,
+            'peak_rss_mb': round(peaks[stage], 1),
+        }
+    result['rows'] = rows
+    return result
+
+def find_regressions(current, baseline, tolerance, min_seconds=0.05):
+    """
+    기준값 대비 (1 + tolerance) 배를 넘는 단계 목록.
+    :param min_seconds: 기준/현재 시간이 모두 이보다 짧으면 측정 잡음으로 보고 무시
+    :return: (케이스, 단계, 항목, 기준값, 현재값) 리스트
+    """
+    regressions = []
+    for case, stages in current.items():
+        if case not in baseline:
+            continue
+        for stage in STAGES:
+            for metric in CHECKED_METRICS:
+                base = baseline[case].get(stage, {}).get(metric)
+                value = stages.get(stage, {}).get(metric)
+                if base is None or value is None:
+                    continue
+                if metric == 'seconds' and max(base, value) < min_seconds:
+                    continue
+                if value > base * (1 + tolerance):
+                    regressions.append((case, stage, metric, base, value))
+    return regressions
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {'baseline': {}, 'runs': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_history(path, history):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="분석 엔진 단계별 처리량 벤치마크")
+    parser.add_argument('--tickers', default=','.join(map(str, TICKER_COUNTS)), help="종목 수 (쉼표 구분)")
+    parser.add_argument('--years', default=','.join(map(str, YEAR_COUNTS)), help="기간 (년, 쉼표 구분)")
+    parser.add_argument('--repeat', type=int, default=1, help="케이스별 반복 횟수 (최소 시간 사용)")
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'), help="합성 데이터 캐시 디렉터리")
+    parser.add_argument('--history', default=os.path.join(BENCH_DIR, 'bench_history.json'), help="결과 이력 JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="허용 오차 (0.2 = 기준 대비 20%%)")
+    parser.add_argument('--min-seconds', type=float, default=0.05, help="이보다 짧은 단계는 시간 비교 제외")
+    parser.add_argument('--update-baseline', action='store_true', help="이번 결과로 기준값 갱신")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    cases = {}
+    for tickers in map(int, args.tickers.split(',')):
+        for years in map(int, args.years.split(',')):
+            name = case_name(tickers, years)
+            path = ensure_universe(args.data_dir, tickers, years)
+            # 케이스마다 새 프로세스 (최대 메모리는 프로세스 단위로만 측정 가능)
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                cases[name] = executor.submit(run_case, path, args.repeat).result()
+            print(f"{name:>10} {cases[name]['rows']:>12,} rows  " + "  ".join(
+                f"{stage} {cases[name][stage]['seconds']:.3f}s" for stage in STAGES) +
+                f"  peak {cases[name]['csv_output']['peak_rss_mb']:.0f} MB")
+
+    history['runs'].append({
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cases': cases,
+    })
+
+    regressions = find_regressions(cases, history['baseline'], args.tolerance, args.min_seconds)
+    missing = [name for name in cases if name not in history['baseline']]
+    if args.update_baseline or missing:
+        # 기준값이 없는 케이스는 이번 결과를 기준값으로 사용
+        for name in (cases if args.update_baseline else missing):
+            history['baseline'][name] = cases[name]
+        print(f"Baseline updated for {len(cases) if args.update_baseline else len(missing)} case(s).")
+    save_history(args.history, history)
+
+    if regressions and not args.update_baseline:
+        for case, stage, metric, base, value in regressions:
+            print(f"REGRESSION {case} {stage} {metric}: {base} -> {value} ({value / base - 1:+.0%})")
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} tolerance.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,85 +1,64 @@
+import argparse
 import pandas as pd
+import numpy as np
 import yfinance as yf
-import requests
+import http_client
 import os
-import time
-import io
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from naver_pages import parse_main
+from fetch_engine import FetchEngine, map_unordered, DEFAULT_RATE, DEFAULT_PER_HOST
+from data_access import load_fundamentals, save_fundamentals
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# 미국 종목 .info 동시 요청 수 (티커마다 별도 요청)
+US_WORKERS = 8
+# 재무 지표 캐시: 마지막 수집 성공(fetched_at) 후 TTL 이 지난 종목만 다시 받음
+DEFAULT_TTL_HOURS = 24
+# stale-while-revalidate 모드에서 한 번에 갱신할 만료 종목 수 (나머지는 만료된 값을 그대로 사용)
+DEFAULT_MAX_REFRESH = 300
+FUNDAMENTAL_FIELDS = ['PER', 'PBR', 'ROE', 'EPS', 'Dividend_Yield', 'Market_Cap', 'Revenue_Growth']
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def naver_fundamentals_url(code):
+    return f"https://finance.naver.com/item/main.naver?code={code}"
 
 def get_naver_fundamentals(code):
-    """네이버 금융에서 한국 주식 재무 정보 크롤링"""
-    url = f"https://finance.naver.com/item/main.naver?code={code}"
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    
+    """네이버 금융에서 한국 주식 재무 정보 크롤링 (PER, PBR, EPS, ROE, 배당수익률, 시가총액)"""
     try:
-        response = requests.get(url, headers=headers)
-        dfs = pd.read_html(io.StringIO(response.text), encoding='euc-kr')
-        
-        # 네이버 금융 페이지 구조상 '종목분석' 테이블 찾기
-        # 보통 3번째 또는 4번째 테이블에 주요 재무 정보가 있음
-        # 하지만 테이블 순서가 바뀔 수 있으므로, 특정 키워드로 찾음
-        
-        fund_df = None
-        for df in dfs:
-            if 'PER' in df.iloc[:, 0].values or 'PER(배)' in str(df.columns):
-                fund_df = df
-                break
-                
-        if fund_df is None:
-            return {}
-            
-        # 데이터 추출 (단순화를 위해 주요 지표만 추출 시도)
-        # 네이버 금융 메인 페이지의 '투자지표' 섹션 파싱이 더 쉬울 수 있음
-        # 여기서는 requests + string parsing으로 핵심 지표만 빠르게 가져옴
-        
-        html = response.text
-        data = {}
-        
-        # PER
-        try:
-            # <em id="_per">10.5</em>
-            import re
-            per_match = re.search(r'<em id="_per">([\d\.]+)</em>', html)
-            if per_match:
-                data['PER'] = float(per_match.group(1))
-        except: pass
-        
-        # PBR
-        try:
-            pbr_match = re.search(r'<em id="_pbr">([\d\.]+)</em>', html)
-            if pbr_match:
-                data['PBR'] = float(pbr_match.group(1))
-        except: pass
-        
-        # 배당수익률
-        try:
-            div_match = re.search(r'<em id="_dvr">([\d\.]+)</em>', html)
-            if div_match:
-                data['Dividend_Yield'] = float(div_match.group(1))
-        except: pass
-        
-        # 시가총액 (억)
-        try:
-            cap_match = re.search(r'<em id="_market_sum">([\d,]+)</em>', html)
-            if cap_match:
-                data['Market_Cap'] = int(cap_match.group(1).replace(',', '')) * 100000000 # 억 단위 -> 원
-        except: pass
-        
-        return data
-        
+        response = http_client.get(naver_fundamentals_url(code), headers=HEADERS)
+        return parse_main(response.content)
     except Exception as e:
         # print(f"Error fetching fundamentals for KR {code}: {e}")
         return {}
 
+async def fetch_naver_fundamentals(engine, code):
+    """
+    get_naver_fundamentals() 의 비동기 버전 (여러 종목을 동시에 요청).
+    :param engine: FetchEngine (전역 요청 속도/동시성 제한)
+    :return: (code, 지표 dict - 실패하면 빈 dict)
+    """
+    try:
+        response = await engine.get(naver_fundamentals_url(code))
+        # 본문을 디코딩하지 않고 바이트에서 바로 추출
+        return code, await engine.call(parse_main, response.content)
+    except Exception as e:
+        # print(f"Error fetching fundamentals for KR {code}: {e}")
+        return code, {}
+
 def get_us_fundamentals(ticker):
     """yfinance에서 미국 주식 재무 정보 가져오기"""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        with metrics.span('fetch'):
+            stock = yf.Ticker(ticker)
+            info = stock.info
+        metrics.incr('http_requests')
         
         data = {
             'PER': info.get('trailingPE'),
             'PBR': info.get('priceToBook'),
             'ROE': info.get('returnOnEquity'),
+            'EPS': info.get('trailingEps'),
             'Dividend_Yield': info.get('dividendYield'), # 0.05 = 5%
             'Market_Cap': info.get('marketCap'),
             'Revenue_Growth': info.get('revenueGrowth')
@@ -92,55 +71,147 @@ def get_us_fundamentals(ticker):
         # print(f"Error fetching fundamentals for US {ticker}: {e}")
         return {}
 
+def plan_refresh(codes, cached, ttl, now=None, max_refresh=None):
+    """
+    캐시된 재무 지표 중 다시 받을 종목을 고릅니다.
+    :param codes: 수집 대상 종목코드 목록
+    :param cached: 저장된 재무 지표 (code, fetched_at)
+    :param ttl: 캐시 유효 기간 (Timedelta)
+    :param now: 기준 시각 (기본: 현재)
+    :param max_refresh: 만료된 종목 중 갱신할 최대 수 (오래된 순, None 이면 전부) - stale-while-revalidate
+    :return: (refresh: 다시 받을 코드, fresh: 캐시에서 쓰는 코드, stale: 만료됐지만 이번에는 캐시를 쓰는 코드)
+    """
+    now = now or pd.Timestamp.now()
+    fetched = {}
+    if len(cached) and 'fetched_at' in cached.columns:
+        fetched = dict(zip(cached['code'].astype(str), pd.to_datetime(cached['fetched_at'], format=TIMESTAMP_FORMAT)))
+    missing, expired, fresh = [], [], []
+    for code in codes:
+        fetched_at = fetched.get(str(code), pd.NaT)
+        if pd.isna(fetched_at):
+            missing.append(code)
+        elif now - fetched_at > ttl:
+            expired.append(code)
+        else:
+            fresh.append(code)
+    # 캐시가 없는 종목은 항상 받고, 만료된 종목은 오래된 순으로 max_refresh 개까지만 갱신
+    expired.sort(key=lambda code: fetched[str(code)])
+    if max_refresh is not None:
+        return missing + expired[:max_refresh], fresh, expired[max_refresh:]
+    return missing + expired, fresh, []
+
+def changed_codes(refreshed, cached):
+    """
+    새로 받은 지표가 저장된 값과 다른 종목 (저장된 값이 없던 종목 포함).
+    :param refreshed: code 와 FUNDAMENTAL_FIELDS 중 받은 컬럼이 있는 DataFrame
+    :param cached: 저장된 재무 지표
+    """
+    if not len(cached):
+        return set(refreshed['code'])
+    old = cached.set_index(cached['code'].astype(str)).reindex(refreshed['code'].astype(str))
+    changed = np.zeros(len(refreshed), dtype=bool)
+    for field in FUNDAMENTAL_FIELDS:
+        new_values = pd.to_numeric(refreshed[field], errors='coerce').to_numpy(dtype=float) \
+            if field in refreshed.columns else np.full(len(refreshed), np.nan)
+        old_values = pd.to_numeric(old[field], errors='coerce').to_numpy(dtype=float) \
+            if field in old.columns else np.full(len(refreshed), np.nan)
+        same = np.isclose(new_values, old_values, rtol=1e-9, atol=0) | (np.isnan(new_values) & np.isnan(old_values))
+        changed |= ~same
+    return set(refreshed['code'][changed])
+
 def main():
+    parser = argparse.ArgumentParser(description="국내/미국 종목 재무 지표 수집 (TTL 캐시, stock_data.db 에 upsert)")
+    parser.add_argument('--ttl-hours', type=float, default=DEFAULT_TTL_HOURS,
+                        help="마지막 수집 후 이 시간이 지난 종목만 다시 받음 (0 이면 전체)")
+    parser.add_argument('--stale-while-revalidate', action='store_true',
+                        help="만료된 종목은 오래된 순으로 --max-refresh 개만 갱신하고 나머지는 만료된 값을 그대로 사용")
+    parser.add_argument('--max-refresh', type=int, default=DEFAULT_MAX_REFRESH,
+                        help="stale-while-revalidate 모드에서 실행당 갱신할 만료 종목 수")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help="네이버 전체 초당 요청 수 상한")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_PER_HOST,
+                        help="네이버 금융 동시 요청 수 상한")
+    args = parser.parse_args()
+
     print("📊 Collecting Fundamentals (KR & US)...")
-    
-    fundamentals = []
-    
-    # 1. 한국 주식
+
+    # 종목 목록 (code, name, country)
+    symbols = []
     if os.path.exists('korean_stocks_list.csv'):
         kr_stocks = pd.read_csv('korean_stocks_list.csv', dtype={'ticker': str})
-        print(f"- Processing {len(kr_stocks)} Korean stocks...")
-        
-        for _, row in kr_stocks.iterrows():
-            code = str(row['ticker']).zfill(6)
-            name = row['name']
-            
-            data = get_naver_fundamentals(code)
-            data['code'] = code
-            data['name'] = name
-            data['country'] = 'KR'
-            
-            fundamentals.append(data)
-            time.sleep(0.1) # 서버 부하 방지
-            
-    # 2. 미국 주식
+        symbols.append(pd.DataFrame({'code': kr_stocks['ticker'].str.zfill(6), 'name': kr_stocks['name'],
+                                     'country': 'KR'}))
     if os.path.exists('us_stocks_list.csv'):
         us_stocks = pd.read_csv('us_stocks_list.csv')
-        print(f"- Processing {len(us_stocks)} US stocks...")
-        
-        for _, row in us_stocks.iterrows():
-            ticker = row['ticker']
-            name = row['name']
-            
-            data = get_us_fundamentals(ticker)
-            data['code'] = ticker
-            data['name'] = name
-            data['country'] = 'US'
-            
-            # 배당수익률 단위 통일 (네이버는 %, yfinance는 소수점)
-            if 'Dividend_Yield' in data and data['Dividend_Yield']:
-                data['Dividend_Yield'] = data['Dividend_Yield'] * 100
-                
-            fundamentals.append(data)
-            
-    # 저장
-    if fundamentals:
-        df = pd.DataFrame(fundamentals)
-        df.to_csv('fundamentals.csv', index=False, encoding='utf-8')
-        print(f"💾 Saved fundamentals for {len(df)} stocks to fundamentals.csv")
-    else:
-        print("No fundamental data collected.")
+        symbols.append(pd.DataFrame({'code': us_stocks['ticker'].astype(str), 'name': us_stocks['name'],
+                                     'country': 'US'}))
+    if not symbols:
+        print("No stock lists found.")
+        metrics.write('collect_fundamentals')
+        return
+    symbols = pd.concat(symbols, ignore_index=True).drop_duplicates(subset='code', keep='last')
+
+    cached = load_fundamentals()
+    now = pd.Timestamp.now().floor('s')
+    refresh, fresh, stale = plan_refresh(symbols['code'], cached, pd.Timedelta(hours=args.ttl_hours), now=now,
+                                         max_refresh=args.max_refresh if args.stale_while_revalidate else None)
+    print(f"- {len(symbols)} symbols: {len(refresh)} to refresh, {len(fresh)} cached"
+          + (f", {len(stale)} stale (served from cache)" if stale else ""))
+
+    country = dict(zip(symbols['code'], symbols['country']))
+    results = {}
+
+    # 1. 한국 주식 (종목 메인 페이지를 동시에 요청, 요청 수는 engine 이 제한)
+    kr_codes = [code for code in refresh if country[code] == 'KR']
+    if kr_codes:
+        print(f"- Fetching {len(kr_codes)} Korean stocks...")
+        engine = FetchEngine(rate=args.rate, per_host=args.concurrency, headers=HEADERS)
+
+        async def collect():
+            async for code, data in map_unordered(lambda code: fetch_naver_fundamentals(engine, code),
+                                                  kr_codes, limit=args.concurrency * 2):
+                results[code] = data
+
+        engine.run(collect())
+
+    # 2. 미국 주식
+    us_codes = [code for code in refresh if country[code] == 'US']
+    if us_codes:
+        print(f"- Fetching {len(us_codes)} US stocks...")
+        with ThreadPoolExecutor(max_workers=US_WORKERS) as pool:
+            for ticker, data in zip(us_codes, pool.map(get_us_fundamentals, us_codes)):
+                # 배당수익률 단위 통일 (네이버는 %, yfinance는 소수점)
+                if 'Dividend_Yield' in data and data['Dividend_Yield']:
+                    data['Dividend_Yield'] = data['Dividend_Yield'] * 100
+                results[ticker] = data
+
+    names = symbols.set_index('code')[['name', 'country']]
+    fetched = [dict(data, code=code) for code, data in results.items() if data]
+    # 실패한 종목은 종목명만 갱신 (지표와 fetched_at 은 그대로 두어 기존 값을 쓰고 다음 실행에 다시 시도)
+    failed = [code for code, data in results.items() if not data]
+
+    changed = set()
+    with metrics.span('write'):
+        if fetched:
+            df = pd.DataFrame(fetched)
+            df = df.join(names, on='code')
+            changed = changed_codes(df, cached)
+            df['fetched_at'] = now.strftime(TIMESTAMP_FORMAT)
+            # 값이 바뀐 종목만 changed_at 갱신 (DataFrame 에 없는 컬럼은 upsert 가 기존 값을 유지)
+            save_fundamentals(df[~df['code'].isin(changed)])
+            save_fundamentals(df[df['code'].isin(changed)].assign(changed_at=now.strftime(TIMESTAMP_FORMAT)))
+        if failed:
+            save_fundamentals(names.loc[failed].reset_index())
+
+    metrics.incr('rows_parsed', len(fetched))
+    metrics.incr('fundamentals_refreshed', len(fetched))
+    metrics.incr('fundamentals_changed', len(changed))
+    metrics.incr('fundamentals_failed', len(failed))
+    metrics.incr('fundamentals_cached', len(fresh))
+    metrics.incr('fundamentals_stale', len(stale))
+    print(f"💾 Refreshed fundamentals for {len(fetched)} stocks ({len(changed)} changed, {len(failed)} failed), "
+          f"{len(fresh) + len(stale)} served from cache (stock_data.db fundamentals)")
+    metrics.write('collect_fundamentals')
 
 if __name__ == "__main__":
     main()
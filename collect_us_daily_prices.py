@@ -1,81 +1,163 @@
+import argparse
 import pandas as pd
 import yfinance as yf
 import os
-from datetime import datetime, timedelta
+import metrics
+from price_store import PriceStore
 
-def collect_us_prices():
+# yf.download 한 번에 요청할 티커 수
+BATCH_SIZE = 100
+# 저장된 시세가 없는 티커의 수집 기간
+HISTORY_PERIOD = '2y'
+# 증분 수집은 마지막 저장일 이 기간 전부터 겹쳐 받고, 겹친 완성 봉(마지막 저장일 이전)의 종가가
+# ADJUSTMENT_TOLERANCE 비율 이상 다르면 배당/분할로 수정주가가 바뀐 것으로 보고 전체 기간을 다시 받음
+# (마지막 저장 봉은 장중 수집분일 수 있어 비교하지 않음)
+OVERLAP = pd.Timedelta(days=7)
+ADJUSTMENT_TOLERANCE = 1e-6
+
+def download_prices(tickers, start=None):
+    """
+    여러 티커의 일별 시세를 yf.download 로 묶어서 받습니다.
+    :param tickers: 티커 목록
+    :param start: 시작일 (None 이면 HISTORY_PERIOD)
+    :return: date, open, high, low, close, volume, code DataFrame
+    """
+    frames = []
+    for i in range(0, len(tickers), BATCH_SIZE):
+        batch = list(tickers[i:i + BATCH_SIZE])
+        try:
+            # Ticker.history() 와 같은 수정주가 (auto_adjust), 티커별 컬럼 그룹
+            with metrics.span('fetch'):
+                data = yf.download(batch, **({'start': start} if start is not None else {'period': HISTORY_PERIOD}),
+                                   group_by='ticker', auto_adjust=True, actions=False,
+                                   threads=True, progress=False)
+            metrics.incr('http_requests', len(batch))
+        except Exception as e:
+            print(f"Error fetching batch {batch[0]}..{batch[-1]}: {e}")
+            continue
+        if data is None or data.empty:
+            continue
+
+        for ticker in batch:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                hist = data[ticker]
+            else:
+                hist = data
+            hist = hist.dropna(how='all')
+            if hist.empty:
+                continue
+            # yfinance columns: Open, High, Low, Close, Volume (index: Date)
+            df = pd.DataFrame({
+                'date': pd.to_datetime(hist.index).tz_localize(None).normalize(),
+                'open': hist['Open'].to_numpy(),
+                'high': hist['High'].to_numpy(),
+                'low': hist['Low'].to_numpy(),
+                'close': hist['Close'].to_numpy(),
+                'volume': hist['Volume'].to_numpy(),
+                'code': ticker,  # US stocks use ticker as code
+            })
+            frames.append(df.dropna(subset=['close']))
+    if not frames:
+        return pd.DataFrame(columns=['date', 'open', 'high', 'low', 'close', 'volume', 'code'])
+    return pd.concat(frames, ignore_index=True)
+
+def adjusted_tickers(prices, stored):
+    """
+    겹쳐 받은 봉의 종가가 저장된 값과 달라진 티커 (수정주가가 바뀌어 전체 재수집이 필요한 티커)
+    :param prices: 새로 받은 시세 (code, date, close)
+    :param stored: 같은 기간의 저장된 시세 (code, date, close)
+    """
+    both = stored[['code', 'date', 'close']].merge(prices[['code', 'date', 'close']], on=['code', 'date'],
+                                                   suffixes=('_stored', '_fresh'))
+    changed = (both['close_fresh'] - both['close_stored']).abs() > \
+        ADJUSTMENT_TOLERANCE * both['close_stored'].abs().clip(lower=1.0)
+    return sorted(set(both.loc[changed, 'code']))
+
+def collect_us_prices(full=False):
+    """
+    미국 종목 일별 시세를 수집해 가격 저장소에 반영합니다.
+    :param full: True 이면 저장된 날짜를 무시하고 전체 기간을 다시 수집
+    """
     print("🇺🇸 Collecting US Daily Prices...")
-    
+
     # US 주식 리스트 로드
     if not os.path.exists('us_stocks_list.csv'):
         print("Error: us_stocks_list.csv not found.")
         return
-        
+
     us_stocks = pd.read_csv('us_stocks_list.csv')
-    
+    names = dict(zip(us_stocks['ticker'], us_stocks['name']))
+
+    # 티커별 마지막 저장일 OVERLAP 전부터 다시 받음 (마지막 봉은 장중 수집분일 수 있음)
+    store = PriceStore()
+    last_dates = store.last_dates('US') if store.exists() and not full else {}
+    starts = {}
+    for ticker in us_stocks['ticker']:
+        starts.setdefault(last_dates.get(ticker), []).append(ticker)
+
     all_prices = []
-    
-    for _, row in us_stocks.iterrows():
-        ticker = row['ticker']
-        name = row['name']
-        print(f"Fetching {name} ({ticker})...")
-        
-        try:
-            # 최근 2년 데이터 가져오기
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="2y")
-            
-            if hist.empty:
-                print(f"Warning: No data for {ticker}")
-                continue
-                
-            # 데이터 포맷팅
-            hist = hist.reset_index()
-            hist['date'] = hist['Date'].dt.strftime('%Y-%m-%d')
-            hist['code'] = ticker # US stocks use ticker as code
-            hist['name'] = name
-            
-            # 필요한 컬럼만 선택 및 이름 변경
-            # yfinance columns: Date, Open, High, Low, Close, Volume, Dividends, Stock Splits
-            # target columns: date, open, high, low, close, volume, code, name
-            
-            df = hist[['date', 'Open', 'High', 'Low', 'Close', 'Volume', 'code', 'name']].copy()
-            df.columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'code', 'name']
-            
-            all_prices.append(df)
-            
-        except Exception as e:
-            print(f"Error fetching {ticker}: {e}")
-            
-    if not all_prices:
+    overlaps = []
+    for last, tickers in starts.items():
+        if last is None:
+            print(f"Fetching {len(tickers)} tickers ({HISTORY_PERIOD})...")
+            all_prices.append(download_prices(tickers))
+            continue
+        start = last - OVERLAP
+        print(f"Fetching {len(tickers)} tickers since {start.date()}...")
+        overlaps.append(store.read(codes=tickers, columns=['close'], start=start, end=last - pd.Timedelta(days=1)))
+        all_prices.append(download_prices(tickers, start=start.strftime('%Y-%m-%d')))
+
+    us_prices_df = pd.concat(all_prices, ignore_index=True)
+    # 배당/분할로 과거 수정주가가 바뀐 티커는 저장된 첫 날짜(최소 HISTORY_PERIOD)부터 다시 받아 파티션을 교체
+    # (upsert 하면 다시 받은 기간 밖의 행이 이전 수정주가 기준으로 남음)
+    adjusted = adjusted_tickers(us_prices_df, pd.concat(overlaps, ignore_index=True)) if overlaps else []
+    if adjusted:
+        print(f"Adjusted prices changed for {len(adjusted)} tickers, refetching stored history...")
+        first_dates = store.read(codes=adjusted, columns=['close']).groupby('code')['date'].min()
+        horizon = pd.Timestamp.today().normalize() - pd.DateOffset(years=2)
+        refetch_starts = {}
+        for ticker in adjusted:
+            start = min(first_dates.get(ticker, horizon), horizon)
+            refetch_starts.setdefault(start.strftime('%Y-%m-%d'), []).append(ticker)
+        refetched = [download_prices(tickers, start=start) for start, tickers in refetch_starts.items()]
+        us_prices_df = pd.concat([us_prices_df[~us_prices_df['code'].isin(adjusted)], *refetched],
+                                 ignore_index=True)
+
+    if us_prices_df.empty:
         print("No US price data collected.")
+        metrics.write('collect_us_daily_prices')
         return
 
-    us_prices_df = pd.concat(all_prices, ignore_index=True)
-    
-    # 기존 daily_prices.csv와 병합
-    if os.path.exists('daily_prices.csv'):
-        try:
-            kr_prices_df = pd.read_csv('daily_prices.csv', dtype={'code': str})
-            
-            # 병합 (US + KR)
-            # 주의: 날짜 형식이 다를 수 있으므로 통일 필요하지만, 위에서 YYYY-MM-DD로 맞춤.
-            combined_df = pd.concat([kr_prices_df, us_prices_df], ignore_index=True)
-            
-            # 중복 제거 (혹시 모를 중복 방지)
-            combined_df = combined_df.drop_duplicates(subset=['date', 'code'])
-            
-            # 저장
-            combined_df.to_csv('daily_prices.csv', index=False, encoding='utf-8')
-            print(f"💾 Merged US prices. Total records: {len(combined_df)}")
-            
-        except Exception as e:
-            print(f"Error merging with daily_prices.csv: {e}")
-            # 실패 시 별도 저장
-            us_prices_df.to_csv('us_daily_prices.csv', index=False, encoding='utf-8')
-    else:
-        us_prices_df.to_csv('daily_prices.csv', index=False, encoding='utf-8')
-        print(f"💾 Saved US prices to daily_prices.csv")
+    us_prices_df['name'] = us_prices_df['code'].map(names)
+    metrics.incr('rows_parsed', len(us_prices_df))
+    print(f"Incremental: {sum(len(t) for s, t in starts.items() if s is not None)} tickers, "
+          f"full history: {len(starts.get(None, [])) + len(adjusted)} tickers")
+
+    # 이번 수집분을 세그먼트로 추가한 뒤 US 종목 파티션에만 병합 (KR 데이터는 다시 읽거나 쓰지 않음)
+    with metrics.span('write'):
+        store.append_segment(us_prices_df, market='US')
+    print(f"💾 Saved {len(us_prices_df)} US price records to {store.root}")
+    try:
+        with metrics.span('merge'):
+            # 수정주가가 바뀐 티커는 기존 파티션을 지우고 세그먼트의 전체 기간으로 다시 만듦
+            # (여기서 중단돼도 세그먼트가 남아 다음 compact() 에서 복원됨)
+            refetched_codes = set(us_prices_df['code'])
+            store.remove([t for t in adjusted if t in refetched_codes], market='US')
+            store.compact()
+            store.retain(us_stocks['ticker'], market='US')
+    except Exception as e:
+        # 세그먼트는 그대로 남으므로 다음 compact() 에서 다시 병합됨
+        print(f"Error compacting price store (pending segments kept): {e}")
+    metrics.write('collect_us_daily_prices')
+
+def main():
+    parser = argparse.ArgumentParser(description="미국 종목 일별 시세 수집 (yf.download 일괄 요청, 가격 저장소에 증분 반영)")
+    parser.add_argument('--full', action='store_true',
+                        help=f"저장된 날짜를 무시하고 티커별 최근 {HISTORY_PERIOD} 를 다시 수집")
+    args = parser.parse_args()
+    collect_us_prices(full=args.full)
 
 if __name__ == "__main__":
-    collect_us_prices()
+    main()
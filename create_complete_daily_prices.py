@@ -1,62 +1,123 @@
+import argparse
 import pandas as pd
-import requests
-from datetime import datetime
-import time
 from tqdm import tqdm
 import os
-import io
+import metrics
+from naver_pages import parse_sise_day, parse_frgn, paginate
+from fetch_engine import FetchEngine, map_unordered, DEFAULT_RATE, DEFAULT_PER_HOST
+from price_store import PriceStore
+from data_access import investor_last_dates, save_investor_trends
 
-def get_daily_price(code, pages=10):
+# 저장된 데이터가 없는 종목의 수집 페이지 수 (최근 1년치, 1페이지당 10일)
+FULL_PAGES = 25
+# 이 종목 수마다 수집분을 세그먼트로 기록 (중단돼도 그때까지의 수집분은 유지)
+SEGMENT_TICKERS = 100
+# 전체 수집 시 1페이지 이후 동시에 요청할 페이지 수 (상장 기간이 짧은 종목은 이 범위 안에서 중단)
+PREFETCH_PAGES = 5
+# 통합 수집(--combined): 저장된 데이터가 없을 때 받을 기간, frgn 최대 페이지 수 (20행/페이지)
+# 시가/고가/저가를 보충하는 sise_day 는 10행/페이지라 같은 기간에 두 배의 페이지가 필요
+FULL_DAYS = 365
+FRGN_MAX_PAGES = 30
+SISE_MAX_PAGES = FRGN_MAX_PAGES * 2
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+async def fetch_daily_price(engine, code, pages=10, since=None):
     """
     네이버 금융에서 일별 시세를 가져옵니다.
+    :param engine: FetchEngine (전역 요청 속도/동시성 제한)
     :param code: 종목코드
-    :param pages: 가져올 페이지 수 (1페이지당 10일치)
+    :param pages: 가져올 최대 페이지 수 (1페이지당 10일치, 최신 페이지부터)
+    :param since: 마지막으로 저장된 날짜. 지정하면 이 날짜가 포함된 페이지까지만 요청하고
+                  since 이후(당일 포함, 장중 수집분 갱신) 행만 반환
     :return: DataFrame
     """
     url = f"https://finance.naver.com/item/sise_day.naver?code={code}"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    
-    df_list = []
-    
-    for page in range(1, pages + 1):
-        pg_url = f'{url}&page={page}'
-        try:
-            response = requests.get(pg_url, headers=headers)
-            # pandas read_html을 사용하여 테이블 파싱
-            tables = pd.read_html(io.StringIO(response.text))
-            # 일별 시세 테이블은 보통 첫 번째에 위치하지만, 구조에 따라 다를 수 있음
-            # 네이버 금융 일별 시세 페이지 구조상 첫 번째 테이블이 시세 데이터임
-            df = tables[0].dropna()
-            df_list.append(df)
-            time.sleep(0.1) # 서버 부하 방지
-        except Exception as e:
-            print(f"Error fetching page {page} for code {code}: {e}")
-            break
-            
-    if not df_list:
+
+    async def fetch_page(page):
+        response = await engine.get(f'{url}&page={page}')
+        return await engine.call(parse_sise_day, response.text)
+
+    # 빈/반복된 페이지나 since 이전 날짜가 나오면 중단 (증분 수집은 보통 1페이지)
+    df_list = await paginate(fetch_page, code, pages, since=since,
+                             window=PREFETCH_PAGES if since is None else 1)
+
+    if not df_list or all(len(df) == 0 for df in df_list):
         return None
-        
+
     df = pd.concat(df_list, ignore_index=True)
-    df = df.rename(columns={
-        '날짜': 'date',
-        '종가': 'close',
-        '전일비': 'diff',
-        '시가': 'open',
-        '고가': 'high',
-        '저가': 'low',
-        '거래량': 'volume'
-    })
-    
+
     # 데이터 전처리
-    df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values('date')
     df['code'] = code
-    
+
     return df
 
+async def fetch_combined(engine, code, price_since=None, investor_since=None, ohlc_days=None):
+    """
+    투자자별 매매동향(frgn.naver) 페이지 하나의 흐름으로 일별 시세와 투자자 동향을 함께 가져옵니다.
+    frgn 에 없는 시가/고가/저가만 sise_day 에서 필요한 기간만큼 보충합니다.
+    :param price_since: 마지막 저장 시세 날짜 (None 이면 최근 FULL_DAYS)
+    :param investor_since: 마지막 저장 투자자 동향 날짜 (None 이면 최근 FULL_DAYS)
+    :param ohlc_days: 전체 수집 시 시가/고가/저가를 보충할 최근 거래일 수 (None 이면 받은 날짜 전체,
+                      지정하면 그 이전 행의 시가/고가/저가는 NaN)
+    :return: (시세 DataFrame, 투자자 동향 DataFrame) - 없으면 각각 None
+    """
+    horizon = pd.Timestamp.today().normalize() - pd.Timedelta(days=FULL_DAYS)
+    full_history = price_since is None
+    price_since = horizon if full_history else price_since
+    investor_since = horizon if investor_since is None else investor_since
+
+    async def fetch_page(url, parse, page):
+        response = await engine.get(f'{url}&page={page}')
+        return await engine.call(parse, response.text)
+
+    frgn_url = f"https://finance.naver.com/item/frgn.naver?code={code}"
+    frgn = await paginate(lambda page: fetch_page(frgn_url, parse_frgn, page),
+                          code, FRGN_MAX_PAGES, since=min(price_since, investor_since))
+    if not frgn:
+        return None, None
+    frgn = pd.concat(frgn, ignore_index=True).sort_values('date', ignore_index=True)
+
+    investor = frgn.loc[frgn['date'] >= investor_since, ['date', 'institution_net_buy', 'foreigner_net_buy']]
+    prices = frgn.loc[frgn['date'] >= price_since, ['date', 'close', 'diff', 'volume']]
+    if len(prices):
+        # 시가/고가/저가는 새로 받은 날짜 전체를 sise_day 에서 보충 (ohlc_days 를 주면 전체 수집 시 최근 거래일만)
+        ohlc_since = prices['date'].iloc[max(0, len(prices) - ohlc_days)] \
+            if full_history and ohlc_days is not None else prices['date'].iloc[0]
+        sise_url = f"https://finance.naver.com/item/sise_day.naver?code={code}"
+        sise = await paginate(lambda page: fetch_page(sise_url, parse_sise_day, page),
+                              code, SISE_MAX_PAGES, since=ohlc_since)
+        ohlc = pd.concat(sise, ignore_index=True) if sise else pd.DataFrame(columns=['date', 'open', 'high', 'low'])
+        prices = prices.merge(ohlc[['date', 'open', 'high', 'low']], on='date', how='left')
+        prices['code'] = code
+    investor = investor.assign(code=code)
+    return (prices if len(prices) else None), (investor if len(investor) else None)
+
+def get_daily_price(code, pages=10, since=None, engine=None):
+    """
+    fetch_daily_price() 의 동기 버전 (단일 종목).
+    :param engine: FetchEngine (None 이면 기본 속도 제한으로 생성)
+    """
+    engine = engine or FetchEngine(headers=HEADERS)
+    return engine.run(fetch_daily_price(engine, code, pages, since))
+
 def main():
+    parser = argparse.ArgumentParser(description="국내 종목 일별 시세 수집 (가격 저장소에 증분 반영)")
+    parser.add_argument('--full', action='store_true',
+                        help="저장된 날짜를 무시하고 종목별 최근 1년치를 다시 수집")
+    parser.add_argument('--combined', action='store_true',
+                        help="frgn.naver 페이지로 시세와 투자자 동향을 함께 수집 (시가/고가/저가만 sise_day 에서 보충)")
+    parser.add_argument('--ohlc-days', type=int, default=None,
+                        help="통합 수집에서 저장된 시세가 없는 종목의 시가/고가/저가를 최근 N 거래일만 받음 "
+                             "(기본: 받은 기간 전체, 그 이전 행의 시가/고가/저가는 비어 있음)")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help="전체 초당 요청 수 상한")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_PER_HOST,
+                        help="네이버 금융 동시 요청 수 상한")
+    args = parser.parse_args()
+
     print("Starting daily price collection...")
-    
+
     # 종목 리스트 로드
     try:
         stocks = pd.read_csv('korean_stocks_list.csv', dtype={'ticker': str})
@@ -64,28 +125,78 @@ def main():
         print("Error: korean_stocks_list.csv not found.")
         return
 
-    all_data = []
-    
-    # 기존 데이터가 있다면 로드하여 증분 수집 (여기서는 단순화를 위해 매번 새로 수집하거나 덮어쓰기)
-    # 실제 운영 시에는 기존 파일 로드 후 최신 날짜 이후만 수집하는 로직 필요
-    
-    for _, row in tqdm(stocks.iterrows(), total=len(stocks), desc="Collecting Data"):
-        code = row['ticker']
-        name = row['name']
-        
-        # 최근 1년치 데이터 (약 25페이지) 수집
-        df = get_daily_price(code, pages=25)
-        
-        if df is not None:
-            df['name'] = name
-            all_data.append(df)
-            
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        final_df.to_csv('daily_prices.csv', index=False)
-        print(f"Successfully saved {len(final_df)} rows to daily_prices.csv")
+    pending = []
+    saved_rows = 0
+
+    # 종목별 마지막 저장 날짜 이후만 수집 (보통 종목당 1페이지 요청)
+    store = PriceStore()
+    last_dates = store.last_dates('KR') if store.exists() and not args.full else {}
+    incremental = sum(code in last_dates for code in stocks['ticker'])
+
+    def flush():
+        nonlocal pending, saved_rows
+        if pending:
+            with metrics.span('write'):
+                segment = pd.concat(pending, ignore_index=True)
+                store.append_segment(segment, market='KR')
+            saved_rows += len(segment)
+            pending = []
+
+    engine = FetchEngine(rate=args.rate, per_host=args.concurrency, headers=HEADERS)
+
+    investor_rows = []
+    if args.combined:
+        # 전체 재수집 시 시가/고가/저가 보충 기간 밖의 행은 이미 저장된 종목이면 기록하지 않음 (기존 OHLC 유지)
+        stored_codes = set(store.codes('KR')) if store.exists() else set()
+        investor_dates = investor_last_dates() if not args.full else {}
+
+    async def collect_one(row):
+        code, name = row
+        if not args.combined:
+            return name, await fetch_daily_price(engine, code, pages=FULL_PAGES, since=last_dates.get(code))
+        prices, investor = await fetch_combined(engine, code, last_dates.get(code), investor_dates.get(code),
+                                                ohlc_days=args.ohlc_days)
+        if investor is not None:
+            investor_rows.append(investor)
+        if prices is not None and code in stored_codes and code not in last_dates:
+            prices = prices.dropna(subset=['open'])
+        return name, prices
+
+    async def collect():
+        # 여러 종목을 동시에 진행 (요청 수는 engine 이 제한)
+        rows = zip(stocks['ticker'], stocks['name'])
+        with tqdm(total=len(stocks), desc="Collecting Data") as progress:
+            async for name, df in map_unordered(collect_one, rows, limit=args.concurrency * 2):
+                progress.update()
+                if df is not None and len(df):
+                    df['name'] = name
+                    pending.append(df)
+                    if len(pending) >= SEGMENT_TICKERS:
+                        flush()
+
+    engine.run(collect())
+    flush()
+    if investor_rows:
+        # (code, date) 기준 upsert: 이전 수집분은 유지하고 겹치는 날짜만 교체
+        with metrics.span('write'):
+            saved = save_investor_trends(pd.concat(investor_rows, ignore_index=True))
+        print(f"Successfully saved {saved} rows to stock_data.db (investor_trends)")
+
+    print(f"Incremental: {incremental} codes, full history: {len(stocks) - incremental} codes")
+    saved_requests = metrics.snapshot('create_complete_daily_prices')['counters'].get('requests_saved', 0)
+    print(f"Requests saved by early termination: {saved_requests:,} ({saved_requests / max(len(stocks), 1):.1f} per ticker)")
+    # 세그먼트를 종목 파티션에 병합 (실패해도 세그먼트는 남아 다음 실행에서 병합됨)
+    try:
+        with metrics.span('merge'):
+            store.compact()
+            store.retain(stocks['ticker'], market='KR')
+    except Exception as e:
+        print(f"Error compacting price store (pending segments kept): {e}")
+    if saved_rows:
+        print(f"Successfully saved {saved_rows} rows to {store.root}")
     else:
         print("No data collected.")
+    metrics.write('create_complete_daily_prices')
 
 if __name__ == "__main__":
     main()
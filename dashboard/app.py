@@ -2,7 +2,7 @@ import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
-from utils import load_analysis_results, load_daily_prices, load_ai_report
+from utils import load_analysis_results, find_data_dir, load_stock_prices, load_ai_report, add_moving_averages
 
 st.set_page_config(page_title="StockAI Dashboard", layout="wide", page_icon="🥝")
 
@@ -14,7 +14,8 @@ def main():
     
     # 데이터 로드
     results_df = load_analysis_results()
-    prices_df = load_daily_prices()
+    # 시세는 선택한 종목만 읽음 (전체 로드 후 필터링하지 않음)
+    has_prices = find_data_dir() is not None
     ai_report = load_ai_report()
     
     if results_df is None:
@@ -73,7 +74,7 @@ def main():
     with tab2:
         st.header("Detailed Chart Analysis")
         
-        if prices_df is not None:
+        if has_prices:
             # 국가 필터
             market_filter = st.radio("Select Market", ["All", "Korea", "USA"], horizontal=True)
             
@@ -95,9 +96,9 @@ def main():
                 if code_str.isdigit():
                     code_str = code_str.zfill(6)
                     
-                stock_data = prices_df[prices_df['code'] == code_str].copy()
+                stock_data = load_stock_prices(code_str)
                 
-                if not stock_data.empty:
+                if stock_data is not None and not stock_data.empty:
                     # 캔들스틱 차트 생성
                     fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
                                         vertical_spacing=0.03, subplot_titles=('Price', 'Volume'), 
@@ -112,8 +113,7 @@ def main():
                                     name='OHLC'), row=1, col=1)
                     
                     # MA Lines
-                    stock_data['ma20'] = stock_data['close'].rolling(window=20).mean()
-                    stock_data['ma50'] = stock_data['close'].rolling(window=50).mean()
+                    stock_data = add_moving_averages(stock_data)
                     
                     fig.add_trace(go.Scatter(x=stock_data['date'], y=stock_data['ma20'], line=dict(color='orange', width=1), name='MA20'), row=1, col=1)
                     fig.add_trace(go.Scatter(x=stock_data['date'], y=stock_data['ma50'], line=dict(color='green', width=1), name='MA50'), row=1, col=1)
@@ -1,5 +1,13 @@
 import pandas as pd
+import numpy as np
 import os
+import sys
+
+# 분석 엔진과 같은 롤링 커널 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import kernels
+import data_access
+import price_cube
 
 def load_analysis_results():
     """분석 결과 데이터를 로드합니다."""
@@ -19,23 +27,43 @@ def load_analysis_results():
         print(f"Error loading analysis results: {e}")
         return None
 
-def load_daily_prices():
-    """일별 시세 데이터를 로드합니다."""
+def find_data_dir():
+    """데이터가 있는 디렉터리 (대시보드 디렉토리에서 실행될 경우 상위 디렉토리)"""
+    for d in ['.', '..']:
+        if data_access.has_prices(d):
+            return d
+    return None
+
+def load_daily_prices(codes=None):
+    """
+    일별 시세 데이터를 로드합니다. (가격 저장소 우선, 없으면 CSV)
+    :param codes: 종목코드 목록 (None 이면 전체, 저장소에서는 해당 종목 파티션만 읽음)
+    """
     try:
-        path = 'daily_prices.csv'
-        if not os.path.exists(path):
-            path = '../daily_prices.csv'
-            
-        if os.path.exists(path):
-            df = pd.read_csv(path, dtype={'code': str})
-            df['date'] = pd.to_datetime(df['date'])
-            return df
-        else:
+        data_dir = find_data_dir()
+        if data_dir is None:
             return None
+        return data_access.load_prices(codes=codes, data_dir=data_dir)
     except Exception as e:
         print(f"Error loading daily prices: {e}")
         return None
 
+def load_stock_prices(code):
+    """차트용 단일 종목 시세 (date 순, 최신 가격 큐브가 있으면 memmap 에서 해당 행만 읽음)"""
+    data_dir = find_data_dir()
+    cube = price_cube.open_fresh(data_dir=data_dir) if data_dir is not None else None
+    if cube is not None:
+        return cube.frame([code])
+    return load_daily_prices(codes=[code])
+
+def add_moving_averages(stock_data, windows=(20, 50)):
+    """차트용 이동평균선 컬럼(ma20, ma50 등)을 추가합니다. (날짜순 단일 종목)"""
+    close = stock_data['close'].to_numpy(dtype=np.float64)
+    offsets = np.array([0, len(close)])
+    for window in windows:
+        stock_data[f'ma{window}'] = kernels.rolling_mean(close, offsets, window)
+    return stock_data
+
 def load_ai_report():
     """가장 최근의 AI 분석 리포트를 로드합니다."""
     try:
@@ -0,0 +1,252 @@
+"""
+분석기/대시보드/백테스트 공용 데이터 접근 모듈.
+
+    일별 시세   : price_store/ (시장/종목별 Parquet)   -> 없으면 daily_prices.csv
+    투자자 수급 : stock_data.db investor_trends       -> 없으면 all_institutional_trend_data.csv
+    재무 지표   : stock_data.db fundamentals          -> 없으면 fundamentals.csv
+
+저장 위치를 모르는 호출부는 이 모듈의 load_*/save_* 함수만 사용합니다.
+종목(codes) 조건은 저장소에서는 파티션/기본키 인덱스로 걸러지고, CSV 에서는 전체를 읽은 뒤 걸러집니다.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore, DEFAULT_ROOT as PRICE_STORE_ROOT, PART_FILE
+from stock_db import StockDB, DEFAULT_DB
+
+PRICES_CSV = 'daily_prices.csv'
+INVESTOR_CSV = 'all_institutional_trend_data.csv'
+FUNDAMENTALS_CSV = 'fundamentals.csv'
+
+PRICE_DATE_FORMAT = '%Y-%m-%d'
+
+def parse_dates(series):
+    """YYYY-MM-DD 형식으로 파싱하고, 형식이 다르면 자동 추론으로 재시도"""
+    try:
+        return pd.to_datetime(series, format=PRICE_DATE_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(series)
+
+def downcast_numeric(df):
+    """
+    정수 컬럼은 표현 가능한 가장 작은 정수 타입으로, 실수 컬럼은
+    float32 로 바꿔도 모든 값이 그대로일 때만 float32 로 줄입니다 (지표 계산 결과 불변).
+    """
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+            values = series.to_numpy(dtype=np.float64)
+            compact = values.astype(np.float32)
+            if np.array_equal(compact.astype(np.float64), values, equal_nan=True):
+                df[col] = compact
+    return df
+
+def read_typed_csv(path, categories=('code', 'name')):
+    """
+    가격/수급 CSV 를 메모리 효율적인 타입으로 읽습니다.
+    종목코드/종목명은 category, 날짜는 고정 형식으로 파싱하고
+    숫자 컬럼은 값 손실 없이 가장 작은 타입으로 줄입니다.
+    :param categories: category 로 읽을 문자열 컬럼
+    :return: DataFrame
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    # 날짜도 종목 수만큼 반복되므로 category 로 읽고 고유값만 파싱
+    dtypes = {col: 'category' for col in list(categories) + ['date'] if col in header}
+    df = pd.read_csv(path, dtype=dtypes)
+    if 'date' in df.columns:
+        dates = df['date']
+        parsed = parse_dates(pd.Series(dates.cat.categories)).to_numpy()
+        codes = dates.cat.codes.to_numpy()
+        df['date'] = np.where(codes >= 0, parsed[codes], np.datetime64('NaT'))
+    return downcast_numeric(df)
+
+def read_typed_prices(store_root=PRICE_STORE_ROOT, csv_path=PRICES_CSV):
+    """
+    일별 시세를 read_typed_csv() 와 같은 타입으로 읽습니다.
+    가격 저장소(price_store)가 있으면 그쪽을, 없으면 CSV 를 사용합니다.
+    """
+    store = PriceStore(store_root)
+    if not store.exists():
+        return read_typed_csv(csv_path)
+    return downcast_numeric(store.read(categorical=True).drop(columns=['market']))
+
+def _join_keys(codes, dates):
+    """(종목 카테고리 번호, 일자)를 정렬 가능한 int64 키 하나로 결합 (일 단위 날짜 기준)"""
+    days = dates.to_numpy().astype('datetime64[D]').view(np.int64)
+    return (codes.cat.codes.to_numpy().astype(np.int64) << 32) | (days + 2**31)
+
+def sorted_key_join(left, right, fill_zero=()):
+    """
+    (code, date) 기준 left join 을 해시 병합 대신 정렬된 정수 키 탐색으로 수행합니다.
+    right 에 같은 키가 여러 행이면 마지막 행을 사용합니다.
+    :param left, right: load_*(typed=True) 결과 (code 는 category)
+    :param fill_zero: 매칭되지 않은 행을 0 으로 채울 right 컬럼 (그 외 컬럼은 NaN)
+    :return: (code, date) 순으로 정렬된 DataFrame
+    """
+    # 양쪽 종목코드를 같은 (정렬된) 카테고리로 맞춰야 키가 비교 가능
+    codes = sorted(set(left['code'].cat.categories) | set(right['code'].cat.categories))
+    left = left.assign(code=left['code'].cat.set_categories(codes))
+    right = right.assign(code=right['code'].cat.set_categories(codes))
+
+    left_key = _join_keys(left['code'], left['date'])
+    order = np.argsort(left_key, kind='stable')
+    merged = left.iloc[order].reset_index(drop=True)
+    left_key = left_key[order]
+
+    right_key = _join_keys(right['code'], right['date'])
+    right_order = np.argsort(right_key, kind='stable')
+    right_key = right_key[right_order]
+
+    pos = np.searchsorted(right_key, left_key, side='right') - 1
+    if len(right_key):
+        safe = np.clip(pos, 0, None)
+        matched = (pos >= 0) & (right_key[safe] == left_key)
+        rows = right_order[safe]
+    else:
+        matched = np.zeros(len(left_key), dtype=bool)
+        rows = None
+
+    for col in right.columns:
+        if col in ('code', 'date') or col in merged.columns:
+            continue
+        values = right[col].to_numpy()[rows] if rows is not None else np.full(len(merged), np.nan)
+        if col in fill_zero:
+            merged[col] = np.where(matched, values, 0)
+        else:
+            merged[col] = pd.Series(values).where(matched)
+    return merged
+
+def _filter_codes(df, codes):
+    if codes is None:
+        return df
+    return df[df['code'].astype(str).isin([str(c) for c in codes])].reset_index(drop=True)
+
+def has_prices(data_dir='.'):
+    """일별 시세 저장소 또는 CSV 가 있는지"""
+    return PriceStore(os.path.join(data_dir, PRICE_STORE_ROOT)).exists() or \
+        os.path.exists(os.path.join(data_dir, PRICES_CSV))
+
+def load_prices(codes=None, start=None, end=None, typed=False, data_dir='.'):
+    """
+    일별 시세를 (code, date) 순으로 읽습니다.
+    :param codes: 종목코드 목록 (None 이면 전체)
+    :param start, end: 날짜 범위 (포함)
+    :param typed: True 이면 read_typed_csv() 와 같은 압축 타입 (분석기용)
+    :param data_dir: 데이터 디렉터리
+    :return: DataFrame (데이터가 없으면 FileNotFoundError)
+    """
+    store = PriceStore(os.path.join(data_dir, PRICE_STORE_ROOT))
+    if store.exists():
+        df = store.read(codes=codes, start=start, end=end, categorical=typed).drop(columns=['market'])
+        return downcast_numeric(df) if typed else df
+
+    path = os.path.join(data_dir, PRICES_CSV)
+    if typed:
+        df = read_typed_csv(path)
+    else:
+        df = pd.read_csv(path, dtype={'code': str})
+        df['date'] = parse_dates(df['date'])
+    df = _filter_codes(df, codes)
+    if start is not None:
+        df = df[df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['date'] <= pd.Timestamp(end)]
+    return df.sort_values(['code', 'date'], kind='mergesort').reset_index(drop=True)
+
+def load_investor_trends(codes=None, start=None, end=None, typed=False, data_dir='.'):
+    """
+    투자자별 순매수 (code, date, institution_net_buy, foreigner_net_buy) 를 읽습니다.
+    :param start, end: 날짜 범위 (포함)
+    :param typed: True 이면 code 를 category 로, 숫자는 압축 타입으로
+    :return: DataFrame (데이터가 없으면 FileNotFoundError)
+    """
+    db = StockDB(os.path.join(data_dir, DEFAULT_DB))
+    if db.exists():
+        df = db.read('investor_trends', codes=codes, start=start, end=end)
+        if typed:
+            df['code'] = df['code'].astype('category')
+            df = downcast_numeric(df)
+        return df
+
+    path = os.path.join(data_dir, INVESTOR_CSV)
+    if typed:
+        df = read_typed_csv(path)
+    else:
+        df = pd.read_csv(path, dtype={'code': str})
+        df['date'] = parse_dates(df['date'])
+    df = _filter_codes(df, codes)
+    if start is not None:
+        df = df[df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['date'] <= pd.Timestamp(end)]
+    return df
+
+NET_BUY_COLUMNS = ['institution_net_buy', 'foreigner_net_buy']
+
+def load_merged(start=None, data_dir='.'):
+    """
+    일별 시세에 투자자 순매수를 (code, date) 로 붙인 분석용 프레임 (압축 타입, code, date 순).
+    투자자 데이터가 없는 행의 순매수는 0 입니다.
+    :param start: 이 날짜 이후만 (None 이면 전체)
+    """
+    prices = load_prices(start=start, typed=True, data_dir=data_dir)
+    investor = load_investor_trends(start=start, typed=True, data_dir=data_dir)
+    return sorted_key_join(prices, investor, fill_zero=NET_BUY_COLUMNS)
+
+def source_signature(data_dir='.'):
+    """
+    시세/수급 원본 파일들의 (개수, 총 크기, 최종 수정 시각) 요약.
+    값이 같으면 원본이 바뀌지 않은 것으로 보고 파생 데이터(price_cube)를 재사용합니다.
+    """
+    paths = []
+    store_root = os.path.join(data_dir, PRICE_STORE_ROOT)
+    if PriceStore(store_root).exists():
+        for market in os.scandir(store_root):
+            if market.is_dir() and market.name.startswith('market='):
+                paths += [os.path.join(code.path, PART_FILE) for code in os.scandir(market.path)
+                          if code.name.startswith('code=')]
+    else:
+        paths.append(os.path.join(data_dir, PRICES_CSV))
+    db_path = os.path.join(data_dir, DEFAULT_DB)
+    paths += [db_path, f'{db_path}-wal'] if os.path.exists(db_path) else [os.path.join(data_dir, INVESTOR_CSV)]
+
+    count = size = mtime = 0
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        count += 1
+        size += st.st_size
+        mtime = max(mtime, st.st_mtime_ns)
+    return {'files': count, 'bytes': size, 'mtime_ns': mtime}
+
+def load_fundamentals(codes=None, data_dir='.'):
+    """
+    종목별 재무 지표를 읽습니다. 데이터가 없으면 빈 DataFrame.
+    """
+    db = StockDB(os.path.join(data_dir, DEFAULT_DB))
+    if db.exists():
+        return db.read('fundamentals', codes=codes)
+    path = os.path.join(data_dir, FUNDAMENTALS_CSV)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return _filter_codes(pd.read_csv(path, dtype={'code': str}), codes)
+
+def investor_last_dates(data_dir='.'):
+    """종목별 마지막 투자자 동향 날짜 {code: Timestamp} (DB 가 없으면 빈 dict)"""
+    return StockDB(os.path.join(data_dir, DEFAULT_DB)).last_dates('investor_trends')
+
+def save_investor_trends(df, data_dir='.'):
+    """투자자별 순매수를 (code, date) 기준으로 upsert"""
+    return StockDB(os.path.join(data_dir, DEFAULT_DB)).upsert('investor_trends', df)
+
+def save_fundamentals(df, data_dir='.'):
+    """재무 지표를 code 기준으로 upsert"""
+    return StockDB(os.path.join(data_dir, DEFAULT_DB)).upsert('fundamentals', df)
@@ -4,7 +4,7 @@ set -e
 echo "🐳 StockAI Container Started"
 
 # Check if data exists
-if [ ! -f "daily_prices.csv" ]; then
+if [ ! -f "price_store/_schema.json" ] && [ ! -f "daily_prices.csv" ]; then
     echo "📉 No data found. Running initial analysis..."
     python run_analysis.py
 else
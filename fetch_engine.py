@@ -0,0 +1,137 @@
+"""
+수집기 공용 asyncio 요청 엔진.
+
+- 전역 토큰 버킷으로 초당 요청 수 제한 (기본 10회/초 = 기존 직렬 수집의 time.sleep(0.1) 과 같은 상한).
+  HttpClient 의 재시도와 hedge 요청도 보내기 전에 토큰을 하나씩 받음
+- 호스트별 동시 요청 수 제한 (세마포어)
+- 요청/파싱은 스레드 풀에서 실행하므로 이벤트 루프는 막히지 않고, 여러 종목의 페이지가 동시에 진행됨
+
+    engine = FetchEngine(rate=10, per_host=8, headers=HEADERS)
+
+    async def collect():
+        async for result in map_unordered(fetch_one, codes, limit=16):
+            ...
+
+    engine.run(collect())
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import http_client
+
+DEFAULT_RATE = 10.0
+DEFAULT_PER_HOST = 8
+
+class TokenBucket:
+    """초당 rate 개씩 채워지고 최대 burst 개까지 쌓이는 토큰 버킷 (이벤트 루프 안에서만 사용)"""
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: 초당 허용 요청 수
+        :param burst: 한 번에 몰아서 쓸 수 있는 최대 토큰 수 (기본: rate, 최소 1)
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate}")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        """토큰 하나를 쓸 수 있을 때까지 대기"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class FetchEngine:
+    def __init__(self, rate=DEFAULT_RATE, per_host=DEFAULT_PER_HOST, burst=None, headers=None, max_workers=None,
+                 client=None):
+        """
+        :param rate: 전체 초당 요청 수 상한
+        :param per_host: 호스트별 동시 요청 수 상한
+        :param burst: 토큰 버킷 크기 (기본: rate)
+        :param headers: 모든 요청에 붙일 HTTP 헤더
+        :param max_workers: 요청/파싱 스레드 수 (기본: per_host * 2)
+        :param client: HttpClient (기본: http_client 의 공유 클라이언트)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.per_host = max(1, int(per_host))
+        self.headers = headers or {}
+        self.client = client or http_client.client
+        self.max_workers = max_workers or self.per_host * 2
+        self._executor = None
+        self._bucket = None
+        self._host_limits = {}
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fetch')
+        return self._executor
+
+    async def call(self, func, *args, **kwargs):
+        """블로킹 함수(HTML 파싱 등)를 스레드 풀에서 실행"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), functools.partial(func, *args, **kwargs))
+
+    async def get(self, url):
+        """
+        속도/동시성 제한을 지키며 GET 요청을 보냅니다 (타임아웃/재시도는 HttpClient 가 처리).
+        :return: requests.Response
+        """
+        # 캐시된 응답은 속도 제한 없이 바로 반환
+        response = self.client.cached(url)
+        if response is not None:
+            return response
+        # 버킷/세마포어는 실행 중인 이벤트 루프에 묶이므로 run() 마다 새로 생성
+        if self._bucket is None:
+            self._bucket = TokenBucket(self.rate, self.burst)
+        host = urlsplit(url).netloc
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        loop = asyncio.get_running_loop()
+        bucket = self._bucket
+
+        def acquire():
+            # 스레드 풀에서 호출됨: 토큰 버킷은 이벤트 루프에서 기다림
+            asyncio.run_coroutine_threadsafe(bucket.acquire(), loop).result()
+
+        async with limit:
+            return await self.call(self.client.get, url, headers=self.headers, acquire=acquire)
+
+    def run(self, coro):
+        """코루틴을 새 이벤트 루프에서 실행하고 스레드 풀을 정리합니다."""
+        self._bucket = None
+        self._host_limits = {}
+        try:
+            return asyncio.run(coro)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+async def map_unordered(func, items, limit):
+    """
+    items 각각에 코루틴 함수 func 를 최대 limit 개까지 동시에 실행하고 끝난 순서대로 결과를 냅니다.
+    (전체 종목을 한꺼번에 태스크로 만들지 않아 메모리가 종목 수에 비례해 늘지 않음)
+    """
+    items = iter(items)
+    pending = set()
+    for item in items:
+        pending.add(asyncio.ensure_future(func(item)))
+        if len(pending) >= limit:
+            break
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            for item in items:
+                pending.add(asyncio.ensure_future(func(item)))
+                break
+            yield task.result()
@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+import metrics
 
 def get_us_stocks_list():
     """미국 주식 및 ETF 리스트 정의"""
@@ -71,10 +72,12 @@ def main():
     
     # 저장
     filename = 'us_stocks_list.csv'
-    df.to_csv(filename, index=False, encoding='utf-8')
+    with metrics.span('write'):
+        df.to_csv(filename, index=False, encoding='utf-8')
     
     print(f"💾 Saved {len(df)} US stocks to {filename}")
     print(df)
+    metrics.write('fetch_us_stocks')
 
 if __name__ == "__main__":
     main()
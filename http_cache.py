@@ -0,0 +1,217 @@
+"""
+수집기 HTTP 응답 디스크 캐시 (http_client 가 사용).
+
+    http_cache/
+     ┣ index/<sha256(url)>.json     # URL, 상태 코드, 인코딩, 수집 시각, 본문 해시
+     ┗ blobs/ab/<sha256(본문)>       # 본문 (같은 내용은 한 번만 저장)
+
+- URL 패턴별 TTL (TTL_RULES): 장중에 바뀌는 최신 페이지는 짧게, 지난 페이지는 길게,
+  규칙에 없는 URL 은 캐시하지 않음. 날짜별 페이지(sise_day, frgn)는 TTL 과 관계없이 다음 거래일
+  경계(09:00 KST 개장)를 지나면 만료되어, 새 거래일로 페이지 경계가 밀린 뒤 지난 페이지를 섞어 쓰지 않음
+- 모드 (STOCKAI_HTTP_CACHE 환경 변수)
+    off    : 캐시 사용 안 함 (환경 변수가 없을 때. run_analysis.py 는 --http-cache 기본값 on 으로 설정)
+    on     : TTL 안의 응답은 캐시에서, 나머지는 네트워크에서 받아 저장
+    replay : 캐시만 사용 (TTL 무시, 없는 URL 은 CacheMiss) - 기록해 둔 응답으로 오프라인 수집/벤치마크/CI
+- 위치는 STOCKAI_HTTP_CACHE_DIR (기본 http_cache/)
+
+    STOCKAI_HTTP_CACHE=on python create_complete_daily_prices.py      # 수집하면서 기록
+    STOCKAI_HTTP_CACHE=replay python create_complete_daily_prices.py  # 네트워크 없이 재실행
+    python http_cache.py info
+    python http_cache.py prune                                        # 만료 항목 정리
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_MODE_ENV = 'STOCKAI_HTTP_CACHE'
+CACHE_DIR_ENV = 'STOCKAI_HTTP_CACHE_DIR'
+DEFAULT_CACHE_DIR = 'http_cache'
+MODES = ('off', 'on', 'replay')
+
+# (URL 정규식, TTL 초, 거래일 경계에서 만료 여부) - 처음 일치하는 규칙 적용
+TTL_RULES = (
+    # 일별 시세/투자자 동향 1페이지는 장중에 계속 바뀜
+    (re.compile(r'/item/(sise_day|frgn)\.naver\?(.*&)?page=1(&|$)'), 10 * 60, True),
+    # 지난 페이지의 행은 바뀌지 않지만, 새 거래일이 시작되면 페이지 경계가 하루씩 밀리므로
+    # 같은 거래일 안에서만 유지 (1페이지와 다른 거래일에 받은 페이지를 섞으면 경계의 날짜가 빠짐)
+    (re.compile(r'/item/(sise_day|frgn)\.naver\?'), 20 * 60 * 60, True),
+    # 종목 메인(재무 지표)
+    (re.compile(r'/item/main\.naver\?'), 24 * 60 * 60, False),
+    # 순위 페이지
+    (re.compile(r'/sise/sise_\w+\.naver'), 10 * 60, False),
+)
+# 거래일 경계: 한국 시장 개장 시각 09:00 KST (UTC+9, 서머타임 없음) = 00:00 UTC
+KST_OFFSET = 9 * 60 * 60
+SESSION_OPEN = 9 * 60 * 60
+
+class CacheMiss(requests.RequestException):
+    """replay 모드에서 기록되지 않은 URL 을 요청한 경우"""
+
+def _rule(url):
+    for pattern, ttl, per_session in TTL_RULES:
+        if pattern.search(url):
+            return ttl, per_session
+    return None, False
+
+def ttl_for(url):
+    """URL 의 캐시 TTL (초, 캐시 대상이 아니면 None)"""
+    return _rule(url)[0]
+
+def trading_session(timestamp):
+    """timestamp (epoch 초) 가 속한 거래일 번호 (매일 09:00 KST 에 1 증가)"""
+    return int((timestamp + KST_OFFSET - SESSION_OPEN) // (24 * 60 * 60))
+
+def is_expired(url, fetched_at, now=None):
+    """
+    fetched_at 에 받은 url 응답이 만료됐는지 (캐시 대상이 아니면 True).
+    TTL 이 지났거나, 거래일 경계 규칙이면 받은 뒤 다음 거래일이 시작된 경우.
+    """
+    now = time.time() if now is None else now
+    ttl, per_session = _rule(url)
+    if ttl is None or now - fetched_at > ttl:
+        return True
+    return per_session and trading_session(now) != trading_session(fetched_at)
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+class HttpCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, mode='on'):
+        """
+        :param root: 캐시 디렉터리
+        :param mode: 'on' 또는 'replay'
+        """
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.root = root
+        self.mode = mode
+
+    def _index_path(self, url):
+        return os.path.join(self.root, 'index', f"{_sha256(url.encode('utf-8'))}.json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], digest)
+
+    def _write(self, path, data):
+        # 스레드/프로세스가 같은 항목을 동시에 써도 완성된 파일만 보이도록
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, url):
+        """
+        캐시된 응답을 반환합니다.
+        :return: requests.Response (없거나 만료됐으면 None, replay 모드에서 없으면 CacheMiss)
+        """
+        ttl = ttl_for(url)
+        if ttl is None and self.mode != 'replay':
+            return None
+        try:
+            with open(self._index_path(url), encoding='utf-8') as f:
+                entry = json.load(f)
+            if self.mode != 'replay' and is_expired(url, entry['fetched_at']):
+                return None
+            with open(self._blob_path(entry['body']), 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError, KeyError):
+            if self.mode == 'replay':
+                raise CacheMiss(f"Not in HTTP cache (replay mode): {url}")
+            return None
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = url
+        response.encoding = entry.get('encoding')
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response._content = body
+        return response
+
+    def put(self, url, response):
+        """성공(200) 응답을 저장 (캐시 대상 URL 만)"""
+        if response.status_code != 200 or ttl_for(url) is None:
+            return
+        body = response.content
+        digest = _sha256(body)
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            self._write(blob_path, body)
+        entry = {
+            'url': url,
+            'status': response.status_code,
+            'encoding': response.encoding,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() == 'content-type'},
+            'fetched_at': time.time(),
+            'body': digest,
+        }
+        self._write(self._index_path(url), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+    def entries(self):
+        """저장된 인덱스 항목 목록"""
+        index_dir = os.path.join(self.root, 'index')
+        if not os.path.isdir(index_dir):
+            return []
+        entries = []
+        for name in sorted(os.listdir(index_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(index_dir, name), encoding='utf-8') as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def prune(self):
+        """
+        만료된 항목과 참조되지 않는 본문을 삭제합니다.
+        :return: 삭제한 항목 수
+        """
+        now = time.time()
+        removed = 0
+        live = set()
+        for entry in self.entries():
+            if is_expired(entry['url'], entry['fetched_at'], now):
+                os.remove(self._index_path(entry['url']))
+                removed += 1
+            else:
+                live.add(entry['body'])
+        blob_dir = os.path.join(self.root, 'blobs')
+        for dirpath, _, filenames in os.walk(blob_dir):
+            for name in filenames:
+                if name not in live:
+                    os.remove(os.path.join(dirpath, name))
+        return removed
+
+def from_env():
+    """환경 변수 설정에 따른 캐시 (off 면 None)"""
+    mode = os.environ.get(CACHE_MODE_ENV, 'off').lower()
+    if mode == 'off':
+        return None
+    return HttpCache(os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR, mode)
+
+def main():
+    parser = argparse.ArgumentParser(description="수집기 HTTP 응답 캐시 관리")
+    parser.add_argument('command', choices=['info', 'prune'])
+    parser.add_argument('--root', default=os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = HttpCache(args.root)
+    if args.command == 'prune':
+        print(f"Removed {cache.prune()} expired entries from {args.root}")
+    else:
+        entries = cache.entries()
+        now = time.time()
+        fresh = sum(not is_expired(e['url'], e['fetched_at'], now) for e in entries)
+        print(f"{len(entries)} cached URLs in {args.root} ({fresh} fresh)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+수집기 공용 HTTP 클라이언트.
+
+- requests.Session 하나를 공유해 keep-alive 연결을 재사용 (요청마다 TCP/TLS 핸드셰이크 없음)
+- 연결/읽기 타임아웃 (멈춘 소켓 하나가 야간 수집 전체를 붙잡지 않도록)
+- 연결 오류, 타임아웃, 5xx/429 응답은 지터를 넣은 지수 백오프로 재시도 (429 는 Retry-After 우선)
+- 호스트별 지연 시간 히스토그램을 유지하고, p95 보다 오래 걸리는 요청은 한 번 더 보내
+  먼저 도착한 응답을 사용 (hedged request). 마지막 응답이 429 인 호스트에는 hedge 하지 않음
+- get(acquire=...) 를 주면 재시도와 hedge 를 포함한 모든 네트워크 요청 직전에 호출
+  (FetchEngine 이 전역 토큰 버킷을 넘겨 재시도/hedge 도 초당 요청 수 제한을 지키게 함)
+
+    import http_client
+
+    response = http_client.get(url, headers=HEADERS)
+
+STOCKAI_HTTP_CACHE 가 설정되면 응답을 http_cache 디스크 캐시에서 먼저 찾습니다 (replay 모드는 네트워크 미사용).
+
+요청 수/바이트/재시도 횟수는 metrics 카운터(http_requests, bytes_downloaded, retries)에,
+호스트별 지연 시간은 http_latency 히스토그램에 기록됩니다.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import http_cache
+import metrics
+
+# (연결, 읽기) 타임아웃 초
+DEFAULT_TIMEOUT = (3.05, 15)
+DEFAULT_RETRIES = 3
+# 재시도 대기: 0 ~ min(BACKOFF_MAX, BACKOFF_BASE * 2**시도) 사이 무작위 (full jitter)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# 호스트별 지연 시간이 이 분위수를 넘으면 같은 요청을 한 번 더 보냄 (표본이 충분할 때만)
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+# 이보다 빨리는 hedge 하지 않음 (빠른 호스트에 요청이 두 배로 나가지 않도록)
+HEDGE_MIN_DELAY = 0.25
+DEFAULT_POOL_SIZE = 16
+
+class HttpClient:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=BACKOFF_BASE,
+                 hedge=True, pool_size=DEFAULT_POOL_SIZE, headers=None, cache=None):
+        """
+        :param timeout: (연결, 읽기) 타임아웃 초
+        :param retries: 재시도 횟수 (첫 요청 제외)
+        :param backoff: 지수 백오프 기본 대기 초
+        :param hedge: 느린 요청에 hedged request 사용 여부
+        :param pool_size: 호스트별 유지할 연결 수 (동시 요청 수 이상으로)
+        :param headers: 모든 요청에 붙일 기본 HTTP 헤더
+        :param cache: http_cache.HttpCache (None 이면 캐시 사용 안 함)
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._latency = {}
+        # 마지막 응답이 429 였던 호스트 (성공 응답이 오기 전까지 hedge 하지 않음)
+        self._throttled = set()
+        self._hedge_executor = None
+
+    def latency(self, host):
+        """호스트의 지연 시간 히스토그램 (metrics.Histogram, 기록이 없으면 None)"""
+        return self._latency.get(host)
+
+    def cached(self, url):
+        """
+        디스크 캐시의 응답 (없으면 None).
+        :raises http_cache.CacheMiss: replay 모드에서 기록되지 않은 URL
+        """
+        if self.cache is None:
+            return None
+        response = self.cache.get(url)
+        if response is not None:
+            metrics.incr('cache_hits')
+        return response
+
+    def _observe(self, host, seconds):
+        with self._lock:
+            histogram = self._latency.get(host)
+            if histogram is None:
+                histogram = self._latency[host] = metrics.Histogram()
+            histogram.observe(seconds)
+            return histogram
+
+    def _send(self, url, headers):
+        """요청 1회 (재시도/hedge 없음)"""
+        start = time.perf_counter()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        elapsed = time.perf_counter() - start
+        host = urlsplit(url).netloc
+        self._observe(host, elapsed)
+        metrics.observe('http_latency', host, elapsed)
+        metrics.add_span('fetch', elapsed)
+        metrics.incr('http_requests')
+        metrics.incr('bytes_downloaded', len(response.content))
+        return response
+
+    def _hedge_delay(self, url):
+        if not self.hedge:
+            return None
+        host = urlsplit(url).netloc
+        if host in self._throttled:
+            return None
+        histogram = self._latency.get(host)
+        if histogram is None or histogram.count < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, histogram.quantile(HEDGE_QUANTILE))
+
+    def _send_hedged(self, url, headers, delay, acquire=None):
+        """delay 초 안에 응답이 없으면 같은 요청을 한 번 더 보내고 먼저 성공한 응답을 반환"""
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.pool_size * 2,
+                                                          thread_name_prefix='hedge')
+        first = self._hedge_executor.submit(self._send, url, headers)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        # hedge 도 요청 한 건으로 속도 제한을 받고, 기다리는 사이 첫 요청이 성공했으면 보내지 않음
+        if acquire is not None:
+            acquire()
+            if first.done() and first.exception() is None:
+                return first.result()
+        metrics.incr('hedged_requests')
+        second = self._hedge_executor.submit(self._send, url, headers)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+        # 먼저 끝난 쪽이 실패했으면 나머지 요청을 기다림
+        if pending:
+            return pending.pop().result()
+        return first.result()
+
+    def _retry_wait(self, attempt, response=None):
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(BACKOFF_MAX, float(retry_after))
+        return random.uniform(0, min(BACKOFF_MAX, self.backoff * 2 ** attempt))
+
+    def get(self, url, headers=None, acquire=None):
+        """
+        GET 요청 (일시적 오류는 재시도).
+        :param headers: 이 요청에만 붙일 HTTP 헤더
+        :param acquire: 네트워크 요청(첫 요청, 재시도, hedge)마다 먼저 호출할 블로킹 함수 (속도 제한)
+        :return: requests.Response
+        :raises requests.RequestException: 재시도 후에도 실패하거나 5xx/429 응답이 계속되는 경우
+        """
+        response = self.cached(url)
+        if response is not None:
+            return response
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                if acquire is not None:
+                    acquire()
+                delay = self._hedge_delay(url)
+                if delay is None:
+                    response = self._send(url, headers)
+                else:
+                    response = self._send_hedged(url, headers, delay, acquire)
+                with self._lock:
+                    if response.status_code == 429:
+                        self._throttled.add(host)
+                    else:
+                        self._throttled.discard(host)
+                if response.status_code not in RETRY_STATUS:
+                    if self.cache is not None:
+                        self.cache.put(url, response)
+                    return response
+                if attempt == self.retries:
+                    response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            metrics.incr('retries')
+            time.sleep(self._retry_wait(attempt, response))
+
+    def close(self):
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+        self.session.close()
+
+# 프로세스 기본 클라이언트 (수집기들이 연결 풀을 공유)
+client = HttpClient(cache=http_cache.from_env())
+get = client.get
+latency = client.latency
@@ -0,0 +1,177 @@
+"""
+여러 종목을 한 번에 처리하는 배열 단위 롤링 커널.
+
+모든 커널은 종목별로 연속 배치된 float64 배열(values)과 종목 경계 오프셋
+(offsets, 길이 = 종목 수 + 1, offsets[0] == 0, offsets[-1] == len(values))을 받습니다.
+윈도우는 종목 경계를 넘지 않으며, 결과는 values 와 같은 길이의 float64 배열입니다.
+NaN 처리와 min_periods 의미는 pandas rolling 과 같습니다.
+"""
+import numpy as np
+
+def segment_offsets(keys):
+    """정렬된 키 배열(예: 종목코드)에서 세그먼트 오프셋을 만듭니다."""
+    keys = np.asarray(keys)
+    if len(keys) == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return np.append(starts, len(keys)).astype(np.int64)
+
+def _positions(offsets):
+    """원소별 (세그먼트 번호, 세그먼트 내 위치)"""
+    lengths = np.diff(offsets)
+    seg_id = np.repeat(np.arange(len(lengths)), lengths)
+    local = np.arange(offsets[-1]) - offsets[:-1][seg_id]
+    return seg_id, local
+
+def _block_layout(offsets, window):
+    """
+    각 세그먼트를 window 크기 블록으로 나눈 배치 정보.
+    임의의 윈도우 [i-window+1, i] 는 최대 두 블록에 걸치므로 블록 내 누적(prefix)과
+    역누적(suffix)을 결합해 O(1)에 계산할 수 있습니다.
+    (van Herk/Gil-Werman 방식: 원소당 상수 연산, 누적 크기는 한 블록 이내)
+    """
+    _, local = _positions(offsets)
+    lengths = np.diff(offsets)
+    blocks_per_seg = -(-lengths // window)
+    block_start = np.repeat(np.cumsum(blocks_per_seg) - blocks_per_seg, lengths)
+    flat = (block_start + local // window) * window + local % window
+
+    # 윈도우 시작이 이전 블록에 있는 경우에만 suffix 결합
+    spans_two = (local >= window) & (local % window != window - 1)
+    start = flat[np.where(spans_two, np.arange(len(local)) - window + 1, 0)] if len(local) else flat
+    return {
+        'window': window,
+        'local': local,
+        'flat': flat,
+        'size': int(blocks_per_seg.sum()) * window,
+        'spans_two': spans_two,
+        'start': start,
+    }
+
+def _blocked(values, layout, fill, accumulate):
+    """블록 배치에서 원소별 prefix 누적값과 윈도우 시작점의 suffix 누적값"""
+    window = layout['window']
+    grid = np.full(layout['size'], fill, dtype=np.float64)
+    grid[layout['flat']] = values
+    grid = grid.reshape(-1, window)
+    prefix = accumulate(grid, axis=1).ravel()[layout['flat']]
+    suffix = accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()[layout['start']]
+    return prefix, suffix
+
+def _window_count(valid, layout):
+    """윈도우 내 유효(NaN 아님) 원소 개수"""
+    if valid.all():
+        return np.minimum(layout['local'] + 1, layout['window']).astype(np.float64)
+    prefix, suffix = _blocked(valid.astype(np.float64), layout, 0.0, np.cumsum)
+    return prefix + np.where(layout['spans_two'], suffix, 0.0)
+
+def _rolling_sum_count(values, offsets, window, min_periods=None):
+    """누적합 기반 롤링 합계와 유효 개수 (NaN 은 건너뛰고 유효 개수 < min_periods 이면 NaN)"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    min_periods = window if min_periods is None else min_periods
+    layout = _block_layout(offsets, window)
+    valid = ~np.isnan(values)
+
+    prefix, suffix = _blocked(np.where(valid, values, 0.0), layout, 0.0, np.cumsum)
+    total = prefix + np.where(layout['spans_two'], suffix, 0.0)
+    count = _window_count(valid, layout)
+
+    return np.where(count >= min_periods, total, np.nan), count
+
+def rolling_sum(values, offsets, window, min_periods=None):
+    """누적합 기반 롤링 합계"""
+    return _rolling_sum_count(values, offsets, window, min_periods)[0]
+
+def rolling_mean(values, offsets, window, min_periods=None):
+    """누적합 기반 롤링 평균"""
+    total, count = _rolling_sum_count(values, offsets, window, min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+def _rolling_extreme(values, offsets, window, min_periods, ufunc, fill):
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    min_periods = window if min_periods is None else min_periods
+    layout = _block_layout(offsets, window)
+
+    prefix, suffix = _blocked(values, layout, fill, ufunc.accumulate)
+    result = np.where(layout['spans_two'], ufunc(prefix, suffix), prefix)
+    count = _window_count(~np.isnan(values), layout)
+    result[count < min_periods] = np.nan
+    return result
+
+def rolling_max(values, offsets, window, min_periods=None):
+    """
+    O(n) 롤링 최댓값 (단조 덱과 같은 결과를 블록 prefix/suffix 최댓값으로 벡터화)
+    """
+    return _rolling_extreme(values, offsets, window, min_periods, np.fmax, -np.inf)
+
+def rolling_min(values, offsets, window, min_periods=None):
+    """O(n) 롤링 최솟값"""
+    return _rolling_extreme(values, offsets, window, min_periods, np.fmin, np.inf)
+
+def shift(values, offsets, periods=1):
+    """세그먼트 내에서 periods 만큼 뒤로(+)/앞으로(-) 민 배열 (경계 밖은 NaN)"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    _, local = _positions(offsets)
+    lengths = np.diff(offsets)
+    result = np.full(len(values), np.nan)
+    if periods >= 0:
+        keep = local >= periods
+    else:
+        keep = local < np.repeat(lengths, lengths) + periods
+    src = np.arange(len(values)) - periods
+    result[keep] = values[src[keep]]
+    return result
+
+def diff(values, offsets, periods=1):
+    """세그먼트 내 차분"""
+    return np.ascontiguousarray(values, dtype=np.float64) - shift(values, offsets, periods)
+
+def pct_change(values, offsets, periods=1):
+    """세그먼트 내 변화율 (values / values[i - periods] - 1)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.ascontiguousarray(values, dtype=np.float64) / shift(values, offsets, periods) - 1
+
+def rsi(values, offsets, period=14, method='sma'):
+    """
+    RSI.
+    :param method: 'sma' - 상승/하락폭의 단순 롤링 평균 (analysis2 기준, 첫 봉의 변화량은 0)
+                   'wilder' - 첫 period 개 단순 평균 후 Wilder 지수 평활 (alpha = 1/period)
+    """
+    delta = diff(values, offsets)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    if method == 'sma':
+        avg_gain = rolling_mean(gain, offsets, period)
+        avg_loss = rolling_mean(loss, offsets, period)
+    elif method == 'wilder':
+        avg_gain = _wilder_smooth(gain, offsets, period)
+        avg_loss = _wilder_smooth(loss, offsets, period)
+    else:
+        raise ValueError(f"Unknown RSI method: {method}")
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+def _wilder_smooth(values, offsets, period):
+    """
+    Wilder 평활. 시간축 재귀이므로 종목 x 봉 패널로 펼쳐
+    봉 위치마다 모든 종목을 한 번에 갱신합니다.
+    """
+    seg_id, local = _positions(offsets)
+    lengths = np.diff(offsets)
+    result = np.full(len(values), np.nan)
+    if len(values) == 0:
+        return result
+
+    panel = np.full((len(lengths), int(lengths.max())), np.nan)
+    panel[seg_id, local] = values
+    out = np.full_like(panel, np.nan)
+    if panel.shape[1] > period:
+        # 첫 봉(변화량 없음)을 제외한 period 개의 단순 평균으로 시작
+        out[:, period] = panel[:, 1:period + 1].mean(axis=1)
+        for t in range(period + 1, panel.shape[1]):
+            out[:, t] = (out[:, t - 1] * (period - 1) + panel[:, t]) / period
+    result[:] = out[seg_id, local]
+    return result
@@ -0,0 +1,239 @@
+"""
+파이프라인 계측 (구간 시간 + 카운터).
+
+수집 스크립트와 분석 엔진이 같은 방식으로 단계별 소요 시간(span)과
+카운터를 기록하고, 실행 종료 시 JSON (및 선택적으로 Prometheus textfile)로 저장합니다.
+
+    import metrics
+
+    with metrics.span('fetch'):
+        response = requests.get(url)
+    metrics.incr('http_requests')
+    metrics.incr('bytes_downloaded', len(response.content))
+    ...
+    metrics.write('create_complete_daily_prices')
+
+저장 위치는 STOCKAI_METRICS_DIR (기본 metrics/), Prometheus textfile 은
+STOCKAI_PROMETHEUS_DIR 이 설정된 경우에만 기록합니다 (run_analysis.py 가 설정).
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR_ENV = 'STOCKAI_METRICS_DIR'
+PROMETHEUS_DIR_ENV = 'STOCKAI_PROMETHEUS_DIR'
+DEFAULT_METRICS_DIR = 'metrics'
+
+# 표준 구간 / 카운터 이름 (값이 없어도 0 으로 기록해 실행 간 비교가 쉽도록)
+STANDARD_SPANS = ('fetch', 'parse', 'merge', 'indicators', 'scoring', 'write')
+STANDARD_COUNTERS = ('http_requests', 'bytes_downloaded', 'rows_parsed', 'retries', 'cache_hits')
+# 지연 시간 히스토그램 버킷 상한 (초, 마지막 버킷은 +Inf)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def peak_rss_mb():
+    """현재 프로세스의 최대 상주 메모리 (MB, 측정 불가 환경에서는 NaN)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 는 KB, macOS 는 byte 단위
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+class Histogram:
+    """고정 버킷 히스토그램 (버킷별 개수, 합계, 최댓값)"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """q 분위수의 근사값 (해당 버킷 상한, 마지막 버킷이면 관측 최댓값)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'bounds': list(self.bounds), 'counts': list(self.counts),
+                'count': self.count, 'sum': round(self.sum, 4)}
+
+class MetricsRegistry:
+    """구간별 누적 시간/횟수와 카운터 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.spans = {name: {'count': 0, 'seconds': 0.0} for name in STANDARD_SPANS}
+            self.counters = {name: 0 for name in STANDARD_COUNTERS}
+            self.histograms = {}
+
+    @contextmanager
+    def span(self, name):
+        """with 블록의 경과 시간을 name 구간에 누적"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, seconds, count=1):
+        with self._lock:
+            entry = self.spans.setdefault(name, {'count': 0, 'seconds': 0.0})
+            entry['count'] += count
+            entry['seconds'] += seconds
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, label, value):
+        """name 히스토그램의 label(예: 호스트) 계열에 값 하나를 기록"""
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(label)
+            if histogram is None:
+                histogram = series[label] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self, job):
+        """현재까지의 측정값 dict"""
+        with self._lock:
+            finished_at = time.time()
+            return {
+                'job': job,
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                'finished_at': datetime.fromtimestamp(finished_at).isoformat(timespec='seconds'),
+                'wall_seconds': round(finished_at - self.started_at, 4),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'spans': {name: {'count': v['count'], 'seconds': round(v['seconds'], 4)}
+                          for name, v in self.spans.items()},
+                'counters': dict(self.counters),
+                'histograms': {name: {label: h.to_dict() for label, h in series.items()}
+                               for name, series in self.histograms.items()},
+            }
+
+    def write(self, job, metrics_dir=None, prometheus_dir=None):
+        """
+        측정값을 <metrics_dir>/<job>.json 으로 저장합니다.
+        :param prometheus_dir: 지정 시 node_exporter textfile collector 형식도 저장
+        :return: 저장한 측정값 dict
+        """
+        data = self.snapshot(job)
+        metrics_dir = metrics_dir or os.environ.get(METRICS_DIR_ENV) or DEFAULT_METRICS_DIR
+        prometheus_dir = prometheus_dir or os.environ.get(PROMETHEUS_DIR_ENV)
+        try:
+            atomic_write(os.path.join(metrics_dir, f'{job}.json'),
+                         json.dumps(data, indent=2, ensure_ascii=False))
+            if prometheus_dir:
+                atomic_write(os.path.join(prometheus_dir, f'stockai_{job}.prom'), to_prometheus(data))
+        except OSError as e:
+            # 계측 실패로 수집/분석이 중단되지 않도록 경고만 출력
+            print(f"Warning: could not write metrics for {job}: {e}")
+        return data
+
+def to_prometheus(data):
+    """측정값 dict 를 Prometheus text exposition 형식으로 변환"""
+    job = data['job']
+    lines = [
+        '# HELP stockai_span_seconds_total Time spent in pipeline stage.',
+        '# TYPE stockai_span_seconds_total counter',
+    ]
+    lines += [f'stockai_span_seconds_total{{job="{job}",span="{name}"}} {v["seconds"]}'
+              for name, v in data['spans'].items()]
+    lines += ['# HELP stockai_span_calls_total Number of times the stage ran.',
+              '# TYPE stockai_span_calls_total counter']
+    lines += [f'stockai_span_calls_total{{job="{job}",span="{name}"}} {v["count"]}'
+              for name, v in data['spans'].items()]
+    lines += ['# HELP stockai_events_total Pipeline event counters.',
+              '# TYPE stockai_events_total counter']
+    lines += [f'stockai_events_total{{job="{job}",name="{name}"}} {value}'
+              for name, value in data['counters'].items()]
+    lines += ['# HELP stockai_run_wall_seconds Wall-clock duration of the last run.',
+              '# TYPE stockai_run_wall_seconds gauge',
+              f'stockai_run_wall_seconds{{job="{job}"}} {data["wall_seconds"]}',
+              '# HELP stockai_run_peak_rss_megabytes Peak resident memory of the last run.',
+              '# TYPE stockai_run_peak_rss_megabytes gauge',
+              f'stockai_run_peak_rss_megabytes{{job="{job}"}} {data["peak_rss_mb"]}']
+    for name, series in data.get('histograms', {}).items():
+        metric = f'stockai_{name}_seconds'
+        lines += [f'# TYPE {metric} histogram']
+        for label, h in series.items():
+            cumulative = 0
+            for bound, n in zip(h['bounds'] + ['+Inf'], h['counts']):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{job="{job}",host="{label}",le="{bound}"}} {cumulative}')
+            lines += [f'{metric}_sum{{job="{job}",host="{label}"}} {h["sum"]}',
+                      f'{metric}_count{{job="{job}",host="{label}"}} {h["count"]}']
+    return '\n'.join(lines) + '\n'
+
+def atomic_write(path, text):
+    """임시 파일에 쓴 뒤 교체 (textfile collector 등이 쓰다 만 파일을 읽지 않도록)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def load_run(metrics_dir, jobs):
+    """
+    여러 스크립트의 측정 파일을 모아 단계/카운터별 합계를 계산합니다.
+    :return: {'jobs': {job: 측정값}, 'spans': 합계, 'counters': 합계, 'histograms': 합계}
+    """
+    summary = {'jobs': {}, 'spans': {}, 'counters': {}, 'histograms': {}}
+    for job in jobs:
+        path = os.path.join(metrics_dir, f'{job}.json')
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        summary['jobs'][job] = data
+        for name, v in data['spans'].items():
+            total = summary['spans'].setdefault(name, {'count': 0, 'seconds': 0.0})
+            total['count'] += v['count']
+            total['seconds'] = round(total['seconds'] + v['seconds'], 4)
+        for name, value in data['counters'].items():
+            summary['counters'][name] = summary['counters'].get(name, 0) + value
+        for name, series in data.get('histograms', {}).items():
+            for label, h in series.items():
+                total = summary['histograms'].setdefault(name, {}).setdefault(
+                    label, {'bounds': h['bounds'], 'counts': [0] * len(h['counts']), 'count': 0, 'sum': 0.0})
+                total['counts'] = [a + b for a, b in zip(total['counts'], h['counts'])]
+                total['count'] += h['count']
+                total['sum'] = round(total['sum'] + h['sum'], 4)
+    return summary
+
+# 프로세스 기본 레지스트리 (스크립트 하나 = 실행 하나)
+_registry = MetricsRegistry()
+span = _registry.span
+add_span = _registry.add_span
+incr = _registry.incr
+observe = _registry.observe
+snapshot = _registry.snapshot
+write = _registry.write
+reset = _registry.reset
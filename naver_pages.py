@@ -0,0 +1,318 @@
+"""
+네이버 금융 페이지 파서 (수집기 공용).
+
+sise_day.naver (일별 시세), frgn.naver (투자자별 매매동향) 의 표를 lxml 로 한 번에 읽어
+행을 미리 할당한 numpy 배열에 바로 채웁니다. pd.read_html 은 문서의 모든 표를
+DataFrame 으로 만드므로, 레이아웃이 바뀌어 행을 하나도 찾지 못한 경우에만 사용합니다.
+
+    parse_sise_day(html) -> date, close, diff, open, high, low, volume
+    parse_frgn(html)     -> date, close, diff, change_pct, volume,
+                            institution_net_buy, foreigner_net_buy, foreigner_shares, foreigner_ratio
+
+read_html 대체 경로를 탄 횟수는 metrics 카운터 parse_fallbacks 로 기록됩니다.
+
+parse_ranking(html) 은 순위 페이지(sise_quant, sise_rise, sise_market_sum, sise_deal_rank)의
+종목 링크를 XPath 한 번으로 순서대로 읽습니다.
+
+parse_main(content) 은 종목 메인(main.naver) 응답 바이트에서 정규식 한 번의 탐색으로
+PER/PBR/EPS/배당수익률/시가총액(<em id="_...">)과 기업실적분석 표의 ROE 행만 뽑습니다
+(문서 전체를 디코딩하거나 표를 DataFrame 으로 만들지 않음).
+
+paginate() 는 최신 페이지부터 날짜별 표를 모으다가 빈 페이지, 반복된 페이지
+(네이버는 마지막 페이지 뒤를 요청하면 마지막 페이지를 다시 보냄), 덜 찬 페이지(마지막 페이지),
+요청 기간을 지난 날짜가 나오면 멈춥니다. 보내지 않은 요청 수는 requests_saved 로 기록됩니다.
+"""
+import asyncio
+import io
+import re
+
+import numpy as np
+import pandas as pd
+from lxml import etree, html as lhtml
+
+import metrics
+
+SISE_DAY_COLUMNS = ['date', 'close', 'diff', 'open', 'high', 'low', 'volume']
+FRGN_COLUMNS = ['date', 'close', 'diff', 'change_pct', 'volume',
+                'institution_net_buy', 'foreigner_net_buy', 'foreigner_shares', 'foreigner_ratio']
+# read_html 대체 경로의 한글 컬럼명
+SISE_DAY_HEADERS = {'날짜': 'date', '종가': 'close', '전일비': 'diff', '시가': 'open',
+                    '고가': 'high', '저가': 'low', '거래량': 'volume'}
+
+DATE_RE = re.compile(r'^\s*(\d{4})\.(\d{2})\.(\d{2})\s*$')
+NUMBER_RE = re.compile(r'[+-]?[\d,]*\.?\d+')
+# 전일비가 음수인 표시 (하락, 하한가)
+DOWN_MARKERS = ('하락', '하한')
+# 데이터 행: 셀 수가 레이아웃과 같은 tr (구분선/헤더 행은 셀 수가 다름)
+ROWS_XPATH = etree.XPath('//table//tr[count(td) = $n]')
+
+# 순위 페이지 표의 종목 링크 (<a href="/item/main.naver?code=005930" class="tltle">삼성전자</a>)
+RANKING_XPATH = etree.XPath('//table[contains(@class, "type_2")]//td'
+                            '//a[contains(@class, "tltle") or contains(@class, "tit")]')
+CODE_RE = re.compile(r'code=(\d{6})')
+
+# 종목 메인 페이지: 투자정보 <em id="_per"> 등의 값과 기업실적분석 표의 ROE 행 (한 번의 finditer 로 모두 찾음)
+# 기업실적분석 표의 열 머리(2023.12, 추정치는 2024.12<br/><em>(E)</em>)도 같은 탐색에서 읽어 ROE 의 실적/추정 열을 구분
+MAIN_RE = re.compile(
+    rb'<em id="_(?P<key>per|pbr|eps|dvr|market_sum)">(?P<value>[^<]*)</em>'
+    rb'|<th[^>]*>\s*(?:<strong>)?\s*ROE[^<]*(?:</strong>)?\s*</th>(?P<roe>.*?)</tr>'
+    rb'|<th[^>]*>\s*(?:<strong>)?\s*(?P<period>\d{4}\.\d{2})\s*(?:</strong>)?\s*(?:<br\s*/?>\s*)?'
+    rb'(?P<estimate><em>\s*\(E\)\s*</em>)?'
+    rb'|(?P<table><table\b)',
+    re.DOTALL)
+MAIN_FIELDS = {b'per': 'PER', b'pbr': 'PBR', b'eps': 'EPS', b'dvr': 'Dividend_Yield'}
+CELL_RE = re.compile(rb'<td[^>]*>(.*?)</td>', re.DOTALL)
+TAG_RE = re.compile(rb'<[^>]+>')
+BYTES_NUMBER_RE = re.compile(rb'[+-]?[\d,]*\.?\d+')
+# 시가총액 '497조 8,012' (억 단위, 조가 있으면 한글이 섞임)
+MARKET_SUM_RE = re.compile(r'(?:([\d,]+)\s*조)?\s*([\d,]*)')
+# 기업실적분석 표의 앞쪽 연간 실적 열 수 (뒤쪽은 분기 실적, 연간의 마지막 열은 보통 컨센서스 추정치)
+ANNUAL_COLUMNS = 4
+
+def _number(text):
+    """'12,345' / '+1.25%' / '-3,000' -> float (숫자가 없으면 NaN)"""
+    match = NUMBER_RE.search(text)
+    return float(match.group().replace(',', '')) if match else np.nan
+
+def _is_down(text):
+    return any(marker in text for marker in DOWN_MARKERS)
+
+def _diff(cell, text):
+    """전일비 셀: 숫자 크기에 하락/하한가 표시(텍스트 또는 아이콘 alt)면 음수"""
+    value = _number(text)
+    if _is_down(text) or any(_is_down(alt) for alt in cell.xpath('.//img/@alt')):
+        value = -abs(value)
+    return value
+
+def _extract(html, n_cells):
+    """
+    날짜로 시작하고 셀이 n_cells 개인 행을 배열로 추출합니다.
+    :return: (datetime64[D] 배열, float64 2차원 배열 [행, 셀-1]) - 행이 없으면 None
+    """
+    tree = lhtml.fromstring(html)
+    rows = []
+    for tr in ROWS_XPATH(tree, n=n_cells):
+        cells = tr.findall('td')
+        if DATE_RE.match(cells[0].text_content()):
+            rows.append(cells)
+    if not rows:
+        return None
+
+    dates = np.empty(len(rows), dtype='datetime64[D]')
+    values = np.empty((len(rows), n_cells - 1), dtype=np.float64)
+    for i, cells in enumerate(rows):
+        year, month, day = DATE_RE.match(cells[0].text_content()).groups()
+        dates[i] = f'{year}-{month}-{day}'
+        for j, cell in enumerate(cells[1:]):
+            text = cell.text_content()
+            values[i, j] = _diff(cell, text) if j == 1 else _number(text)
+    return dates, values
+
+def _frame(columns, dates, values, int_columns):
+    data = {columns[0]: dates.astype('datetime64[ns]')}
+    for j, name in enumerate(columns[1:]):
+        column = values[:, j]
+        if name in int_columns and not np.isnan(column).any():
+            column = column.astype(np.int64)
+        data[name] = column
+    return pd.DataFrame(data)
+
+def parse_ranking(html, limit=None):
+    """
+    순위 페이지의 종목을 순위 순으로 읽습니다.
+    :param limit: 앞에서부터 읽을 종목 수 (None 이면 전체)
+    :return: [{'code': 종목코드, 'name': 종목명}, ...]
+    """
+    stocks = []
+    with metrics.span('parse'):
+        for link in RANKING_XPATH(lhtml.fromstring(html)):
+            if limit is not None and len(stocks) >= limit:
+                break
+            match = CODE_RE.search(link.get('href', ''))
+            if match:
+                stocks.append({'code': match.group(1), 'name': link.text_content().strip()})
+    metrics.incr('rows_parsed', len(stocks))
+    return stocks
+
+def _bytes_number(data):
+    """b'-1,234' -> float (숫자가 없으면 None)"""
+    match = BYTES_NUMBER_RE.search(data)
+    return float(match.group().replace(b',', b'')) if match else None
+
+def _market_sum(data):
+    """시가총액 셀 (억 단위) -> 원. 숫자만 있으면 디코딩 없이 바로 변환"""
+    data = data.strip()
+    if data.isascii():
+        digits = data.replace(b',', b'')
+        return int(digits) * 100_000_000 if digits.isdigit() else None
+    match = MARKET_SUM_RE.match(data.decode('euc-kr', errors='replace'))
+    trillions, hundred_millions = match.groups()
+    if not trillions and not hundred_millions:
+        return None
+    return (int((trillions or '0').replace(',', '')) * 10_000 +
+            int(hundred_millions.replace(',', '') or '0')) * 100_000_000
+
+def parse_main(content):
+    """
+    종목 메인 페이지에서 재무 지표를 추출합니다.
+    :param content: 응답 본문 (euc-kr 바이트, str 이면 utf-8 로 인코딩해 처리)
+    :return: PER, PBR, EPS, Dividend_Yield (%), Market_Cap (원), ROE (%, 추정치를 뺀 최근 연간 실적) 중 찾은 값의 dict
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    data = {}
+    # 현재 표의 열 머리별 추정치 여부 (표가 바뀌면 초기화)
+    estimates = []
+    with metrics.span('parse'):
+        for match in MAIN_RE.finditer(content):
+            key = match.group('key')
+            if match.group('table') is not None:
+                estimates = []
+            elif match.group('period') is not None:
+                estimates.append(match.group('estimate') is not None)
+            elif key is None:
+                # 연간 실적 열 중 추정치(E)가 아닌 값이 있는 가장 최근 값 (처음 나온 ROE 행만 사용)
+                if 'ROE' not in data:
+                    # 열 머리를 못 찾으면 연간 마지막 열을 추정치로 간주
+                    annual = estimates[:ANNUAL_COLUMNS] if estimates else [False] * (ANNUAL_COLUMNS - 1) + [True]
+                    cells = CELL_RE.findall(match.group('roe'))[:ANNUAL_COLUMNS]
+                    values = [_bytes_number(TAG_RE.sub(b'', cell))
+                              for cell, estimate in zip(cells, annual) if not estimate]
+                    values = [value for value in values if value is not None]
+                    if values:
+                        data['ROE'] = values[-1]
+            elif key == b'market_sum':
+                value = _market_sum(match.group('value'))
+                if value is not None:
+                    data['Market_Cap'] = value
+            else:
+                value = _bytes_number(match.group('value'))
+                if value is not None:
+                    data[MAIN_FIELDS[key]] = value
+    return data
+
+def parse_sise_day(html):
+    """
+    일별 시세 페이지의 시세 표를 읽습니다.
+    :return: DataFrame (SISE_DAY_COLUMNS, 최신 날짜가 위)
+    """
+    with metrics.span('parse'):
+        extracted = _extract(html, len(SISE_DAY_COLUMNS))
+        if extracted is not None:
+            df = _frame(SISE_DAY_COLUMNS, *extracted, int_columns=('volume',))
+        else:
+            metrics.incr('parse_fallbacks')
+            df = _read_sise_day(html)
+    metrics.incr('rows_parsed', len(df))
+    return df
+
+def parse_frgn(html):
+    """
+    투자자별 매매동향 페이지의 날짜별 표를 읽습니다.
+    :return: DataFrame (FRGN_COLUMNS 중 찾은 컬럼, 최신 날짜가 위) - 표를 찾지 못하면 None
+    """
+    with metrics.span('parse'):
+        extracted = _extract(html, len(FRGN_COLUMNS))
+        if extracted is not None:
+            df = _frame(FRGN_COLUMNS, *extracted,
+                        int_columns=('volume', 'institution_net_buy', 'foreigner_net_buy', 'foreigner_shares'))
+        else:
+            metrics.incr('parse_fallbacks')
+            df = _read_frgn(html)
+    if df is not None:
+        metrics.incr('rows_parsed', len(df))
+    return df
+
+def _read_sise_day(html):
+    """read_html 대체 경로 (네이버 금융 일별 시세 페이지 구조상 첫 번째 테이블이 시세 데이터임)"""
+    df = pd.read_html(io.StringIO(html))[0].dropna()
+    df = df.rename(columns=SISE_DAY_HEADERS)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def _read_frgn(html):
+    """read_html 대체 경로 (날짜/기관/외국인 컬럼을 가진 표를 찾아 컬럼명 표준화)"""
+    tables = pd.read_html(io.StringIO(html))
+    # 보통 class='type2' 테이블이 여러개 있는데, 그 중 날짜, 종가, 등락률, 기관, 외국인 등이 있는 테이블을 찾아야 함.
+    target_df = None
+    for table in tables:
+        if '날짜' in table.columns and '기관' in table.columns and '외국인' in table.columns:
+            target_df = table
+            break
+    if target_df is None and len(tables) > 1:
+        # fallback: 보통 두번째나 세번째 테이블
+        target_df = tables[1]
+    if target_df is None:
+        return None
+
+    df = target_df.copy()
+    # 컬럼명에 멀티인덱스가 있을 수 있음. 단순화.
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = ['_'.join(col).strip() for col in df.columns.values]
+    if len(df.columns) == len(FRGN_COLUMNS):
+        df.columns = FRGN_COLUMNS
+    else:
+        # 컬럼 수가 다르면 이름으로 매핑 (같은 대상에는 처음 일치하는 컬럼만)
+        rename_map = {'날짜': 'date', '기관': 'institution_net_buy', '외국인': 'foreigner_net_buy'}
+        new_cols = {}
+        for col in df.columns:
+            for k, v in rename_map.items():
+                if k in str(col) and v not in new_cols.values():
+                    new_cols[col] = v
+                    break
+        df = df.rename(columns=new_cols)
+    if 'date' not in df.columns:
+        return None
+    df = df.dropna(subset=['date'])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+async def paginate(fetch_page, code, pages, since=None, window=1):
+    """
+    최신 페이지부터 날짜별 표를 모읍니다 (같은 날짜는 한 번만).
+    :param fetch_page: 페이지 번호 -> date 컬럼이 있는 DataFrame (또는 None) 코루틴 함수
+    :param code: 종목코드 (오류 메시지용)
+    :param pages: 최대 페이지 수
+    :param since: 이 날짜 이후(포함) 행만 남기고, 이 날짜 이전이 나오면 중단
+    :param window: 1페이지 이후 동시에 요청할 페이지 수 (중단 지점 뒤로 요청한 페이지는 버림)
+    :return: 페이지별 DataFrame 목록 (날짜 내림차순, 페이지 간 중복 없음)
+    """
+    df_list = []
+    oldest = None
+    full_rows = None
+    page = 1
+    requested = 0
+    done = False
+    while page <= pages and not done:
+        # 1페이지로 페이지 크기/상장 기간을 확인한 뒤 window 개씩 동시에 요청
+        batch = list(range(page, min(pages, page + (window if page > 1 else 1) - 1) + 1))
+        results = await asyncio.gather(*(fetch_page(p) for p in batch), return_exceptions=True)
+        requested += len(batch)
+        page = batch[-1] + 1
+        for p, df in zip(batch, results):
+            if isinstance(df, Exception):
+                print(f"Error fetching page {p} for code {code}: {df}")
+                done = True
+                break
+            if df is None or len(df) == 0:
+                done = True
+                break
+            rows = len(df)
+            # 이미 받은 날짜(반복된 마지막 페이지)는 버리고, 새 날짜가 없으면 중단
+            if oldest is not None:
+                df = df[df['date'] < oldest]
+                if len(df) == 0:
+                    done = True
+                    break
+            oldest = df['date'].min()
+            if since is not None:
+                df = df[df['date'] >= since]
+            if len(df):
+                df_list.append(df)
+            full_rows = full_rows or rows
+            # 요청 기간을 지났거나 덜 찬 페이지(마지막 페이지)면 중단
+            if (since is not None and oldest <= since) or rows < full_rows:
+                done = True
+                break
+    metrics.incr('requests_saved', pages - requested)
+    return df_list
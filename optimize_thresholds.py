@@ -0,0 +1,192 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analysis2 import EnhancedWaveTransitionAnalyzerV3, WAVE_THRESHOLDS, WAVE_STAGE_LABELS, classify_wave_stages
+from backtest import prepare_backtest_frame, FORWARD_HORIZONS
+
+# 단계 판정에 필요한 지표 컬럼
+SIGNAL_COLUMNS = ['ma20', 'ma50', 'ma200', '52w_pos', 'close', 'volume', 'vol_ma20', 'rsi', 'return_20d']
+
+# 그리드 탐색 후보값 (나머지 임계값은 WAVE_THRESHOLDS 기본값 사용)
+DEFAULT_GRID = {
+    'strong_pos_min': [0.5, 0.6, 0.7],
+    'strong_pos_max': [0.9, 1.0],
+    'strong_vol_mult': [1.1, 1.3, 1.5],
+    'early_vol_mult': [1.0, 1.2, 1.4],
+    'strong_rsi_min': [50, 55, 60],
+    'strong_rsi_max': [70, 75, 80],
+    'strong_return_min': [5, 10, 15],
+}
+
+# 랜덤 탐색 범위 (low, high)
+RANDOM_SPACE = {
+    'strong_pos_min': (0.4, 0.8),
+    'strong_pos_max': (0.8, 1.0),
+    'strong_vol_mult': (1.0, 2.0),
+    'strong_rsi_min': (45, 65),
+    'strong_rsi_max': (65, 85),
+    'strong_return_min': (0, 20),
+    'early_pos_min': (0.2, 0.5),
+    'early_pos_max': (0.6, 0.9),
+    'early_vol_mult': (1.0, 2.0),
+    'transition_ma_gap': (0.02, 0.1),
+    'transition_rsi_min': (35, 55),
+    'transition_rsi_max': (55, 75),
+}
+
+# 워커 프로세스가 붙는 공유 메모리 (읽기 전용)
+_shared = {}
+
+def grid_configs(grid=DEFAULT_GRID):
+    """그리드 후보값의 모든 조합 (min > max 인 조합 제외)"""
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        config = dict(zip(keys, values))
+        if _is_valid(config):
+            yield config
+
+def random_configs(n, seed=0, space=RANDOM_SPACE):
+    """탐색 범위에서 균등 추출한 n 개 설정"""
+    rng = np.random.default_rng(seed)
+    configs = []
+    while len(configs) < n:
+        config = {k: round(float(rng.uniform(lo, hi)), 3) for k, (lo, hi) in space.items()}
+        if _is_valid(config):
+            configs.append(config)
+    return configs
+
+def _is_valid(config):
+    t = dict(WAVE_THRESHOLDS, **config)
+    for stage in ['strong', 'early', 'transition']:
+        for kind in ['pos', 'rsi']:
+            lo, hi = t.get(f'{stage}_{kind}_min'), t.get(f'{stage}_{kind}_max')
+            if lo is not None and hi is not None and lo > hi:
+                return False
+    return True
+
+def _attach_shared(name, shape, columns):
+    """워커 초기화: 공유 메모리의 지표 행렬을 복사 없이 연결"""
+    shm = shared_memory.SharedMemory(name=name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    matrix.flags.writeable = False
+    _shared['shm'] = shm
+    _shared['columns'] = {col: matrix[i] for i, col in enumerate(columns)}
+
+def evaluate_config(config, horizon=20, target_stage="Strong Uptrend", min_signals=30, columns=None):
+    """
+    임계값 설정 하나를 평가합니다 (마스크 계산 + 단계별 집계만 수행).
+    :return: 설정값 + 목표 단계 성과 지표 dict
+    """
+    columns = columns if columns is not None else _shared['columns']
+    stage_idx = classify_wave_stages(columns, config)
+    fwd = columns[f'fwd_{horizon}d']
+    valid = ~np.isnan(fwd)
+
+    n_stages = len(WAVE_STAGE_LABELS)
+    idx = stage_idx[valid]
+    counts = np.bincount(idx, minlength=n_stages)
+    sums = np.bincount(idx, weights=fwd[valid], minlength=n_stages)
+    hits = np.bincount(idx, weights=(fwd[valid] > 0), minlength=n_stages)
+
+    target = int(np.flatnonzero(WAVE_STAGE_LABELS == target_stage)[0])
+    n = counts[target]
+    result = dict(config)
+    result['signals'] = int(n)
+    result[f'mean_{horizon}d'] = sums[target] / n if n else np.nan
+    result[f'hit_rate_{horizon}d'] = hits[target] / n if n else np.nan
+    # 전체 평균 대비 초과 수익
+    result[f'excess_{horizon}d'] = result[f'mean_{horizon}d'] - sums.sum() / max(counts.sum(), 1)
+    result['meets_min_signals'] = bool(n >= min_signals)
+    return result
+
+def run_sweep(frame, configs, workers=1, horizon=20, target_stage="Strong Uptrend", min_signals=30):
+    """
+    지표를 한 번만 계산해 공유 메모리에 올리고, 설정별 평가를 프로세스 풀로 분산합니다.
+    :param frame: prepare_backtest_frame() 결과 중 채점 대상 행
+    :return: 순위가 매겨진 결과 DataFrame
+    """
+    columns = SIGNAL_COLUMNS + [f'fwd_{horizon}d']
+    configs = [dict(c) for c in configs]
+    kwargs = dict(horizon=horizon, target_stage=target_stage, min_signals=min_signals)
+
+    if workers <= 1:
+        data = {col: frame[col].to_numpy(dtype=np.float64) for col in columns}
+        results = [evaluate_config(c, columns=data, **kwargs) for c in configs]
+    else:
+        shape = (len(columns), len(frame))
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+        try:
+            matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            for i, col in enumerate(columns):
+                matrix[i] = frame[col].to_numpy(dtype=np.float64)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared,
+                                     initargs=(shm.name, shape, columns)) as executor:
+                chunksize = max(1, len(configs) // (workers * 4))
+                results = list(executor.map(_evaluate_shared, configs, itertools.repeat(kwargs), chunksize=chunksize))
+            del matrix
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results_df = pd.DataFrame(results)
+    metric = f'mean_{horizon}d'
+    return results_df.sort_values(['meets_min_signals', metric, 'signals'], ascending=[False, False, False],
+                                  kind='mergesort').reset_index(drop=True)
+
+def _evaluate_shared(config, kwargs):
+    return evaluate_config(config, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="analyze_stock 임계값 파라미터 탐색")
+    parser.add_argument('--random', type=int, default=0, help="랜덤 탐색 설정 수 (0 이면 그리드 탐색)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--horizon', type=int, default=20, choices=FORWARD_HORIZONS,
+                        help="평가에 사용할 미래 수익률 기간 (거래일)")
+    parser.add_argument('--target-stage', default="Strong Uptrend", choices=list(WAVE_STAGE_LABELS[1:]))
+    parser.add_argument('--min-signals', type=int, default=30, help="순위에 포함될 최소 신호 수")
+    parser.add_argument('--start', help="평가 시작일 (YYYY-MM-DD)")
+    parser.add_argument('--end', help="평가 종료일 (YYYY-MM-DD)")
+    parser.add_argument('--output', default='threshold_sweep_results.csv')
+    args = parser.parse_args()
+
+    analyzer = EnhancedWaveTransitionAnalyzerV3()
+    if not analyzer.load_data():
+        return
+
+    start_time = time.time()
+    frame = prepare_backtest_frame(analyzer.merged_df, (args.horizon,))
+    mask = frame['eligible']
+    if args.start:
+        mask &= frame['date'] >= pd.Timestamp(args.start)
+    if args.end:
+        mask &= frame['date'] <= pd.Timestamp(args.end)
+    frame = frame[mask]
+    print(f"Prepared {len(frame):,} rows in {time.time() - start_time:.1f} seconds.")
+
+    configs = random_configs(args.random, args.seed) if args.random else list(grid_configs())
+    default = {k: WAVE_THRESHOLDS[k] for k in (RANDOM_SPACE if args.random else DEFAULT_GRID)}
+    if default not in configs:
+        configs.insert(0, default)
+
+    start_time = time.time()
+    results = run_sweep(frame, configs, args.workers, args.horizon, args.target_stage, args.min_signals)
+    print(f"Evaluated {len(configs):,} configs with {args.workers} workers in {time.time() - start_time:.1f} seconds.")
+
+    # 현재 기본 임계값과 비교할 수 있도록 표시
+    results['is_default'] = (results[list(default)] == pd.Series(default)).all(axis=1)
+
+    results.to_csv(args.output, index=False)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.head(10))
+    print(f"Saved ranked configs to {args.output}")
+
+if __name__ == "__main__":
+    main()
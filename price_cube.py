@@ -0,0 +1,296 @@
+"""
+분석/백테스트/대시보드용 메모리 매핑 가격 큐브 (종목 x 거래일 고정 크기 배열).
+
+    price_cube/
+     ┣ manifest.json          # 버전, 사용 중인 거래일 수, 필드 dtype, 원본 서명
+     ┣ codes.npy, names.npy   # 종목 인덱스 (정렬된 종목코드) 와 종목명
+     ┣ dates.npy              # 거래일 인덱스 (datetime64[D], 여유 용량 포함)
+     ┣ mask.npy               # 종목 x 거래일 데이터 존재 여부
+     ┗ close.npy, volume.npy, institution_net_buy.npy, ...
+
+- 필드 dtype 은 분석기 로더와 같은 규칙 (가격은 값 손실이 없으면 float32, 거래량/순매수는 정수)이라
+  큐브에서 읽어도 분석 결과가 같습니다.
+- 읽기: np.load(mmap_mode='r') 로 열어 로딩 시간이 거의 없고, 여러 프로세스가 OS 페이지 캐시를 공유합니다.
+- 갱신: 새 거래일은 여유 용량 열에 바로 기록 (마지막 거래일은 장중 수집분일 수 있어 다시 씀).
+  빌드 이후 과거 데이터가 바뀌었으면 (price_store/stock_db 변경 기록) 바뀐 가장 이른 거래일부터 다시 씀.
+  종목 구성이 바뀌거나 용량이 차거나 큐브 첫 거래일 이전이 바뀐 경우는 전체 재생성.
+- 빌드 이후 원본(price_store, stock_data.db 또는 CSV)이 바뀌었으면 open_fresh() 가 None 을 반환합니다.
+
+    python price_cube.py build [--full]
+    python price_cube.py info
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_access
+import metrics
+from price_store import PriceStore, DEFAULT_ROOT as PRICE_STORE_ROOT
+from stock_db import StockDB, DEFAULT_DB
+
+DEFAULT_DIR = 'price_cube'
+MANIFEST_FILE = 'manifest.json'
+CUBE_VERSION = 1
+# 전체 재생성 시 미리 확보하는 거래일 수 (약 1년)
+DAY_CAPACITY_STEP = 260
+
+def _save(path, array):
+    """임시 파일에 쓰고 교체 (읽는 쪽은 이전 파일 또는 새 파일만 봄)"""
+    tmp_path = f'{path}.tmp.npy'
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def _write_manifest(cube_dir, manifest):
+    metrics.atomic_write(os.path.join(cube_dir, MANIFEST_FILE), json.dumps(manifest, indent=2))
+
+class PriceCube:
+    def __init__(self, cube_dir=DEFAULT_DIR):
+        """
+        큐브를 읽기 전용 memmap 으로 엽니다.
+        :param cube_dir: 큐브 디렉터리
+        """
+        self.cube_dir = cube_dir
+        with open(os.path.join(cube_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest['version'] != CUBE_VERSION:
+            raise ValueError(f"{cube_dir}: cube version {self.manifest['version']} != {CUBE_VERSION}. "
+                             f"Rebuild with 'python price_cube.py build --full'.")
+        self.n_days = self.manifest['n_days']
+        self.codes = np.load(self._path('codes'))
+        self.names = np.load(self._path('names'))
+        self.dates = np.load(self._path('dates'), mmap_mode='r')[:self.n_days]
+        self.mask = np.load(self._path('mask'), mmap_mode='r')[:, :self.n_days]
+        self.fields = {name: np.load(self._path(name), mmap_mode='r')[:, :self.n_days]
+                       for name in self.manifest['fields']}
+
+    def _path(self, name):
+        return os.path.join(self.cube_dir, f'{name}.npy')
+
+    def __getitem__(self, field):
+        """종목 x 거래일 배열 (memmap, 데이터가 없는 칸은 0 이므로 mask 와 함께 사용)"""
+        return self.fields[field]
+
+    def index_of(self, code):
+        """종목코드의 행 번호 (없으면 None)"""
+        i = np.searchsorted(self.codes, str(code))
+        return int(i) if i < len(self.codes) and self.codes[i] == str(code) else None
+
+    def frame(self, codes=None):
+        """
+        data_access.load_merged() 와 같은 (code, date) 순 long 형식 DataFrame.
+        :param codes: 종목코드 목록 (None 이면 전체)
+        """
+        if codes is None:
+            rows = np.arange(len(self.codes))
+            mask, fields = self.mask, self.fields
+        else:
+            rows = np.array([i for i in map(self.index_of, codes) if i is not None], dtype=np.int64)
+            mask = self.mask[rows]
+            fields = {name: values[rows] for name, values in self.fields.items()}
+
+        # 행 우선(C 순서) 배열이라 nonzero/불리언 인덱싱 결과가 곧 (code, date) 순
+        row, col = np.nonzero(mask)
+        code_idx = rows[row]
+        name_categories = np.unique(self.names)
+        name_codes = np.searchsorted(name_categories, self.names)
+
+        data = {}
+        for column in self.manifest['columns']:
+            if column == 'code':
+                data[column] = pd.Categorical.from_codes(code_idx, categories=self.codes)
+            elif column == 'date':
+                data[column] = np.asarray(self.dates)[col].astype(self.manifest['date_dtype'])
+            elif column == 'name':
+                data[column] = pd.Categorical.from_codes(name_codes[code_idx], categories=name_categories)
+            else:
+                data[column] = np.asarray(fields[column])[mask]
+        return pd.DataFrame(data)
+
+def open_fresh(cube_dir=DEFAULT_DIR, data_dir='.'):
+    """
+    원본이 빌드 이후 바뀌지 않았을 때만 큐브를 엽니다.
+    :return: PriceCube 또는 None (큐브가 없거나 오래됨)
+    """
+    path = os.path.join(data_dir, cube_dir)
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return None
+    try:
+        cube = PriceCube(path)
+    except ValueError:
+        return None
+    return cube if cube.manifest['source'] == data_access.source_signature(data_dir) else None
+
+def _build_full(cube_dir, data_dir, signature, built_ns):
+    merged = data_access.load_merged(data_dir=data_dir)
+    codes = merged['code'].cat.remove_unused_categories()
+    code_list = np.asarray(codes.cat.categories, dtype=str)
+    code_idx = codes.cat.codes.to_numpy()
+    day_values = merged['date'].to_numpy().astype('datetime64[D]')
+    dates = np.unique(day_values)
+    date_idx = np.searchsorted(dates, day_values)
+    capacity = len(dates) + DAY_CAPACITY_STEP
+
+    # 종목명은 종목별 마지막 행 기준 (분석 결과와 같은 값)
+    last_rows = np.r_[np.nonzero(np.diff(code_idx))[0], len(code_idx) - 1] if len(code_idx) else []
+    names = merged['name'].astype(str).to_numpy()[last_rows] if 'name' in merged.columns else code_list
+    fields = [c for c in merged.columns if c not in ('code', 'date', 'name')
+              and pd.api.types.is_numeric_dtype(merged[c])]
+
+    tmp_dir = f'{cube_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'codes.npy'), code_list)
+    np.save(os.path.join(tmp_dir, 'names.npy'), np.asarray(names, dtype=str))
+    padded = np.zeros(capacity, dtype='datetime64[D]')
+    padded[:len(dates)] = dates
+    np.save(os.path.join(tmp_dir, 'dates.npy'), padded)
+    mask = np.zeros((len(code_list), capacity), dtype=bool)
+    mask[code_idx, date_idx] = True
+    np.save(os.path.join(tmp_dir, 'mask.npy'), mask)
+    for field in fields:
+        values = np.zeros((len(code_list), capacity), dtype=merged[field].dtype)
+        values[code_idx, date_idx] = merged[field].to_numpy()
+        np.save(os.path.join(tmp_dir, f'{field}.npy'), values)
+    _write_manifest(tmp_dir, {
+        'version': CUBE_VERSION,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'n_days': len(dates),
+        'capacity': capacity,
+        'columns': [c for c in merged.columns if c in ('code', 'date', 'name') or c in fields],
+        'fields': {field: str(merged[field].dtype) for field in fields},
+        'date_dtype': str(merged['date'].dtype),
+        'source': signature,
+        'built_ns': built_ns,
+    })
+
+    # 디렉터리 교체 (이미 열려 있는 memmap 은 이전 파일을 계속 읽음)
+    old_dir = f'{cube_dir}.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(cube_dir):
+        os.replace(cube_dir, old_dir)
+    os.replace(tmp_dir, cube_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return len(merged)
+
+def _append(cube_dir, data_dir, signature, built_ns):
+    """
+    마지막 거래일(또는 빌드 이후 바뀐 가장 이른 거래일)부터의 데이터만 읽어 기존 배열에 기록합니다.
+    :return: 기록한 행 수 (증분 갱신이 불가능하면 None)
+    """
+    cube = PriceCube(cube_dir)
+    store = PriceStore(os.path.join(data_dir, PRICE_STORE_ROOT))
+    db = StockDB(os.path.join(data_dir, DEFAULT_DB))
+    # CSV 원본은 변경 기록이 없어 전체를 읽어야 하고, 종목 구성이 바뀌면 행 인덱스가 달라짐
+    if (not store.exists() or not db.exists() or cube.n_days == 0 or 'built_ns' not in cube.manifest
+            or sorted(store.codes()) != list(cube.codes)):
+        return None
+
+    # 이전 빌드의 서명 계산 이후 바뀐 가장 이른 날짜 (장중 재수집, 수정주가 재수집, 수급 보정 등)
+    changed = [d for d in (store.changed_since(cube.manifest['built_ns']),
+                           db.changed_since('investor_trends', cube.manifest['built_ns'])) if d is not None]
+    first_col = cube.n_days - 1
+    if changed:
+        earliest = np.datetime64(min(changed).date(), 'D')
+        if earliest < cube.dates[0]:
+            return None
+        first_col = min(first_col, int(np.searchsorted(cube.dates, earliest)))
+    merged = data_access.load_merged(start=pd.Timestamp(cube.dates[first_col]), data_dir=data_dir)
+    if [c for c in merged.columns if c in cube.manifest['columns']] != cube.manifest['columns']:
+        return None
+    codes = merged['code'].astype(str).to_numpy()
+    code_idx = np.searchsorted(cube.codes, codes)
+    if len(codes) and not np.array_equal(cube.codes[np.clip(code_idx, 0, len(cube.codes) - 1)], codes):
+        return None
+    day_values = merged['date'].to_numpy().astype('datetime64[D]')
+    new_dates = np.unique(day_values)
+    n_days = first_col + len(new_dates)
+    if n_days > cube.manifest['capacity']:
+        return None
+
+    # 기존 dtype 으로 값 손실 없이 담을 수 있어야 함 (아니면 전체 재생성으로 dtype 재결정)
+    cast = {}
+    for field, dtype in cube.manifest['fields'].items():
+        values = merged[field].to_numpy()
+        cast[field] = values.astype(dtype)
+        if not np.array_equal(cast[field], values, equal_nan=pd.api.types.is_float_dtype(values)):
+            return None
+
+    date_idx = first_col + np.searchsorted(new_dates, day_values)
+    dates = np.load(cube._path('dates'), mmap_mode='r+')
+    dates[first_col:] = np.datetime64(0, 'D')
+    dates[first_col:n_days] = new_dates
+    dates.flush()
+    for name, values in [('mask', np.ones(len(codes), dtype=bool))] + list(cast.items()):
+        array = np.load(cube._path(name), mmap_mode='r+')
+        array[:, first_col:] = 0
+        array[code_idx, date_idx] = values
+        array.flush()
+
+    if 'name' in merged.columns and len(codes):
+        last_rows = np.r_[np.nonzero(np.diff(code_idx))[0], len(code_idx) - 1]
+        names = cube.names.copy()
+        names[code_idx[last_rows]] = merged['name'].astype(str).to_numpy()[last_rows]
+        if not np.array_equal(names, cube.names):
+            _save(cube._path('names'), names)
+
+    _write_manifest(cube_dir, dict(cube.manifest, n_days=int(n_days), source=signature, built_ns=built_ns,
+                                   built_at=datetime.now().isoformat(timespec='seconds')))
+    return len(merged)
+
+def build(cube_dir=DEFAULT_DIR, data_dir='.', full=False):
+    """
+    큐브를 만들거나 새 거래일만 반영합니다.
+    :param full: True 이면 항상 전체 재생성
+    :return: ('fresh' | 'incremental' | 'full', 기록한 행 수)
+    """
+    path = os.path.join(data_dir, cube_dir)
+    # 서명과 변경 기록 기준 시각은 읽기 전에 계산 (읽는 도중 원본이 바뀌면 다음 실행에서 다시 갱신됨)
+    built_ns = time.time_ns()
+    signature = data_access.source_signature(data_dir)
+    if not full and os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        try:
+            manifest = PriceCube(path).manifest
+        except ValueError:
+            manifest = None
+        if manifest is not None:
+            if manifest['source'] == signature:
+                return 'fresh', 0
+            rows = _append(path, data_dir, signature, built_ns)
+            if rows is not None:
+                return 'incremental', rows
+    return 'full', _build_full(path, data_dir, signature, built_ns)
+
+def main():
+    parser = argparse.ArgumentParser(description="메모리 매핑 가격 큐브 빌드")
+    parser.add_argument('command', nargs='?', choices=['build', 'info'], default='build')
+    parser.add_argument('--full', action='store_true', help="증분 갱신 대신 전체 재생성")
+    parser.add_argument('--cube-dir', default=DEFAULT_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        if not os.path.exists(os.path.join(args.cube_dir, MANIFEST_FILE)):
+            print(f"Price cube not found: {args.cube_dir}")
+            return
+        cube = PriceCube(args.cube_dir)
+        state = 'fresh' if open_fresh(args.cube_dir) is not None else 'stale'
+        print(f"{len(cube.codes)} codes x {cube.n_days} days (capacity {cube.manifest['capacity']}), "
+              f"{cube.dates[0] if cube.n_days else '-'} ~ {cube.dates[-1] if cube.n_days else '-'}, {state}")
+        return
+
+    try:
+        with metrics.span('write'):
+            mode, rows = build(args.cube_dir, full=args.full)
+    except FileNotFoundError as e:
+        print(f"Error building price cube: {e}")
+        return
+    print(f"Price cube {mode}: {rows:,} rows written to {args.cube_dir}")
+    metrics.write('price_cube')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""
+시장/종목별로 분할한 Parquet 일별 시세 저장소 (daily_prices.csv 대체).
+
+    price_store/
+     ┣ _schema.json                          # 스키마 레지스트리 (데이터셋별 버전 + 필드 타입)
+     ┣ _changes.log                          # write() 마다 '<시각 ns> <가장 이른 날짜>' 한 줄 (파생 데이터 증분 갱신용)
+     ┣ market=KR/code=005930/part-0.parquet
+     ┗ market=US/code=AAPL/part-0.parquet
+
+- 쓰기: 종목 파티션 단위 upsert (같은 날짜는 새 값으로 교체), 임시 파일 후 교체
+- 읽기: 컬럼 선택(projection)과 market/code/date 조건 pushdown
+  (code 조건은 파티션 디렉터리 단위로, date 조건은 Parquet 통계로 걸러짐)
+- 수집: 수집기는 실행 중 받은 행을 _segments/ 에 불변 세그먼트 파일로 추가하고 (임시 파일 후 rename),
+  compact() 가 세그먼트를 순서대로 종목 파티션에 병합 (같은 (code, date) 는 나중 세그먼트 우선).
+  쓰기 비용은 새 데이터 크기에 비례하고, 수집/병합 도중 중단돼도 기존 파티션은 그대로이며
+  남은 세그먼트는 다음 compact() 에서 다시 병합됨 (병합은 멱등)
+- 호환: export_csv() 로 기존 daily_prices.csv 형식 출력
+
+    python price_store.py import daily_prices.csv    # 기존 CSV 이관
+    python price_store.py export daily_prices.csv    # CSV 로 내보내기
+    python price_store.py compact                    # 남은 세그먼트 병합
+    python price_store.py info
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DEFAULT_ROOT = 'price_store'
+SCHEMA_FILE = '_schema.json'
+PART_FILE = 'part-0.parquet'
+SEGMENT_DIR = '_segments'
+COMPACT_LOCK = '.compact.lock'
+CHANGE_LOG = '_changes.log'
+# 이 시간보다 오래된 잠금/임시 파일은 중단된 실행의 잔여물로 보고 정리
+STALE_SECONDS = 3600
+
+# 스키마 레지스트리: 필드 타입이 바뀌면 version 을 올리고 재이관 (python price_store.py import)
+SCHEMA_REGISTRY = {
+    'daily_prices': {
+        'version': 1,
+        'partitioning': [['market', 'string'], ['code', 'string']],
+        'fields': [
+            ['date', 'date32'],
+            ['close', 'float64'],
+            ['diff', 'float64'],
+            ['open', 'float64'],
+            ['high', 'float64'],
+            ['low', 'float64'],
+            ['volume', 'int64'],
+            ['name', 'string'],
+        ],
+    },
+}
+
+def _schema(fields):
+    return pa.schema([(name, pa.type_for_alias(alias)) for name, alias in fields])
+
+def market_of(code):
+    """종목코드로 시장 추정 (숫자로 시작하는 6자리 = KR, 그 외 = US 티커)"""
+    code = str(code)
+    return 'KR' if len(code) == 6 and code[0].isdigit() else 'US'
+
+class PriceStore:
+    def __init__(self, root=DEFAULT_ROOT, dataset='daily_prices'):
+        """
+        :param root: 저장소 디렉터리
+        :param dataset: SCHEMA_REGISTRY 의 데이터셋 이름
+        """
+        self.root = root
+        self.dataset = dataset
+        self.spec = SCHEMA_REGISTRY[dataset]
+        self.schema = _schema(self.spec['fields'])
+        self.partition_schema = _schema(self.spec['partitioning'])
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.root, SCHEMA_FILE))
+
+    def _check_registry(self):
+        """저장된 스키마 버전이 현재 코드와 같은지 확인 (없으면 새로 기록)"""
+        path = os.path.join(self.root, SCHEMA_FILE)
+        registry = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                registry = json.load(f)
+        stored = registry.get(self.dataset)
+        if stored is None:
+            registry[self.dataset] = self.spec
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(registry, f, indent=2)
+            os.replace(tmp_path, path)
+        elif stored['version'] != self.spec['version']:
+            raise ValueError(f"{self.root}: {self.dataset} schema version {stored['version']} != "
+                             f"{self.spec['version']}. Re-import with 'python price_store.py import'.")
+
+    def _partition_path(self, market, code):
+        return os.path.join(self.root, f'market={market}', f'code={code}', PART_FILE)
+
+    def _to_table(self, df):
+        """DataFrame 을 레지스트리 스키마에 맞춘 Arrow 테이블로 변환 (없는 컬럼은 null)"""
+        columns = {}
+        for field in self.schema:
+            if field.name not in df.columns:
+                columns[field.name] = pa.nulls(len(df), field.type)
+            elif field.name == 'date':
+                dates = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+                columns[field.name] = pa.array(dates, field.type)
+            elif pa.types.is_string(field.type):
+                columns[field.name] = pa.array(df[field.name].astype(object).where(df[field.name].notna()), field.type)
+            else:
+                values = pd.to_numeric(df[field.name], errors='coerce')
+                columns[field.name] = pa.array(values, field.type, from_pandas=True)
+        return pa.table(columns, schema=self.schema)
+
+    def write(self, df, market=None):
+        """
+        종목별 파티션에 upsert 합니다. 같은 날짜 행은 새 값으로 교체되고 날짜순으로 정렬됩니다.
+        :param df: date, code (+ 가격 컬럼, name) DataFrame
+        :param market: 시장 (None 이면 market 컬럼 또는 종목코드로 추정)
+        :return: 기록한 종목 수
+        """
+        self._check_registry()
+        df = df.assign(code=df['code'].astype(str))
+        if market is not None:
+            markets = pd.Series(market, index=df.index)
+        elif 'market' in df.columns:
+            markets = df['market']
+        else:
+            inverse, uniques = pd.factorize(df['code'])
+            markets = pd.Series(np.array([market_of(c) for c in uniques], dtype=object)[inverse], index=df.index)
+
+        # 스키마 변환은 한 번만 하고 종목별로 잘라서 기록
+        table = self._to_table(df)
+        # 파티션을 고치기 전에 바뀌는 가장 이른 날짜를 기록 (중간에 중단돼도 변경 범위가 누락되지 않음)
+        if len(table):
+            self._log_change(table['date'].to_numpy(zero_copy_only=False).astype('datetime64[D]').min())
+        written = 0
+        for (mkt, code), rows in pd.Series(range(len(df))).groupby([markets.to_numpy(), df['code'].to_numpy()], sort=False).indices.items():
+            path = self._partition_path(mkt, code)
+            part = table.take(rows)
+            if os.path.exists(path):
+                part = pa.concat_tables([pq.read_table(path, schema=self.schema), part])
+
+            # 날짜순 정렬, 같은 날짜는 마지막(새) 행만 유지
+            dates = part['date'].to_numpy(zero_copy_only=False).astype('datetime64[D]').view('int64')
+            order = np.argsort(dates, kind='stable')
+            keep = np.r_[dates[order][1:] != dates[order][:-1], True]
+            part = part.take(order[keep])
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 숨김 임시 이름으로 쓴 뒤 rename (읽기는 PART_FILE 만 보므로 중단된 임시 파일은 읽히지 않음)
+            tmp_path = os.path.join(os.path.dirname(path), f'.{PART_FILE}.{os.getpid()}.tmp')
+            pq.write_table(part, tmp_path)
+            os.replace(tmp_path, path)
+            written += 1
+        return written
+
+    def _log_change(self, first_date):
+        os.makedirs(self.root, exist_ok=True)
+        # O_APPEND 한 줄 쓰기라 동시에 기록해도 줄이 섞이지 않음
+        with open(os.path.join(self.root, CHANGE_LOG), 'a', encoding='utf-8') as f:
+            f.write(f'{time.time_ns()} {first_date}\n')
+
+    def changed_since(self, time_ns):
+        """
+        time_ns (time.time_ns()) 이후 write() 로 바뀐 가장 이른 날짜.
+        :return: Timestamp (바뀐 행이 없으면 None)
+        """
+        path = os.path.join(self.root, CHANGE_LOG)
+        if not os.path.exists(path):
+            return None
+        earliest = None
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and int(parts[0]) >= time_ns:
+                    date = pd.Timestamp(parts[1])
+                    earliest = date if earliest is None else min(earliest, date)
+        return earliest
+
+    def _segment_dir(self):
+        return os.path.join(self.root, SEGMENT_DIR)
+
+    def append_segment(self, df, market=None):
+        """
+        행을 새 세그먼트 파일로 추가합니다 (기존 파일은 건드리지 않음).
+        파일은 임시 이름으로 쓴 뒤 rename 되므로 세그먼트는 완전히 쓰였거나 없거나 둘 중 하나입니다.
+        :param df: write() 와 같은 형식
+        :param market: 시장 (None 이면 market 컬럼 또는 종목코드로 추정)
+        :return: 세그먼트 경로 (행이 없으면 None)
+        """
+        if len(df) == 0:
+            return None
+        self._check_registry()
+        codes = df['code'].astype(str)
+        if market is not None:
+            markets = np.full(len(df), market, dtype=object)
+        elif 'market' in df.columns:
+            markets = df['market'].astype(str).to_numpy()
+        else:
+            inverse, uniques = pd.factorize(codes)
+            markets = np.array([market_of(c) for c in uniques], dtype=object)[inverse]
+        table = self._to_table(df).append_column('market', pa.array(markets, pa.string())) \
+            .append_column('code', pa.array(codes.to_numpy(dtype=object), pa.string()))
+
+        segment_dir = self._segment_dir()
+        os.makedirs(segment_dir, exist_ok=True)
+        # 이름순 = 추가 순서 (나노초 시각 + pid 로 동시 실행도 구분)
+        name = f'{time.time_ns():020d}-{os.getpid()}.parquet'
+        tmp_path = os.path.join(segment_dir, f'.{name}.tmp')
+        pq.write_table(table, tmp_path)
+        path = os.path.join(segment_dir, name)
+        os.replace(tmp_path, path)
+        return path
+
+    def segments(self):
+        """병합 대기 중인 세그먼트 경로 (추가 순서)"""
+        segment_dir = self._segment_dir()
+        if not os.path.isdir(segment_dir):
+            return []
+        return [os.path.join(segment_dir, name) for name in sorted(os.listdir(segment_dir))
+                if name.endswith('.parquet')]
+
+    def compact(self):
+        """
+        세그먼트를 추가 순서대로 종목 파티션에 upsert 하고 삭제합니다.
+        다른 프로세스가 병합 중이면 건너뜁니다.
+        :return: 병합한 세그먼트 수
+        """
+        segment_dir = self._segment_dir()
+        if not os.path.isdir(segment_dir):
+            return 0
+        now = time.time()
+        for name in os.listdir(segment_dir):
+            path = os.path.join(segment_dir, name)
+            if name.endswith('.tmp') and now - os.path.getmtime(path) > STALE_SECONDS:
+                os.remove(path)
+        self._remove_stale_partition_tmp(now)
+
+        lock_path = os.path.join(segment_dir, COMPACT_LOCK)
+        if os.path.exists(lock_path) and now - os.path.getmtime(lock_path) > STALE_SECONDS:
+            os.remove(lock_path)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            print(f"Compaction already running ({lock_path}), skipping.")
+            return 0
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            paths = self.segments()
+            if not paths:
+                return 0
+            tables = [pq.read_table(path) for path in paths]
+            # 이어 붙인 순서가 곧 우선순위 (write() 는 같은 날짜의 마지막 행을 유지)
+            self.write(pa.concat_tables(tables).to_pandas(date_as_object=False))
+            # 파티션 반영 후 삭제: 여기서 중단되면 다음 병합에서 같은 값으로 다시 반영됨
+            for path in paths:
+                os.remove(path)
+            return len(paths)
+        finally:
+            os.remove(lock_path)
+
+    def _partition_dirs(self):
+        """market=*/code=* 파티션 디렉터리 경로"""
+        dirs = []
+        for market in os.scandir(self.root):
+            if market.is_dir() and market.name.startswith('market='):
+                dirs += [code.path for code in os.scandir(market.path)
+                         if code.is_dir() and code.name.startswith('code=')]
+        return dirs
+
+    def _remove_stale_partition_tmp(self, now):
+        """중단된 write() 가 파티션에 남긴 오래된 임시 파일 삭제"""
+        for partition in self._partition_dirs():
+            for name in os.listdir(partition):
+                path = os.path.join(partition, name)
+                if name.endswith('.tmp') and now - os.path.getmtime(path) > STALE_SECONDS:
+                    os.remove(path)
+
+    def retain(self, codes, market):
+        """market 파티션 중 codes 에 없는 종목 삭제 (상장폐지/목록 제외 종목 정리)"""
+        market_dir = os.path.join(self.root, f'market={market}')
+        if not os.path.isdir(market_dir):
+            return 0
+        keep = {f'code={code}' for code in codes}
+        removed = 0
+        for name in os.listdir(market_dir):
+            if name.startswith('code=') and name not in keep:
+                shutil.rmtree(os.path.join(market_dir, name))
+                removed += 1
+        return removed
+
+    def remove(self, codes, market):
+        """market 파티션 중 codes 종목 삭제 (다시 받은 전체 시세로 교체할 때, 세그먼트 추가 후 호출)"""
+        removed = 0
+        for code in codes:
+            partition = os.path.dirname(self._partition_path(market, code))
+            if os.path.isdir(partition):
+                shutil.rmtree(partition)
+                removed += 1
+        return removed
+
+    def _dataset(self):
+        # 파티션의 PART_FILE 만 읽음 (중단된 write() 의 임시 파일, 세그먼트, 레지스트리 제외)
+        paths = [os.path.join(partition, PART_FILE) for partition in self._partition_dirs()]
+        paths = [path for path in paths if os.path.exists(path)]
+        partitioning = ds.partitioning(self.partition_schema, flavor='hive')
+        return ds.dataset(paths, format='parquet', partitioning=partitioning, partition_base_dir=self.root,
+                          schema=pa.unify_schemas([self.schema, self.partition_schema]))
+
+    def read(self, columns=None, codes=None, start=None, end=None, markets=None, categorical=False):
+        """
+        조건에 맞는 행을 (code, date) 순 DataFrame 으로 읽습니다.
+        :param columns: 읽을 컬럼 (None 이면 전체, code 와 date 는 항상 포함)
+        :param codes: 종목코드 목록 (파티션 단위로 걸러짐)
+        :param start, end: 날짜 범위 (포함)
+        :param markets: 시장 목록 ('KR', 'US')
+        :param categorical: True 이면 문자열 컬럼(code, name, market)을 category 로 반환
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"Price store not found: {self.root}")
+        self._check_registry()
+
+        names = [f.name for f in self.schema] + ['market', 'code']
+        if columns is not None:
+            unknown = set(columns) - set(names)
+            if unknown:
+                raise KeyError(f"Unknown price columns: {sorted(unknown)}")
+            names = ['code', 'date'] + [c for c in columns if c not in ('code', 'date')]
+        else:
+            names = ['code', 'date'] + [n for n in names if n not in ('code', 'date')]
+
+        expr = None
+        def add(condition):
+            nonlocal expr
+            expr = condition if expr is None else expr & condition
+        if codes is not None:
+            add(ds.field('code').isin([str(c) for c in codes]))
+        if markets is not None:
+            add(ds.field('market').isin(list(markets)))
+        if start is not None:
+            add(ds.field('date') >= pa.scalar(pd.Timestamp(start).date(), pa.date32()))
+        if end is not None:
+            add(ds.field('date') <= pa.scalar(pd.Timestamp(end).date(), pa.date32()))
+
+        table = self._dataset().to_table(columns=names, filter=expr)
+        df = table.to_pandas(date_as_object=False, strings_to_categorical=categorical)
+        if categorical:
+            # 카테고리 순서를 값 순서로 맞춰야 code 정렬이 문자열 정렬과 같음
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+        return df.sort_values(['code', 'date'], kind='mergesort').reset_index(drop=True)
+
+    def codes(self, market=None):
+        """저장된 종목코드 목록 (PART_FILE 이 없는 파티션 - 첫 write() 가 중단된 경우 - 은 제외)"""
+        markets = [market] if market else [d[len('market='):] for d in sorted(os.listdir(self.root))
+                                           if d.startswith('market=')] if os.path.isdir(self.root) else []
+        result = []
+        for mkt in markets:
+            market_dir = os.path.join(self.root, f'market={mkt}')
+            if os.path.isdir(market_dir):
+                result += sorted(d[len('code='):] for d in os.listdir(market_dir)
+                                 if d.startswith('code=') and os.path.exists(os.path.join(market_dir, d, PART_FILE)))
+        return result
+
+    def last_dates(self, market=None):
+        """
+        종목별 마지막 저장 날짜 (Parquet 통계만 읽으므로 데이터 페이지를 읽지 않음)
+        :return: 종목코드 -> Timestamp dict
+        """
+        result = {}
+        markets = [market] if market else ['KR', 'US']
+        for mkt in markets:
+            for code in self.codes(mkt):
+                meta = pq.read_metadata(self._partition_path(mkt, code))
+                date_idx = meta.schema.names.index('date')
+                maxima = [meta.row_group(i).column(date_idx).statistics.max for i in range(meta.num_row_groups)
+                          if meta.row_group(i).column(date_idx).statistics is not None]
+                if maxima:
+                    result[code] = pd.Timestamp(max(maxima))
+
+        # 아직 병합되지 않은 세그먼트의 날짜도 반영 (중단된 수집을 이어서 할 때 재요청 방지)
+        for path in self.segments():
+            pending = pq.read_table(path, columns=['market', 'code', 'date']).to_pandas(date_as_object=False)
+            if market:
+                pending = pending[pending['market'] == market]
+            for code, last in pending.groupby('code')['date'].max().items():
+                if code not in result or last > result[code]:
+                    result[code] = pd.Timestamp(last)
+        return result
+
+    def export_csv(self, path='daily_prices.csv', **filters):
+        """기존 daily_prices.csv 와 같은 컬럼 순서의 CSV 로 내보내기"""
+        df = self.read(**filters)
+        columns = [f.name for f in self.schema if f.name != 'name'] + ['code', 'name']
+        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+        df[columns].to_csv(path, index=False)
+        return len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="분할 Parquet 가격 저장소 관리")
+    parser.add_argument('command', choices=['import', 'export', 'compact', 'info'])
+    parser.add_argument('csv', nargs='?', default='daily_prices.csv')
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    args = parser.parse_args()
+
+    store = PriceStore(args.root)
+    if args.command == 'import':
+        df = pd.read_csv(args.csv, dtype={'code': str})
+        print(f"Imported {len(df):,} rows for {store.write(df)} codes into {args.root}")
+    elif args.command == 'compact':
+        print(f"Compacted {store.compact()} segments into {args.root}")
+    elif args.command == 'export':
+        print(f"Exported {store.export_csv(args.csv):,} rows to {args.csv}")
+    else:
+        if not store.exists():
+            print(f"Price store not found: {args.root}")
+            return
+        for market in ('KR', 'US'):
+            print(f"{market}: {len(store.codes(market))} codes")
+        print(f"Pending segments: {len(store.segments())}")
+
+if __name__ == "__main__":
+    main()
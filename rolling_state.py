@@ -0,0 +1,204 @@
+import hashlib
+import math
+import os
+import pickle
+from collections import deque
+
+import numpy as np
+
+STATE_VERSION = 1
+
+# 지표 윈도우 (analysis2._calculate_indicators_batch 와 동일)
+MA_WINDOWS = (20, 50, 200)
+VOL_WINDOW = 20
+RSI_WINDOW = 14
+HIGH_LOW_WINDOW = 250
+RETURN_PERIOD = 20
+
+def history_digest(dates, close, volume):
+    """날짜/종가/거래량 이력의 지문 (이력 변경 감지용)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(dates, dtype='int64').tobytes())
+    h.update(np.ascontiguousarray(close, dtype='float64').tobytes())
+    h.update(np.ascontiguousarray(volume, dtype='float64').tobytes())
+    return h.digest()
+
+class RollingIndicatorState:
+    """
+    종목 하나의 롤링 지표 상태.
+    새 봉 하나가 들어올 때마다 이동평균 합계, RSI 상승/하락 윈도우,
+    52주 최고/최저용 단조 덱을 O(1)(분할 상환)로 갱신합니다.
+    """
+
+    def __init__(self):
+        self.n_bars = 0
+        self.last_date = None
+        self.digest = None
+
+        self.closes = deque(maxlen=HIGH_LOW_WINDOW)
+        self.close_sums = {w: 0.0 for w in MA_WINDOWS}
+
+        self.volumes = deque(maxlen=VOL_WINDOW)
+        self.volume_sum = 0.0
+
+        self.gains = deque(maxlen=RSI_WINDOW)
+        self.losses = deque(maxlen=RSI_WINDOW)
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+
+        # (봉 번호, 종가) - 최고가 덱은 내림차순, 최저가 덱은 오름차순 유지
+        self.max_deque = deque()
+        self.min_deque = deque()
+
+    @classmethod
+    def from_history(cls, dates, close, volume):
+        """
+        전체 이력에서 상태를 만듭니다. 윈도우에 필요한 마지막 250봉만 재생합니다.
+        """
+        state = cls()
+        n = len(close)
+        start = max(0, n - HIGH_LOW_WINDOW - 1)
+        state.n_bars = start
+        prev_close = float(close[start - 1]) if start > 0 else None
+        for i in range(start, n):
+            state._push(float(close[i]), float(volume[i]), prev_close)
+            prev_close = float(close[i])
+        state.last_date = int(dates[-1]) if n else None
+        state.digest = history_digest(dates, close, volume)
+        return state
+
+    def _push(self, close, volume, prev_close):
+        i = self.n_bars
+
+        # 이동평균 합계: 윈도우를 벗어나는 값 제거
+        for w in MA_WINDOWS:
+            if len(self.closes) >= w:
+                self.close_sums[w] -= self.closes[-w]
+            self.close_sums[w] += close
+
+        if len(self.volumes) == VOL_WINDOW:
+            self.volume_sum -= self.volumes[0]
+        self.volumes.append(volume)
+        self.volume_sum += volume
+
+        # RSI 상승/하락폭 (첫 봉은 0)
+        delta = close - prev_close if prev_close is not None else 0.0
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if len(self.gains) == RSI_WINDOW:
+            self.gain_sum -= self.gains[0]
+            self.loss_sum -= self.losses[0]
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.gain_sum += gain
+        self.loss_sum += loss
+
+        # 52주 최고/최저 단조 덱
+        while self.max_deque and self.max_deque[-1][1] <= close:
+            self.max_deque.pop()
+        self.max_deque.append((i, close))
+        while self.min_deque and self.min_deque[-1][1] >= close:
+            self.min_deque.pop()
+        self.min_deque.append((i, close))
+        while self.max_deque[0][0] <= i - HIGH_LOW_WINDOW:
+            self.max_deque.popleft()
+        while self.min_deque[0][0] <= i - HIGH_LOW_WINDOW:
+            self.min_deque.popleft()
+
+        self.closes.append(close)
+        self.n_bars += 1
+
+    def advance(self, dates, close, volume):
+        """
+        저장된 이력 뒤에 붙은 새 봉만 반영합니다.
+        :return: 성공 여부 (기존 이력이 바뀌었으면 False -> 전체 재계산 필요)
+        """
+        n = len(close)
+        k = self.n_bars
+        if k == 0 or n < k or int(dates[k - 1]) != self.last_date:
+            return False
+        if history_digest(dates[:k], close[:k], volume[:k]) != self.digest:
+            return False
+
+        for i in range(k, n):
+            self._push(float(close[i]), float(volume[i]), float(close[i - 1]))
+        self.last_date = int(dates[-1])
+        if n > k:
+            self.digest = history_digest(dates, close, volume)
+        return True
+
+    def indicators(self):
+        """최신 봉 기준 지표 값 (analysis2 지표 컬럼과 동일한 이름)"""
+        n = self.n_bars
+        close = self.closes[-1]
+        result = {}
+
+        for w in MA_WINDOWS:
+            result[f'ma{w}'] = self.close_sums[w] / w if n >= w else np.nan
+        result['vol_ma20'] = self.volume_sum / VOL_WINDOW if n >= VOL_WINDOW else np.nan
+
+        if n >= RSI_WINDOW:
+            gain = self.gain_sum / RSI_WINDOW
+            loss = self.loss_sum / RSI_WINDOW
+            if loss != 0:
+                result['rsi'] = 100 - (100 / (1 + gain / loss))
+            else:
+                result['rsi'] = 100.0 if gain > 0 else np.nan
+        else:
+            result['rsi'] = np.nan
+
+        high = self.max_deque[0][1]
+        low = self.min_deque[0][1]
+        result['52w_high'] = high
+        result['52w_low'] = low
+        result['52w_pos'] = (close - low) / (high - low) if high != low else np.nan
+
+        if n > RETURN_PERIOD and len(self.closes) > RETURN_PERIOD:
+            base = self.closes[-RETURN_PERIOD - 1]
+            result['return_20d'] = (close / base - 1) * 100 if base != 0 else math.copysign(np.inf, close)
+        else:
+            result['return_20d'] = np.nan
+        return result
+
+class IndicatorStateCache:
+    """
+    종목별 RollingIndicatorState 를 실행 간에 보관하는 파일 캐시.
+    """
+
+    def __init__(self, path='indicator_state.pkl', load=True):
+        self.path = path
+        self.states = {}
+        if load and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    payload = pickle.load(f)
+                if payload.get('version') == STATE_VERSION:
+                    self.states = payload['states']
+            except Exception as e:
+                print(f"Ignoring unreadable indicator state cache {path}: {e}")
+
+    def advance(self, code, dates, close, volume):
+        """
+        캐시된 상태에 새 봉을 반영하고 최신 지표를 반환합니다.
+        :return: 지표 dict, 상태가 없거나 이력이 바뀌었으면 None
+        """
+        state = self.states.get(code)
+        if state is None or not state.advance(dates, close, volume):
+            self.states.pop(code, None)
+            return None
+        return state.indicators()
+
+    def rebuild(self, code, dates, close, volume):
+        """전체 재계산한 종목의 상태를 새로 만듭니다."""
+        self.states[code] = RollingIndicatorState.from_history(dates, close, volume)
+
+    def retain(self, codes):
+        """현재 데이터에 없는 종목의 상태를 정리합니다."""
+        codes = set(codes)
+        self.states = {c: s for c, s in self.states.items() if c in codes}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': STATE_VERSION, 'states': self.states}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
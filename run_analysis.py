@@ -1,16 +1,22 @@
+import argparse
+import json
 import os
 import subprocess
 import time
+from datetime import datetime
 
-def run_script(script_name):
+import http_cache
+import metrics
+
+def run_script(script_name, env=None):
     print(f"\n{'='*50}")
     print(f"Running {script_name}...")
     print(f"{'='*50}\n")
-    
+
     start_time = time.time()
     try:
         # python3 대신 python 사용 (Windows 환경 고려)
-        result = subprocess.run(['python', script_name], check=True)
+        result = subprocess.run(['python', *script_name.split()], check=True, env=env)
         end_time = time.time()
         print(f"\nSuccessfully finished {script_name} in {end_time - start_time:.2f} seconds.")
         return True
@@ -20,7 +26,7 @@ def run_script(script_name):
     except FileNotFoundError:
         # python 명령어가 없을 경우 python3 시도
         try:
-            result = subprocess.run(['python3', script_name], check=True)
+            result = subprocess.run(['python3', *script_name.split()], check=True, env=env)
             end_time = time.time()
             print(f"\nSuccessfully finished {script_name} in {end_time - start_time:.2f} seconds.")
             return True
@@ -28,25 +34,83 @@ def run_script(script_name):
             print(f"\nError running {script_name}: {e}")
             return False
 
+def write_pipeline_metrics(metrics_dir, scripts, prometheus_dir=None):
+    """
+    스크립트별 측정 파일을 모아 파이프라인 전체 요약(pipeline.json)을 저장하고 출력합니다.
+    :param scripts: 스크립트명 -> {'seconds': 실행 시간, 'ok': 성공 여부}
+    """
+    jobs = {os.path.splitext(script.split()[0])[0]: script for script in scripts}
+    summary = metrics.load_run(metrics_dir, jobs)
+    peaks = [data['peak_rss_mb'] for data in summary['jobs'].values()]
+    data = {
+        'job': 'pipeline',
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'wall_seconds': round(sum(s['seconds'] for s in scripts.values()), 4),
+        'peak_rss_mb': max(peaks) if peaks else float('nan'),
+        'scripts': scripts,
+        'spans': summary['spans'],
+        'counters': summary['counters'],
+        'histograms': summary['histograms'],
+        'jobs': {job: {'spans': d['spans'], 'counters': d['counters']} for job, d in summary['jobs'].items()},
+    }
+    metrics.atomic_write(os.path.join(metrics_dir, 'pipeline.json'), json.dumps(data, indent=2, ensure_ascii=False))
+    if prometheus_dir:
+        metrics.atomic_write(os.path.join(prometheus_dir, 'stockai_pipeline.prom'), metrics.to_prometheus(data))
+
+    # 어디서 시간이 쓰였는지 요약
+    print(f"\n⏱  Pipeline metrics ({metrics_dir})")
+    for script, s in sorted(scripts.items(), key=lambda x: -x[1]['seconds']):
+        print(f"  {script:<36} {s['seconds']:>8.1f}s {'' if s['ok'] else '(failed)'}")
+    for name, v in sorted(data['spans'].items(), key=lambda x: -x[1]['seconds']):
+        if v['count']:
+            print(f"  [{name}] {v['seconds']:.1f}s over {v['count']:,} calls")
+    print("  " + ", ".join(f"{name}={value:,}" for name, value in data['counters'].items()))
+    for name, series in data['histograms'].items():
+        for host, h in sorted(series.items()):
+            if h['count']:
+                print(f"  [{name}] {host}: {h['count']:,} requests, mean {h['sum'] / h['count'] * 1000:.0f}ms")
+    return data
+
 def main():
+    parser = argparse.ArgumentParser(description="StockAI 전체 분석 파이프라인")
+    parser.add_argument('--metrics-dir', help="실행 측정값 저장 디렉터리 (기본: metrics/<실행 시각>)")
+    parser.add_argument('--prometheus-dir', help="Prometheus textfile collector 디렉터리 (선택)")
+    parser.add_argument('--http-cache', choices=http_cache.MODES, default='on',
+                        help="수집기 HTTP 응답 캐시 (on: 재실행 시 TTL 안의 페이지 재사용, replay: 캐시만으로 오프라인 실행)")
+    args = parser.parse_args()
+
     print("🚀 Starting StockAI Analysis Pipeline...")
-    
+
+    # 하위 스크립트가 같은 디렉터리에 측정값을 남기도록 환경 변수로 전달
+    metrics_dir = args.metrics_dir or os.path.join(metrics.DEFAULT_METRICS_DIR, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    env = dict(os.environ, **{metrics.METRICS_DIR_ENV: metrics_dir})
+    if args.prometheus_dir:
+        env[metrics.PROMETHEUS_DIR_ENV] = args.prometheus_dir
+    env[http_cache.CACHE_MODE_ENV] = args.http_cache
+
     scripts = [
         'fetch_hot_stocks.py',
         'fetch_us_stocks.py',
-        'create_complete_daily_prices.py',
+        # 국내 시세와 투자자 동향은 frgn.naver 페이지 하나의 흐름으로 함께 수집
+        'create_complete_daily_prices.py --combined',
         'collect_us_daily_prices.py',
-        'all_institutional_trend_data.py',
         'collect_fundamentals.py',
+        'price_cube.py',
         'analysis2.py',
         'investigate_top_stocks.py'
     ]
-    
+
+    timings = {}
     for script in scripts:
-        if not run_script(script):
+        start_time = time.time()
+        ok = run_script(script, env)
+        timings[script] = {'seconds': round(time.time() - start_time, 2), 'ok': ok}
+        if not ok:
             print(f"\n❌ Pipeline stopped due to error in {script}")
+            write_pipeline_metrics(metrics_dir, timings, args.prometheus_dir)
             return
-            
+
+    write_pipeline_metrics(metrics_dir, timings, args.prometheus_dir)
     print("\n✨ All analysis steps completed successfully!")
     print("Run 'streamlit run dashboard/app.py' to view the results.")
 
@@ -0,0 +1,232 @@
+"""
+수급/재무 데이터용 SQLite 저장소 (all_institutional_trend_data.csv, fundamentals.csv 대체).
+
+- WAL 모드: 수집 스크립트가 쓰는 동안에도 분석/대시보드가 읽을 수 있음
+- 복합 기본키 (code, date) 테이블에 executemany upsert (같은 키는 새 값으로 교체)
+- 종목/기간 조건 읽기는 기본키 인덱스 범위 탐색
+- date 컬럼이 있는 테이블은 upsert 마다 바뀐 가장 이른 날짜를 change_log 에 기록 (파생 데이터 증분 갱신용)
+
+일별 시세는 price_store (시장/종목별 Parquet) 에 저장되며, 세 데이터셋 모두
+data_access 모듈을 통해 읽습니다.
+
+    python stock_db.py import investor_trends all_institutional_trend_data.csv   # 기존 CSV 이관
+    python stock_db.py export fundamentals fundamentals.csv
+    python stock_db.py info
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DB = 'stock_data.db'
+
+# 테이블별 (컬럼, SQLite 타입) 과 기본키. 컬럼을 추가하면 기존 DB 에도 ALTER TABLE 로 반영됨
+TABLES = {
+    'investor_trends': {
+        'columns': [
+            ('code', 'TEXT NOT NULL'),
+            ('date', 'TEXT NOT NULL'),          # YYYY-MM-DD (문자열 정렬 = 날짜 정렬)
+            ('institution_net_buy', 'INTEGER'),
+            ('foreigner_net_buy', 'INTEGER'),
+        ],
+        'key': ['code', 'date'],
+    },
+    'fundamentals': {
+        'columns': [
+            ('code', 'TEXT NOT NULL'),
+            ('name', 'TEXT'),
+            ('country', 'TEXT'),
+            ('PER', 'REAL'),
+            ('PBR', 'REAL'),
+            ('ROE', 'REAL'),
+            ('EPS', 'REAL'),
+            ('Dividend_Yield', 'REAL'),
+            ('Market_Cap', 'REAL'),
+            ('Revenue_Growth', 'REAL'),
+            ('fetched_at', 'TEXT'),             # 마지막 수집 성공 시각 (YYYY-MM-DD HH:MM:SS, 캐시 TTL 기준)
+            ('changed_at', 'TEXT'),             # 지표 값이 마지막으로 바뀐 수집 시각
+        ],
+        'key': ['code'],
+    },
+}
+
+# upsert 시각(ns)별로 바뀐 가장 이른 날짜 (TABLES 와 달리 직접 관리)
+CHANGE_LOG_SQL = ('CREATE TABLE IF NOT EXISTS change_log ("table" TEXT NOT NULL, written_at INTEGER NOT NULL, '
+                  'first_date TEXT NOT NULL, PRIMARY KEY ("table", written_at)) WITHOUT ROWID')
+
+def _sql_value(value):
+    """numpy/pandas 값을 sqlite3 가 받는 파이썬 값으로 변환 (결측은 NULL)"""
+    if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class StockDB:
+    def __init__(self, path=DEFAULT_DB):
+        """
+        :param path: SQLite 파일 경로
+        """
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def connect(self):
+        """WAL 모드 연결을 열고 테이블/누락 컬럼을 만듭니다."""
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL 에서는 NORMAL 로도 커밋 단위 일관성이 보장됨 (전원 장애 시 마지막 커밋만 유실 가능)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        for table, spec in TABLES.items():
+            columns = ', '.join(f'"{name}" {sql_type}' for name, sql_type in spec['columns'])
+            key = ', '.join(f'"{name}"' for name in spec['key'])
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({key})) WITHOUT ROWID')
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            for name, sql_type in spec['columns']:
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{name}" {sql_type.replace(" NOT NULL", "")}')
+        conn.execute(CHANGE_LOG_SQL)
+        return conn
+
+    def upsert(self, table, df):
+        """
+        키가 같은 행은 새 값으로 교체하고 나머지는 추가합니다 (한 트랜잭션).
+        테이블에 없는 DataFrame 컬럼은 무시하고, DataFrame 에 없는 컬럼은 기존 값을 유지합니다.
+        :param table: TABLES 의 테이블 이름
+        :param df: 최소한 기본키 컬럼을 포함한 DataFrame
+        :return: 기록한 행 수
+        """
+        spec = TABLES[table]
+        names = [name for name, _ in spec['columns'] if name in df.columns]
+        missing = set(spec['key']) - set(names)
+        if missing:
+            raise KeyError(f"{table}: missing key columns {sorted(missing)}")
+
+        df = df[names].assign(code=df['code'].astype(str))
+        if 'date' in names:
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        # 같은 배치 안의 중복 키는 마지막 행 사용
+        df = df.drop_duplicates(subset=spec['key'], keep='last')
+
+        quoted = ', '.join(f'"{name}"' for name in names)
+        updates = ', '.join(f'"{name}" = excluded."{name}"' for name in names if name not in spec['key'])
+        key = ', '.join(f'"{name}"' for name in spec['key'])
+        sql = (f'INSERT INTO {table} ({quoted}) VALUES ({", ".join("?" * len(names))}) '
+               f'ON CONFLICT ({key}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING'))
+        rows = ([_sql_value(v) for v in row] for row in df.itertuples(index=False, name=None))
+
+        conn = self.connect()
+        try:
+            with conn:
+                if 'date' in names and len(df):
+                    conn.execute('INSERT INTO change_log VALUES (?, ?, ?) ON CONFLICT ("table", written_at) DO UPDATE '
+                                 'SET first_date = MIN(first_date, excluded.first_date)',
+                                 (table, time.time_ns(), df['date'].min()))
+                conn.executemany(sql, rows)
+        finally:
+            conn.close()
+        return len(df)
+
+    def read(self, table, codes=None, start=None, end=None):
+        """
+        조건에 맞는 행을 기본키 순 DataFrame 으로 읽습니다 (date 는 datetime).
+        :param codes: 종목코드 목록 (None 이면 전체)
+        :param start, end: 날짜 범위 (포함, date 컬럼이 있는 테이블만)
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"Database not found: {self.path}")
+        spec = TABLES[table]
+        where, params = [], []
+        if codes is not None:
+            codes = [str(c) for c in codes]
+            where.append(f'code IN ({", ".join("?" * len(codes))})')
+            params += codes
+        if start is not None:
+            where.append('date >= ?')
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            where.append('date <= ?')
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        sql = f'SELECT * FROM {table}' + (f' WHERE {" AND ".join(where)}' if where else '') + \
+              f' ORDER BY {", ".join(spec["key"])}'
+
+        conn = self.connect()
+        try:
+            df = pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+        return df
+
+    def last_dates(self, table):
+        """
+        종목별 마지막 날짜 (증분 수집용, date 컬럼이 있는 테이블만).
+        :return: {code: Timestamp} (DB 가 없으면 빈 dict)
+        """
+        if not self.exists():
+            return {}
+        conn = self.connect()
+        try:
+            rows = conn.execute(f'SELECT code, MAX(date) FROM {table} GROUP BY code').fetchall()
+        finally:
+            conn.close()
+        return {code: pd.Timestamp(date) for code, date in rows}
+
+    def changed_since(self, table, time_ns):
+        """
+        time_ns (time.time_ns()) 이후 upsert 로 바뀐 table 의 가장 이른 날짜.
+        :return: Timestamp (바뀐 행이 없거나 DB 가 없으면 None)
+        """
+        if not self.exists():
+            return None
+        conn = self.connect()
+        try:
+            first = conn.execute('SELECT MIN(first_date) FROM change_log WHERE "table" = ? AND written_at >= ?',
+                                 (table, time_ns)).fetchone()[0]
+        finally:
+            conn.close()
+        return pd.Timestamp(first) if first is not None else None
+
+    def tables(self):
+        """테이블별 행 수"""
+        conn = self.connect()
+        try:
+            return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in TABLES}
+        finally:
+            conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="수급/재무 SQLite 저장소 관리")
+    parser.add_argument('command', choices=['import', 'export', 'info'])
+    parser.add_argument('table', nargs='?', choices=list(TABLES))
+    parser.add_argument('csv', nargs='?')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    args = parser.parse_args()
+
+    db = StockDB(args.db)
+    if args.command == 'info':
+        if not db.exists():
+            print(f"Database not found: {args.db}")
+            return
+        for table, count in db.tables().items():
+            print(f"{table}: {count:,} rows")
+        return
+    if args.table is None or args.csv is None:
+        parser.error(f"{args.command} requires TABLE and CSV")
+    if args.command == 'import':
+        df = pd.read_csv(args.csv, dtype={'code': str})
+        print(f"Imported {db.upsert(args.table, df):,} rows into {args.db}:{args.table}")
+    else:
+        df = db.read(args.table)
+        if 'date' in df.columns:
+            df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+        df.to_csv(args.csv, index=False)
+        print(f"Exported {len(df):,} rows to {args.csv}")
+
+if __name__ == "__main__":
+    main()
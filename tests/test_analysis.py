@@ -3,10 +3,12 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import tempfile
 
 # Add parent directory to path to import analysis2
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from analysis2 import EnhancedWaveTransitionAnalyzerV3
+from rolling_state import RollingIndicatorState
 
 class TestWaveAnalysis(unittest.TestCase):
     def setUp(self):
@@ -55,7 +57,21 @@ class TestWaveAnalysis(unittest.TestCase):
             
         # MA 계산 확인 (마지막 값)
         self.assertFalse(pd.isna(processed_df.iloc[-1]['ma20']))
-        
+
+    def test_batch_indicators_match_per_stock(self):
+        # 여러 종목을 한 번에 계산한 결과가 종목별 개별 계산과 같아야 함
+        up = self.create_mock_data('uptrend')
+        down = self.create_mock_data('downtrend').iloc[:120]
+        down['code'] = '000001'
+        batch_df = self.analyzer._calculate_indicators_batch(pd.concat([down, up]))
+
+        for code, df in [('000000', up), ('000001', down)]:
+            expected = df.sort_values('date').reset_index(drop=True)
+            actual = batch_df[batch_df['code'] == code].reset_index(drop=True)
+            pd.testing.assert_series_equal(actual['ma20'], expected['close'].rolling(20).mean(), check_names=False)
+            pd.testing.assert_series_equal(actual['52w_high'], expected['close'].rolling(250, min_periods=1).max(), check_names=False)
+            self.assertTrue(pd.isna(actual['return_20d'].iloc[19]))
+
     def test_strong_uptrend_logic(self):
         # 강한 상승 추세 조건 시뮬레이션
         df = self.create_mock_data('uptrend')
@@ -104,5 +120,88 @@ class TestWaveAnalysis(unittest.TestCase):
         self.assertLessEqual(score, 50)
         self.assertEqual(stage, "Weak/Downtrend")
 
+    def test_score_stocks_batch(self):
+        # 여러 종목 최신 행을 한 번에 채점 (상위 단계 우선, 가산점 포함)
+        base = {'ma20': 15000, 'ma50': 14000, 'ma200': 12000, '52w_pos': 0.7,
+                'close': 15500, 'volume': 15000, 'vol_ma20': 10000, 'rsi': 60,
+                'return_20d': 15, 'inst_5d': 0, 'for_5d': 0}
+        latest_df = pd.DataFrame([
+            base,                                          # Strong + Early 모두 만족 -> Strong
+            dict(base, return_20d=5),                      # Early
+            dict(base, ma20=14100, close=14000, rsi=50, volume=5000, **{'52w_pos': 0.5}),  # Transition
+            dict(base, ma20=9000, ma50=10000, inst_5d=10, for_5d=10, PER=10),  # Weak + 가산점
+            dict(base, ma50=np.nan, inst_5d=10),            # 데이터 부족 -> 가산점 없음
+        ])
+
+        scores, stages = self.analyzer.score_stocks(latest_df)
+
+        self.assertEqual(list(stages), ["Strong Uptrend", "Early Uptrend", "Transition",
+                                        "Weak/Downtrend", "Insufficient Data"])
+        self.assertEqual(list(scores), [90, 80, 70, 55, 0])
+
+    def test_rolling_state_matches_batch(self):
+        # 캐시된 상태에 새 봉만 반영한 결과가 전체 재계산과 같아야 함
+        df = self.create_mock_data('uptrend')
+        df['close'] = df['close'].round()
+        dates = df['date'].to_numpy().astype('datetime64[ns]').view('int64')
+        close = df['close'].to_numpy(dtype=float, copy=True)
+        volume = df['volume'].to_numpy(dtype=float)
+
+        state = RollingIndicatorState.from_history(dates[:240], close[:240], volume[:240])
+        self.assertTrue(state.advance(dates, close, volume))
+
+        expected = self.analyzer._calculate_indicators_batch(df).iloc[-1]
+        for col, value in state.indicators().items():
+            self.assertAlmostEqual(value, expected[col], places=6, msg=col)
+
+        # 과거 봉이 바뀌면 증분 반영 불가 -> 전체 재계산 필요
+        close[10] += 1
+        self.assertFalse(state.advance(dates, close, volume))
+
+    def test_workers_match_single_process(self):
+        # 프로세스 풀로 나눠 계산해도 단일 프로세스 결과와 동일해야 함
+        frames = []
+        for i, trend in enumerate(['uptrend', 'downtrend', 'uptrend']):
+            df = self.create_mock_data(trend).iloc[:80 + 60 * i].copy()
+            df['code'] = f'00000{i}'
+            frames.append(df)
+        df = pd.concat(frames, ignore_index=True)
+
+        single = EnhancedWaveTransitionAnalyzerV3()._calculate_latest_indicators(df)
+        pooled = EnhancedWaveTransitionAnalyzerV3(workers=2)._calculate_latest_indicators(df)
+
+        pd.testing.assert_frame_equal(single, pooled)
+        self.assertEqual(list(single['code']), ['000000', '000001', '000002'])
+
+    def test_typed_load_matches_merge(self):
+        # 타입 축소 + 정렬 키 조인 결과가 기존 pd.merge 결과와 같은 값이어야 함
+        up = self.create_mock_data('uptrend').iloc[:60]
+        down = self.create_mock_data('downtrend').iloc[:40].assign(code='000001', name='Other')
+        prices = pd.concat([up, down]).sample(frac=1, random_state=0)
+        investor = prices[['date', 'code', 'institution_net_buy', 'foreigner_net_buy']].iloc[:70]
+        prices = prices.drop(columns=['institution_net_buy', 'foreigner_net_buy'])
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                prices.to_csv('daily_prices.csv', index=False)
+                investor.to_csv('all_institutional_trend_data.csv', index=False)
+                self.assertTrue(self.analyzer.load_data())
+                expected = pd.merge(pd.read_csv('daily_prices.csv', dtype={'code': str}, parse_dates=['date']),
+                                    pd.read_csv('all_institutional_trend_data.csv', dtype={'code': str}, parse_dates=['date']),
+                                    on=['date', 'code'], how='left').fillna(0)
+            finally:
+                os.chdir(cwd)
+
+        merged = self.analyzer.merged_df
+        self.assertIsInstance(merged['code'].dtype, pd.CategoricalDtype)
+        self.assertEqual(merged['volume'].dtype, np.int32)
+        self.assertTrue(self.analyzer.fundamentals_df.empty)
+
+        expected = expected.sort_values(['code', 'date']).reset_index(drop=True)
+        actual = merged.astype({'code': str, 'name': str})
+        pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
+
 if __name__ == '__main__':
     unittest.main()
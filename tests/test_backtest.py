@@ -0,0 +1,61 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis2 import EnhancedWaveTransitionAnalyzerV3
+from backtest import run_backtest, prepare_backtest_frame
+from optimize_thresholds import run_sweep
+
+class TestBacktest(unittest.TestCase):
+    def create_mock_data(self, code, periods=120):
+        dates = pd.date_range(start='2024-01-01', periods=periods, freq='D')
+        close = np.linspace(10000, 15000, periods).round()
+        return pd.DataFrame({
+            'date': dates,
+            'close': close,
+            'volume': np.random.randint(10000, 50000, periods),
+            'institution_net_buy': np.random.randint(-1000, 1000, periods),
+            'foreigner_net_buy': np.random.randint(-1000, 1000, periods),
+            'name': 'TestStock',
+            'code': code
+        })
+
+    def test_latest_row_matches_analyzer(self):
+        df = pd.concat([self.create_mock_data('000000'), self.create_mock_data('000001', 80)])
+        signals, summary = run_backtest(df, horizons=(5,))
+
+        # 데이터 부족 구간 제외: 종목별 50번째 봉부터 채점
+        self.assertEqual(len(signals), (120 - 49) + (80 - 49))
+
+        analyzer = EnhancedWaveTransitionAnalyzerV3()
+        for code, group in df.groupby('code'):
+            processed = analyzer._calculate_technical_indicators(group)
+            score, stage = analyzer.analyze_stock(processed)
+            latest = signals[signals['code'] == code].iloc[-1]
+            self.assertEqual((latest['score'], latest['wave_stage']), (score, stage))
+
+        # 미래 수익률: 마지막 5개 봉은 계산 불가
+        self.assertTrue(signals.groupby('code').tail(5)['fwd_5d'].isna().all())
+        self.assertEqual(summary['signals'].sum(), len(signals))
+
+    def test_sweep_default_matches_backtest(self):
+        df = pd.concat([self.create_mock_data('000000'), self.create_mock_data('000001', 90)])
+        signals, summary = run_backtest(df, horizons=(5,))
+
+        frame = prepare_backtest_frame(df, (5,))
+        frame = frame[frame['eligible']]
+        results = run_sweep(frame, [{}, {'general_pos_min': 0.0, 'general_pos_max': 1.0}],
+                            horizon=5, target_stage="General Uptrend", min_signals=1)
+
+        # 기본 임계값 결과는 백테스트 요약과 같아야 함
+        default = results[results['general_pos_min'].isna()].iloc[0]
+        expected = signals[(signals['wave_stage'] == "General Uptrend") & signals['fwd_5d'].notna()]
+        self.assertEqual(default['signals'], len(expected))
+        # 범위를 넓히면 신호 수가 줄지 않아야 함
+        self.assertGreaterEqual(results['signals'].max(), default['signals'])
+
+if __name__ == '__main__':
+    unittest.main()
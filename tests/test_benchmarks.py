@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_analysis import generate_universe, run_case, find_regressions, STAGES
+
+class TestBenchmarks(unittest.TestCase):
+    def test_small_universe_runs_all_stages(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                rows = generate_universe(tmp, tickers=10, years=1)
+                prices = pd.read_csv(os.path.join(tmp, 'daily_prices.csv'), dtype={'code': str})
+                result = run_case(tmp)
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(len(prices), rows)
+        self.assertEqual(prices['code'].nunique(), 10)
+        self.assertFalse(prices.duplicated(['code', 'date']).any())
+        self.assertEqual(result['rows'], rows)
+        for stage in STAGES:
+            self.assertGreater(result[stage]['seconds'], 0)
+            self.assertGreater(result[stage]['peak_rss_mb'], 0)
+
+    def test_find_regressions(self):
+        baseline = {'100x1y': {'load': {'seconds': 1.0, 'peak_rss_mb': 100},
+                               'scoring': {'seconds': 0.01, 'peak_rss_mb': 100}}}
+        current = {'100x1y': {'load': {'seconds': 1.3, 'peak_rss_mb': 110},
+                              'scoring': {'seconds': 0.03, 'peak_rss_mb': 100}},
+                   '1000x1y': {'load': {'seconds': 9.0, 'peak_rss_mb': 900}}}
+
+        # 기준값 없는 케이스와 아주 짧은 단계는 제외
+        self.assertEqual(find_regressions(current, baseline, tolerance=0.2),
+                         [('100x1y', 'load', 'seconds', 1.0, 1.3)])
+        self.assertEqual(find_regressions(current, baseline, tolerance=0.5), [])
+
+if __name__ == '__main__':
+    unittest.main()
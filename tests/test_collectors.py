@@ -0,0 +1,221 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pandas as pd
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import create_complete_daily_prices as kr_prices
+import all_institutional_trend_data as kr_investor
+import fetch_hot_stocks as hot_stocks
+import http_client
+import metrics
+from fetch_engine import FetchEngine
+from price_store import PriceStore
+from data_access import load_investor_trends
+from test_naver_pages import frgn_html, ranking_html
+
+def sise_day_page(dates):
+    """네이버 sise_day 형식의 10일치 시세 페이지 (최신 날짜가 위)"""
+    rows = ''.join(f"<tr><td>{d.strftime('%Y.%m.%d')}</td><td>{1000 + i}</td><td>0</td>"
+                   f"<td>{1000 + i}</td><td>{1000 + i}</td><td>{1000 + i}</td><td>{100 + i}</td></tr>"
+                   for i, d in enumerate(dates))
+    return ("<html><body><table><tr><th>날짜</th><th>종가</th><th>전일비</th><th>시가</th>"
+            f"<th>고가</th><th>저가</th><th>거래량</th></tr>{rows}</table></body></html>")
+
+class FakeNaver:
+    """
+    최근 periods 영업일을 sise_day 는 10일씩, frgn 은 20일씩 나눠 응답
+    (실제 네이버처럼 마지막 페이지 뒤를 요청하면 마지막 페이지를 다시 보냄)
+    """
+    def __init__(self, last='2024-03-29', periods=30):
+        self.dates = pd.bdate_range(end=last, periods=periods)[::-1]
+        self.urls = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.urls.append(url)
+        page = int(url.rsplit('page=', 1)[1])
+        size = 20 if 'frgn.naver' in url else 10
+        page = min(page, -(-len(self.dates) // size))
+        if 'frgn.naver' in url:
+            dates = self.dates[(page - 1) * 20:page * 20]
+            html = frgn_html([(d.strftime('%Y.%m.%d'), 1000 + i, 10 * i, -i) for i, d in enumerate(dates)])
+        else:
+            html = sise_day_page(self.dates[(page - 1) * 10:page * 10])
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = html.encode('utf-8')
+        return response
+
+class TestIncrementalDailyPrices(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeNaver()
+        patches = [mock.patch.object(requests.Session, 'get', self.fake.get),
+                   mock.patch.object(http_client.client, 'hedge', False)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.engine = FetchEngine(rate=1000)
+
+    def test_full_history_without_stored_dates(self):
+        df = kr_prices.get_daily_price('005930', pages=kr_prices.FULL_PAGES, engine=self.engine)
+        # 1페이지 확인 후 PREFETCH_PAGES 개씩 동시에 요청하다가 반복된 페이지에서 중단
+        self.assertEqual(len(self.fake.urls), 1 + kr_prices.PREFETCH_PAGES)
+        self.assertEqual(len(df), 30)
+        self.assertTrue(df['date'].is_monotonic_increasing)
+
+    def test_short_history_stops_without_duplicates(self):
+        self.fake.dates = self.fake.dates[:13]
+        metrics.reset()
+        df = kr_prices.get_daily_price('005930', pages=kr_prices.FULL_PAGES, engine=self.engine)
+        self.assertEqual(len(df), 13)
+        self.assertFalse(df['date'].duplicated().any())
+        # 덜 찬 2페이지가 마지막 페이지
+        self.assertEqual(len(self.fake.urls), 1 + kr_prices.PREFETCH_PAGES)
+        self.assertEqual(metrics.snapshot('test')['counters']['requests_saved'],
+                         kr_prices.FULL_PAGES - 1 - kr_prices.PREFETCH_PAGES)
+
+    def test_investor_pages_stop_at_repeated_page(self):
+        df = kr_investor.get_investor_trend('005930', pages=5, engine=self.engine)
+        self.assertEqual(len(df), 30)
+        self.assertFalse(df['date'].duplicated().any())
+        self.assertEqual(list(df.columns), ['date', 'institution_net_buy', 'foreigner_net_buy', 'code'])
+
+    def test_single_request_when_store_is_recent(self):
+        since = self.fake.dates[2]
+        df = kr_prices.get_daily_price('005930', pages=kr_prices.FULL_PAGES, since=since, engine=self.engine)
+        self.assertEqual(len(self.fake.urls), 1)
+        # 마지막 저장일(장중 수집분일 수 있음)도 다시 받아 갱신
+        self.assertEqual(list(df['date']), list(self.fake.dates[:3][::-1]))
+
+    def test_stops_at_page_with_known_dates(self):
+        since = self.fake.dates[15]
+        df = kr_prices.get_daily_price('005930', pages=kr_prices.FULL_PAGES, since=since, engine=self.engine)
+        self.assertEqual(len(self.fake.urls), 2)
+        self.assertEqual(df['date'].min(), since)
+        self.assertEqual(len(df), 16)
+
+    def test_main_upserts_new_bars(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            pd.DataFrame({'ticker': ['005930'], 'name': ['삼성전자']}).to_csv('korean_stocks_list.csv', index=False)
+            store = PriceStore()
+            old = kr_prices.get_daily_price('005930', pages=kr_prices.FULL_PAGES, engine=self.engine).iloc[:-2]
+            store.write(old.assign(name='삼성전자'), market='KR')
+            self.fake.urls.clear()
+
+            with mock.patch.object(sys, 'argv', ['create_complete_daily_prices.py', '--rate', '1000']):
+                kr_prices.main()
+
+            self.assertEqual(len(self.fake.urls), 1)
+            stored = store.read(codes=['005930'])
+            self.assertEqual(len(stored), 30)
+            self.assertEqual(stored['date'].max(), self.fake.dates[0])
+
+class TestCombinedCollection(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeNaver(last=pd.Timestamp.today().normalize())
+        patches = [mock.patch.object(requests.Session, 'get', self.fake.get),
+                   mock.patch.object(http_client.client, 'hedge', False)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        pd.DataFrame({'ticker': ['005930'], 'name': ['삼성전자']}).to_csv('korean_stocks_list.csv', index=False)
+
+    def run_main(self, *args):
+        self.fake.urls.clear()
+        with mock.patch.object(sys, 'argv', ['create_complete_daily_prices.py', '--combined', '--rate', '1000', *args]):
+            kr_prices.main()
+        return [url.split('/item/')[1].split('.naver')[0] for url in self.fake.urls]
+
+    def test_prices_and_investor_flows_from_one_stream(self):
+        # 저장된 데이터가 없으면 frgn 과 sise_day 모두 마지막 페이지까지 (모든 날짜에 시가/고가/저가)
+        requested = self.run_main()
+        self.assertEqual(requested.count('frgn'), 2)
+        self.assertEqual(requested.count('sise_day'), 3)
+
+        prices = PriceStore().read(codes=['005930'])
+        self.assertEqual(len(prices), 30)
+        self.assertTrue(prices[['open', 'high', 'low']].notna().all().all())
+        self.assertEqual(prices['close'].iloc[-1], 1000)
+        investor = load_investor_trends(codes=['005930'])
+        self.assertEqual(len(investor), 30)
+        self.assertEqual(investor['institution_net_buy'].iloc[-1], 0)
+        self.assertEqual(investor['foreigner_net_buy'].iloc[0], -9)
+
+        # 다음 실행은 종목당 frgn 1페이지 + sise_day 1페이지
+        self.assertEqual(self.run_main(), ['frgn', 'sise_day'])
+        self.assertEqual(len(PriceStore().read(codes=['005930'])), 30)
+
+    def test_ohlc_window_is_opt_in(self):
+        # --ohlc-days 를 주면 시가/고가/저가는 최근 거래일만 sise_day 에서 받음
+        requested = self.run_main('--ohlc-days', '15')
+        self.assertEqual(requested.count('sise_day'), 2)
+        self.assertEqual(PriceStore().read(codes=['005930'])['open'].notna().sum(), 15)
+
+class FakeRankings:
+    """순위 페이지마다 다른 종목을 응답 (시가총액 순위는 50종목씩, 마지막 페이지 뒤는 마지막 페이지 반복)"""
+    def __init__(self, market_cap=120):
+        self.market_cap = market_cap
+        self.urls = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.urls.append(url)
+        if 'sise_market_sum' in url:
+            last = -(-self.market_cap // 50)
+            page = min(int(url.rsplit('page=', 1)[1]), last)
+            codes = range(100000 + (page - 1) * 50, 100000 + min(page * 50, self.market_cap))
+        else:
+            # 페이지별로 겹치지 않는 100종목
+            codes = range(200000 + 1000 * (len(self.urls) % 1000), 200000 + 1000 * (len(self.urls) % 1000) + 100)
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = ranking_html([(str(code), f'종목{code}') for code in codes]).encode('utf-8')
+        return response
+
+class TestHotStocks(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeRankings()
+        patches = [mock.patch.object(requests.Session, 'get', self.fake.get),
+                   mock.patch.object(http_client.client, 'hedge', False)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+    def run_main(self, *args):
+        with mock.patch.object(sys, 'argv', ['fetch_hot_stocks.py', '--rate', '1000', *args]):
+            hot_stocks.main()
+        return pd.read_csv('korean_stocks_list.csv', dtype={'ticker': str})
+
+    def test_default_depths(self):
+        stocks = self.run_main()
+        # 순위별 기본 깊이 합계 (가짜 시가총액 순위는 두 시장이 같은 종목이라 KOSDAQ 30 은 KOSPI 50 에 포함)
+        self.assertEqual(len(stocks), 30 + 30 + 20 + 20 + 50 + 20 + 20)
+        self.assertEqual(len(self.fake.urls), len(hot_stocks.RANKINGS))
+
+    def test_full_ranking_lists(self):
+        stocks = self.run_main('--depth', '0', '--max-pages', '5')
+        # 시가총액 순위는 3페이지(120종목)에서 반복 페이지를 만나 중단
+        market_cap = stocks[stocks['ticker'].str.startswith('1')]
+        self.assertEqual(len(market_cap), 120)
+        self.assertEqual(len(stocks), 120 + 6 * 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,11 @@
 import unittest
 import pandas as pd
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_store import PriceStore
+from stock_db import StockDB
 
 class TestDataQuality(unittest.TestCase):
     def setUp(self):
@@ -8,10 +13,13 @@ class TestDataQuality(unittest.TestCase):
         self.investor_data_path = 'all_institutional_trend_data.csv'
 
     def test_daily_prices_quality(self):
-        if not os.path.exists(self.daily_prices_path):
+        store = PriceStore()
+        if store.exists():
+            df = store.read(columns=['close'])
+        elif os.path.exists(self.daily_prices_path):
+            df = pd.read_csv(self.daily_prices_path)
+        else:
             self.skipTest("daily_prices.csv not found")
-            
-        df = pd.read_csv(self.daily_prices_path)
         
         # 1. Check for duplicates
         duplicates = df.duplicated(subset=['date', 'code'])
@@ -30,10 +38,13 @@ class TestDataQuality(unittest.TestCase):
             self.assertTrue(group['date'].is_monotonic_increasing, f"Dates are not sorted for code {code}")
 
     def test_investor_data_quality(self):
-        if not os.path.exists(self.investor_data_path):
+        db = StockDB()
+        if db.exists():
+            df = db.read('investor_trends')
+        elif os.path.exists(self.investor_data_path):
+            df = pd.read_csv(self.investor_data_path)
+        else:
             self.skipTest("all_institutional_trend_data.csv not found")
-            
-        df = pd.read_csv(self.investor_data_path)
         
         # 1. Check for duplicates
         duplicates = df.duplicated(subset=['date', 'code'])
@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+import time
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from http_client import HttpClient
+from fetch_engine import FetchEngine, TokenBucket, map_unordered
+
+class SlowServer:
+    """호스트별 동시 요청 수를 기록하는 가짜 requests.get"""
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.times = []
+
+    def get(self, url, headers=None, **kwargs):
+        host = url.split('/')[2]
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+            self.times.append(time.monotonic())
+        time.sleep(self.delay)
+        with self.lock:
+            self.active[host] -= 1
+        return mock.Mock(status_code=200, text=url, content=url.encode())
+
+class ThrottlingServer:
+    """URL 마다 처음 throttled 번은 429 로 응답하고 요청 시각을 기록하는 가짜 requests.get"""
+    def __init__(self, throttled=2):
+        self.throttled = throttled
+        self.lock = threading.Lock()
+        self.seen = {}
+        self.times = []
+
+    def get(self, url, headers=None, **kwargs):
+        with self.lock:
+            self.times.append(time.monotonic())
+            self.seen[url] = self.seen.get(url, 0) + 1
+            status = 429 if self.seen[url] <= self.throttled else 200
+        return mock.Mock(status_code=status, text=url, content=url.encode(), headers={})
+
+class TestFetchEngine(unittest.TestCase):
+    def setUp(self):
+        self.server = SlowServer()
+        patcher = mock.patch.object(requests.Session, 'get', self.server.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = HttpClient(hedge=False)
+
+    def test_rate_limit(self):
+        engine = FetchEngine(rate=50, burst=1, per_host=20, client=self.client)
+
+        async def fetch_all():
+            return await asyncio.gather(*(engine.get(f'https://a.example/{i}') for i in range(11)))
+
+        start = time.monotonic()
+        responses = engine.run(fetch_all())
+        # 첫 요청 이후 10개는 초당 50개 속도로만 나감
+        self.assertGreaterEqual(time.monotonic() - start, 10 / 50 * 0.9)
+        self.assertEqual([r.text for r in responses], [f'https://a.example/{i}' for i in range(11)])
+
+    def test_retries_after_429_are_rate_limited(self):
+        server = ThrottlingServer(throttled=2)
+        # 재시도 대기 없이 바로 다시 보내는 클라이언트: 속도 제한은 토큰 버킷만 지킴
+        client = HttpClient(hedge=False, backoff=0)
+        engine = FetchEngine(rate=50, burst=1, per_host=10, client=client)
+
+        async def fetch_all():
+            return await asyncio.gather(*(engine.get(f'https://a.example/{i}') for i in range(6)))
+
+        with mock.patch.object(client.session, 'get', server.get):
+            responses = engine.run(fetch_all())
+        self.assertEqual([r.status_code for r in responses], [200] * 6)
+        # 첫 요청과 재시도 모두 합쳐 18회, 첫 요청 이후 17회는 초당 50개 속도로만 나감
+        times = sorted(server.times)
+        self.assertEqual(len(times), 18)
+        self.assertGreaterEqual(times[-1] - times[0], 17 / 50 * 0.9)
+        # 어느 0.1초 구간에도 5(= 50 * 0.1)+1 개를 넘지 않음
+        for i, start in enumerate(times):
+            self.assertLessEqual(sum(1 for t in times[i:] if t - start < 0.1), 6)
+
+    def test_per_host_concurrency(self):
+        engine = FetchEngine(rate=1000, per_host=3, client=self.client)
+
+        async def fetch_all():
+            urls = [f'https://{host}/{i}' for host in ('a.example', 'b.example') for i in range(12)]
+            await asyncio.gather(*(engine.get(url) for url in urls))
+
+        engine.run(fetch_all())
+        self.assertEqual(self.server.peak, {'a.example': 3, 'b.example': 3})
+
+    def test_map_unordered_limit(self):
+        running = {'now': 0, 'peak': 0}
+
+        async def work(i):
+            running['now'] += 1
+            running['peak'] = max(running['peak'], running['now'])
+            await asyncio.sleep(0.001 * (i % 3))
+            running['now'] -= 1
+            return i
+
+        async def collect():
+            return [i async for i in map_unordered(work, range(20), limit=4)]
+
+        results = FetchEngine().run(collect())
+        self.assertEqual(sorted(results), list(range(20)))
+        self.assertEqual(running['peak'], 4)
+
+    def test_token_bucket_rejects_bad_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+if __name__ == '__main__':
+    unittest.main()
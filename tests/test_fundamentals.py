@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_access import load_fundamentals
+try:
+    import collect_fundamentals as fundamentals
+except ImportError:  # yfinance 미설치 환경
+    fundamentals = None
+
+@unittest.skipIf(fundamentals is None, "yfinance not installed")
+class TestFundamentalsCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        pd.DataFrame({'ticker': ['005930', '000660'], 'name': ['삼성전자', 'SK하이닉스']}).to_csv(
+            'korean_stocks_list.csv', index=False)
+        pd.DataFrame({'ticker': ['AAPL'], 'name': ['Apple']}).to_csv('us_stocks_list.csv', index=False)
+        self.values = {'005930': {'PER': 10.0, 'PBR': 1.2}, '000660': {'PER': 8.0, 'PBR': 1.5},
+                       'AAPL': {'PER': 30.0, 'Dividend_Yield': 0.005}}
+        self.requested = []
+
+    async def fake_naver(self, engine, code):
+        self.requested.append(code)
+        return code, dict(self.values.get(code, {}))
+
+    def fake_us(self, ticker):
+        self.requested.append(ticker)
+        return dict(self.values.get(ticker, {}))
+
+    def run_main(self, *args):
+        self.requested = []
+        with mock.patch.object(fundamentals, 'fetch_naver_fundamentals', self.fake_naver), \
+                mock.patch.object(fundamentals, 'get_us_fundamentals', self.fake_us), \
+                mock.patch.object(sys, 'argv', ['collect_fundamentals.py', '--rate', '1000', *args]):
+            fundamentals.main()
+        return sorted(self.requested)
+
+    def expire(self, hours, codes=None):
+        df = load_fundamentals()
+        fetched_at = pd.to_datetime(df['fetched_at']) - pd.Timedelta(hours=hours)
+        if codes is not None:
+            fetched_at = fetched_at.where(df['code'].isin(codes), pd.to_datetime(df['fetched_at']))
+        fundamentals.save_fundamentals(df[['code']].assign(
+            fetched_at=fetched_at.dt.strftime(fundamentals.TIMESTAMP_FORMAT)))
+
+    def test_only_expired_symbols_are_refetched(self):
+        self.assertEqual(self.run_main(), ['000660', '005930', 'AAPL'])
+        stored = load_fundamentals().set_index('code')
+        self.assertEqual(stored.loc['AAPL', 'Dividend_Yield'], 0.5)
+        self.assertEqual(self.run_main(), [])
+
+        self.expire(25, codes=['005930'])
+        self.values['005930'] = {'PER': 11.0, 'PBR': 1.2}
+        changed_before = load_fundamentals().set_index('code')['changed_at']
+        self.assertEqual(self.run_main(), ['005930'])
+        stored = load_fundamentals().set_index('code')
+        self.assertEqual(stored.loc['005930', 'PER'], 11.0)
+        self.assertEqual(stored.loc['000660', 'changed_at'], changed_before.loc['000660'])
+
+    def test_failed_refresh_keeps_cached_values(self):
+        self.run_main()
+        self.expire(25)
+        del self.values['000660']
+        self.run_main()
+        stored = load_fundamentals().set_index('code')
+        self.assertEqual(stored.loc['000660', 'PER'], 8.0)
+        # 실패한 종목은 만료 상태로 남아 다음 실행에 다시 요청
+        self.assertEqual(self.run_main(), ['000660'])
+
+    def test_stale_while_revalidate_refreshes_oldest_first(self):
+        self.run_main()
+        self.expire(30, codes=['AAPL'])
+        self.expire(26, codes=['005930', '000660'])
+        self.assertEqual(self.run_main('--stale-while-revalidate', '--max-refresh', '1'), ['AAPL'])
+        self.assertEqual(len(self.run_main('--stale-while-revalidate', '--max-refresh', '1')), 1)
+
+    def test_plan_refresh(self):
+        now = pd.Timestamp('2024-03-29 18:00:00')
+        cached = pd.DataFrame({'code': ['A', 'B', 'C'],
+                               'fetched_at': ['2024-03-29 12:00:00', '2024-03-27 18:00:00', None]})
+        refresh, fresh, stale = fundamentals.plan_refresh(['A', 'B', 'C', 'D'], cached, pd.Timedelta(hours=24), now)
+        self.assertEqual((refresh, fresh, stale), (['C', 'D', 'B'], ['A'], []))
+        refresh, fresh, stale = fundamentals.plan_refresh(['A', 'B', 'C'], cached, pd.Timedelta(hours=1), now,
+                                                          max_refresh=1)
+        self.assertEqual((refresh, fresh, stale), (['C', 'B'], [], ['A']))
+
+if __name__ == '__main__':
+    unittest.main()
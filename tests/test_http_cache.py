@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pandas as pd
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_cache
+import metrics
+import create_complete_daily_prices as kr_prices
+from fetch_engine import FetchEngine
+from http_cache import HttpCache, CacheMiss, ttl_for
+from http_client import HttpClient
+from test_collectors import FakeNaver
+
+BASE = 'https://finance.naver.com'
+
+def page(text, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response._content = text.encode('euc-kr')
+    response.encoding = 'euc-kr'
+    response.headers['Content-Type'] = 'text/html;charset=euc-kr'
+    return response
+
+def kst(text):
+    """한국 시각 문자열 -> epoch 초"""
+    return pd.Timestamp(f'{text}+09:00').timestamp()
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, 'http_cache')
+        metrics.reset()
+
+    def test_ttl_rules(self):
+        self.assertEqual(ttl_for(f'{BASE}/item/sise_day.naver?code=005930&page=1'), 10 * 60)
+        self.assertEqual(ttl_for(f'{BASE}/item/frgn.naver?code=005930&page=10'), 20 * 60 * 60)
+        self.assertEqual(ttl_for(f'{BASE}/item/main.naver?code=005930'), 24 * 60 * 60)
+        self.assertIsNone(ttl_for('https://query1.finance.yahoo.com/v8/finance/chart/AAPL'))
+
+    def test_expiry_and_content_addressing(self):
+        cache = HttpCache(self.root)
+        latest = f'{BASE}/item/sise_day.naver?code=005930&page=1'
+        history = f'{BASE}/item/sise_day.naver?code=005930&page=2'
+        with mock.patch.object(http_cache.time, 'time', return_value=kst('2024-03-28 10:00')):
+            cache.put(latest, page('삼성전자'))
+            cache.put(history, page('삼성전자'))
+            cache.put(f'{BASE}/item/main.naver?code=005930', page('error', status=500))
+
+            self.assertEqual(cache.get(latest).text, '삼성전자')
+            self.assertEqual(len(cache.entries()), 2)
+        # 같은 본문은 한 번만 저장
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(os.path.join(self.root, 'blobs'))), 1)
+
+        with mock.patch.object(http_cache.time, 'time', return_value=kst('2024-03-28 11:00')):
+            self.assertIsNone(cache.get(latest))
+            self.assertEqual(cache.get(history).text, '삼성전자')
+            self.assertEqual(cache.prune(), 1)
+            self.assertIsNone(cache.get(latest))
+
+        replay = HttpCache(self.root, mode='replay')
+        self.assertEqual(replay.get(history).status_code, 200)
+        with self.assertRaises(CacheMiss):
+            replay.get(latest)
+
+    def test_history_pages_expire_at_next_session(self):
+        url = f'{BASE}/item/frgn.naver?code=005930&page=2'
+        fetched = kst('2024-03-28 15:40')
+        self.assertFalse(http_cache.is_expired(url, fetched, kst('2024-03-29 08:59')))
+        # 20시간 TTL 안이라도 다음 거래일 개장(09:00 KST) 뒤에는 만료
+        self.assertTrue(http_cache.is_expired(url, fetched, kst('2024-03-29 09:30')))
+        self.assertFalse(http_cache.is_expired(f'{BASE}/item/main.naver?code=005930', fetched,
+                                               kst('2024-03-29 09:30')))
+
+    def test_rerun_after_page_boundary_shift_keeps_every_day(self):
+        engine = FetchEngine(rate=1000, client=HttpClient(hedge=False, cache=HttpCache(self.root)))
+        # 장 마감 후 전체 수집, 다음 날 개장 후 재실행 (새 거래일로 페이지 경계가 하루 밀림)
+        before = FakeNaver(last='2024-03-28')
+        with mock.patch.object(requests.Session, 'get', before.get), \
+                mock.patch.object(http_cache.time, 'time', return_value=kst('2024-03-28 15:40')):
+            kr_prices.get_daily_price('005930', pages=3, engine=engine)
+        after = FakeNaver(last='2024-03-29')
+        with mock.patch.object(requests.Session, 'get', after.get), \
+                mock.patch.object(http_cache.time, 'time', return_value=kst('2024-03-29 09:30')):
+            df = kr_prices.get_daily_price('005930', pages=3, engine=engine)
+        self.assertEqual(len(after.urls), 3)
+        self.assertEqual(list(df['date']), list(after.dates[::-1]))
+
+    def test_collector_replays_offline(self):
+        fake = FakeNaver()
+        engine = FetchEngine(rate=1000, client=HttpClient(hedge=False, cache=HttpCache(self.root)))
+        with mock.patch.object(requests.Session, 'get', fake.get):
+            recorded = kr_prices.get_daily_price('005930', pages=3, engine=engine)
+            kr_prices.get_daily_price('005930', pages=3, engine=engine)
+        self.assertEqual(len(fake.urls), 3)
+        self.assertEqual(metrics.snapshot('test')['counters']['cache_hits'], 3)
+
+        # 네트워크 없이 기록된 응답만으로 같은 결과
+        offline = FetchEngine(rate=1000, client=HttpClient(cache=HttpCache(self.root, mode='replay')))
+        with mock.patch.object(requests.Session, 'get', side_effect=AssertionError("network used")):
+            replayed = kr_prices.get_daily_price('005930', pages=3, engine=offline)
+            self.assertIsNone(kr_prices.get_daily_price('000660', pages=3, engine=offline))
+        self.assertTrue(replayed.equals(recorded))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import os
+import sys
+import threading
+import time
+import types
+from unittest import mock
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+import metrics
+from http_client import HttpClient
+
+def response(status=200, text='ok', headers=None):
+    return mock.Mock(status_code=status, text=text, content=text.encode(), headers=headers or {},
+                     raise_for_status=mock.Mock(side_effect=requests.HTTPError(str(status)) if status >= 400 else None))
+
+class ScriptedServer:
+    """호출 순서대로 준비된 응답(또는 예외)을 돌려주는 가짜 Session.get"""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.calls.append(timeout)
+            outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome() if isinstance(outcome, types.FunctionType) else outcome
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.sleeps = []
+        patcher = mock.patch.object(http_client.time, 'sleep', self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, client, server):
+        patcher = mock.patch.object(client.session, 'get', server.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_transient_errors_with_backoff(self):
+        client = HttpClient(timeout=(1, 2), retries=3, hedge=False)
+        self.serve(client, ScriptedServer(requests.ConnectionError('reset'), response(503),
+                                          response(429, headers={'Retry-After': '2'}), response(200, 'page')))
+        self.assertEqual(client.get('https://finance.naver.com/item/sise_day.naver?code=005930').text, 'page')
+
+        self.assertEqual(len(self.sleeps), 3)
+        self.assertLessEqual(self.sleeps[0], http_client.BACKOFF_BASE)
+        self.assertLessEqual(self.sleeps[1], http_client.BACKOFF_BASE * 2)
+        self.assertEqual(self.sleeps[2], 2.0)
+        counters = metrics.snapshot('test')['counters']
+        self.assertEqual(counters['retries'], 3)
+        self.assertEqual(counters['http_requests'], 3)
+
+    def test_gives_up_after_retries(self):
+        client = HttpClient(retries=2, hedge=False)
+        server = ScriptedServer(requests.ReadTimeout('stalled'))
+        self.serve(client, server)
+        with self.assertRaises(requests.Timeout):
+            client.get('https://finance.naver.com/')
+        self.assertEqual(len(server.calls), 3)
+        self.assertEqual(server.calls[0], http_client.DEFAULT_TIMEOUT)
+
+        # 4xx(429 제외)는 재시도하지 않음
+        client = HttpClient(retries=2, hedge=False)
+        self.serve(client, ScriptedServer(response(404)))
+        self.assertEqual(client.get('https://finance.naver.com/').status_code, 404)
+
+        client = HttpClient(retries=1, hedge=False)
+        self.serve(client, ScriptedServer(response(502)))
+        with self.assertRaises(requests.HTTPError):
+            client.get('https://finance.naver.com/')
+
+    def test_hedges_slow_requests(self):
+        client = HttpClient(hedge=True)
+        self.addCleanup(client.close)
+        fast = response(200, 'fast')
+
+        def stalled():
+            # time.sleep 은 setUp 에서 가짜로 바꿨으므로 Event 로 대기
+            threading.Event().wait(0.5)
+            return response(200, 'slow')
+
+        # 지연 표본이 쌓이기 전에는 hedge 하지 않음
+        self.serve(client, ScriptedServer(fast))
+        for _ in range(http_client.HEDGE_MIN_SAMPLES):
+            client.get('https://finance.naver.com/')
+        self.assertEqual(client.latency('finance.naver.com').count, http_client.HEDGE_MIN_SAMPLES)
+
+        self.serve(client, ScriptedServer(stalled, fast))
+        start = time.perf_counter()
+        self.assertEqual(client.get('https://finance.naver.com/').text, 'fast')
+        self.assertLess(time.perf_counter() - start, 0.45)
+        data = metrics.snapshot('test')
+        self.assertEqual(data['counters']['hedged_requests'], 1)
+        self.assertEqual(data['histograms']['http_latency']['finance.naver.com']['count'],
+                         http_client.HEDGE_MIN_SAMPLES + 1)
+
+    def test_acquire_before_every_attempt_and_no_hedge_after_429(self):
+        client = HttpClient(retries=3, hedge=True)
+        self.addCleanup(client.close)
+        fast = response(200, 'fast')
+        self.serve(client, ScriptedServer(fast))
+        for _ in range(http_client.HEDGE_MIN_SAMPLES):
+            client.get('https://finance.naver.com/')
+        self.assertIsNotNone(client._hedge_delay('https://finance.naver.com/'))
+
+        tokens = []
+        self.serve(client, ScriptedServer(response(429), response(503), fast))
+        self.assertEqual(client.get('https://finance.naver.com/', acquire=lambda: tokens.append(1)).text, 'fast')
+        self.assertEqual(len(tokens), 3)
+
+        # 429 를 받은 뒤의 재시도는 hedge 하지 않음 (첫 요청만 hedge 경로)
+        self.serve(client, ScriptedServer(response(429)))
+        with mock.patch.object(client, '_send_hedged', wraps=client._send_hedged) as hedged:
+            with self.assertRaises(requests.HTTPError):
+                client.get('https://finance.naver.com/')
+        self.assertEqual(hedged.call_count, 1)
+        self.assertIsNone(client._hedge_delay('https://finance.naver.com/'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import kernels
+
+class TestKernels(unittest.TestCase):
+    def setUp(self):
+        # 길이가 다른 세 종목 (윈도우보다 짧은 종목 포함) + 결측치
+        rng = np.random.default_rng(0)
+        self.lengths = [300, 7, 120]
+        self.offsets = np.r_[0, np.cumsum(self.lengths)]
+        self.values = rng.normal(100, 10, self.offsets[-1]).round(2)
+        self.values[[5, 150, 400]] = np.nan
+        self.grouped = pd.Series(self.values).groupby(np.repeat([0, 1, 2], self.lengths))
+
+    def expected(self, how, window, min_periods=None):
+        r = self.grouped.rolling(window, min_periods=min_periods)
+        return getattr(r, how)().reset_index(level=0, drop=True).sort_index().to_numpy()
+
+    def test_rolling_kernels_match_pandas(self):
+        for window, min_periods in [(20, None), (250, 1), (14, 5)]:
+            np.testing.assert_allclose(kernels.rolling_mean(self.values, self.offsets, window, min_periods),
+                                       self.expected('mean', window, min_periods), rtol=1e-12)
+            np.testing.assert_array_equal(kernels.rolling_max(self.values, self.offsets, window, min_periods),
+                                          self.expected('max', window, min_periods))
+            np.testing.assert_array_equal(kernels.rolling_min(self.values, self.offsets, window, min_periods),
+                                          self.expected('min', window, min_periods))
+
+    def test_shift_stays_within_segment(self):
+        np.testing.assert_array_equal(kernels.pct_change(self.values, self.offsets, 20),
+                                      self.grouped.pct_change(20, fill_method=None).to_numpy())
+        np.testing.assert_array_equal(kernels.shift(self.values, self.offsets, -5),
+                                      self.grouped.shift(-5).to_numpy())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from metrics import MetricsRegistry, STANDARD_COUNTERS
+
+class TestMetrics(unittest.TestCase):
+    def test_spans_and_counters(self):
+        registry = MetricsRegistry()
+        for _ in range(3):
+            with registry.span('fetch'):
+                pass
+        registry.incr('http_requests', 3)
+        registry.incr('bytes_downloaded', 1024)
+
+        data = registry.snapshot('job')
+        self.assertEqual(data['spans']['fetch']['count'], 3)
+        self.assertEqual(data['spans']['parse']['count'], 0)
+        self.assertEqual(data['counters']['http_requests'], 3)
+        self.assertEqual(set(STANDARD_COUNTERS) - set(data['counters']), set())
+
+    def test_write_json_prometheus_and_aggregate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            prom_dir = os.path.join(tmp, 'prom')
+            for job, rows in [('collector', 10), ('analyzer', 5)]:
+                registry = MetricsRegistry()
+                registry.add_span('parse', 0.5)
+                registry.incr('rows_parsed', rows)
+                registry.write(job, metrics_dir=tmp, prometheus_dir=prom_dir)
+
+            with open(os.path.join(tmp, 'collector.json'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['counters']['rows_parsed'], 10)
+            with open(os.path.join(prom_dir, 'stockai_analyzer.prom'), encoding='utf-8') as f:
+                self.assertIn('stockai_events_total{job="analyzer",name="rows_parsed"} 5', f.read())
+
+            summary = metrics.load_run(tmp, ['collector', 'analyzer', 'missing'])
+            self.assertEqual(sorted(summary['jobs']), ['analyzer', 'collector'])
+            self.assertEqual(summary['counters']['rows_parsed'], 15)
+            self.assertEqual(summary['spans']['parse'], {'count': 2, 'seconds': 1.0})
+
+    def test_latency_histogram(self):
+        registry = MetricsRegistry()
+        for seconds in [0.01] * 18 + [0.3, 4.0]:
+            registry.observe('http_latency', 'finance.naver.com', seconds)
+        h = registry.histograms['http_latency']['finance.naver.com']
+        self.assertEqual(h.quantile(0.5), 0.05)
+        self.assertEqual(h.quantile(0.95), 0.5)
+        self.assertEqual(h.quantile(1.0), 4.0)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            registry.write('collector', metrics_dir=tmp, prometheus_dir=tmp)
+            with open(os.path.join(tmp, 'stockai_collector.prom'), encoding='utf-8') as f:
+                text = f.read()
+            self.assertIn('stockai_http_latency_seconds_bucket{job="collector",host="finance.naver.com",le="0.05"} 18', text)
+            self.assertIn('stockai_http_latency_seconds_count{job="collector",host="finance.naver.com"} 20', text)
+            summary = metrics.load_run(tmp, ['collector', 'collector'])
+            self.assertEqual(summary['histograms']['http_latency']['finance.naver.com']['count'], 40)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+import naver_pages
+from naver_pages import parse_sise_day, parse_frgn
+
+SEPARATOR = '<tr><td colspan="{n}" height="8"></td></tr>'
+
+def sise_day_html(rows):
+    """네이버 sise_day.naver 와 같은 마크업 (구분선 행, span 셀, 상승/하락 아이콘)"""
+    body = [SEPARATOR.format(n=7)]
+    for date, close, diff, volume in rows:
+        if isinstance(diff, tuple):
+            # (값, 표시) - 상한가/하한가
+            diff, direction = diff
+        else:
+            direction = '하락' if diff < 0 else '상승'
+        body.append(
+            '<tr onmouseover="mouseOver(this)">'
+            f'<td align="center"><span class="tah p10 gray03">{date}</span></td>'
+            f'<td class="num"><span class="tah p11">{close:,}</span></td>'
+            f'<td class="num"><em class="bu_p"><span class="blind">{direction}</span></em>'
+            f'<span class="tah p11">\n\t\t{abs(diff):,}\n\t</span></td>'
+            f'<td class="num"><span class="tah p11">{close - 100:,}</span></td>'
+            f'<td class="num"><span class="tah p11">{close + 200:,}</span></td>'
+            f'<td class="num"><span class="tah p11">{close - 300:,}</span></td>'
+            f'<td class="num"><span class="tah p11">{volume:,}</span></td></tr>')
+    body.append(SEPARATOR.format(n=7))
+    return ('<html><body><table cellspacing="0" class="type2"><tr><th>날짜</th><th>종가</th><th>전일비</th>'
+            '<th>시가</th><th>고가</th><th>저가</th><th>거래량</th></tr>' + ''.join(body) + '</table>'
+            '<table class="Nnavi"><tr><td class="on"><a href="?page=1">1</a></td></tr></table></body></html>')
+
+def frgn_html(rows):
+    """네이버 frgn.naver 와 같은 마크업 (2단 헤더, 부호 붙은 순매매량)"""
+    body = []
+    for date, close, institution, foreigner in rows:
+        body.append(
+            '<tr onmouseover="mouseOver(this)">'
+            f'<td class="tc"><span class="tah p10 gray03">{date}</span></td>'
+            f'<td class="num"><span class="tah p11">{close:,}</span></td>'
+            '<td class="num"><img src="ico_up.gif" alt="상승"><span class="tah p11 red02">500</span></td>'
+            '<td class="num"><span class="tah p11 red01">+0.63%</span></td>'
+            '<td class="num"><span class="tah p11">12,345,678</span></td>'
+            f'<td class="num"><span class="tah p11">{institution:+,}</span></td>'
+            f'<td class="num"><span class="tah p11">{foreigner:+,}</span></td>'
+            '<td class="num"><span class="tah p11">3,012,345,678</span></td>'
+            '<td class="num"><span class="tah p11">55.12%</span></td></tr>')
+        body.append(SEPARATOR.format(n=9))
+    return ('<html><body><table class="type2"><tr><th>종목명</th></tr><tr><td>삼성전자</td></tr></table>'
+            '<table class="type2"><tr><th rowspan="2">날짜</th><th rowspan="2">종가</th><th rowspan="2">전일비</th>'
+            '<th rowspan="2">등락률</th><th rowspan="2">거래량</th><th>기관</th><th colspan="3">외국인</th></tr>'
+            '<tr><th>순매매량</th><th>순매매량</th><th>보유주수</th><th>보유율</th></tr>'
+            + ''.join(body) + '</table></body></html>')
+
+def ranking_html(stocks):
+    """네이버 순위 페이지(sise_market_sum 등)와 같은 마크업 (type_2 표, 구분선 행, tltle 링크)"""
+    rows = ''.join('<tr><td class="no">{0}</td><td><a href="/item/main.naver?code={1}" class="tltle">{2}</a></td>'
+                   '<td class="number">1,000</td></tr><tr><td class="blank_08" colspan="3"></td></tr>'
+                   .format(i + 1, code, name) for i, (code, name) in enumerate(stocks))
+    return ('<html><body><table class="type_2"><tr><th>N</th><th>종목명</th><th>현재가</th></tr>' + rows +
+            '</table><table class="Nnavi"><tr><td><a href="/item/main.naver?code=999999">광고</a></td></tr>'
+            '</table></body></html>')
+
+def main_html(market_sum='497조 8,012', per='12.34', roe=('10.23', '-1.50', '8.00', '12.50'), estimate=True,
+              header=True):
+    """
+    네이버 main.naver 와 같은 마크업 (euc-kr 바이트, 투자정보 em 과 기업실적분석 표).
+    기업실적분석 표는 연간 4열(estimate 면 마지막 열이 추정치 (E)) + 분기 6열 (header=False 면 열 머리 없음)
+    """
+    def period(text, is_estimate):
+        return (f'<th scope="col" class="">\n\t{text}' + ('<br/>\n\t<em>(E)</em>' if is_estimate else '') + '\n</th>')
+
+    periods = ''
+    if header:
+        periods = ('<tr><th>주요재무정보</th>'
+                   + ''.join(period(f'{year}.12', estimate and year == 2024) for year in range(2021, 2025))
+                   + ''.join(period(text, estimate and i == 5) for i, text in enumerate(
+                       ['2023.06', '2023.09', '2023.12', '2024.03', '2024.06', '2024.09']))
+                   + '</tr>')
+    roe_cells = ''.join(f'<td class="">{value or "&nbsp;"}</td>' for value in roe) + '<td class="">7.00</td>' * 6
+    return ('<html><head><meta charset="euc-kr"></head><body>'
+            '<table summary="시가총액 정보"><tr><th>시가총액</th><td><em id="_market_sum">\n\t\t\t'
+            f'{market_sum}</em>억원</td></tr></table>'
+            '<div class="section cop_analysis"><table>' + periods +
+            '<tr><th scope="row" class="h_th2"><strong>PER(배)</strong></th>'
+            + '<td>11.0</td>' * 10 + '</tr>'
+            '<tr><th scope="row" class="h_th2 th_cop_anal13"><strong>ROE(지배주주)</strong></th>'
+            + roe_cells + '</tr></table></div>'
+            '<table class="per_table"><tr><td><em id="_per">' + per + '</em>배 <em id="_eps">-4,950</em>원</td></tr>'
+            '<tr><td><em id="_pbr">1.23</em>배</td></tr>'
+            '<tr><td><em id="_dvr">2.10</em>%</td></tr></table></body></html>').encode('euc-kr')
+
+class TestNaverPages(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_sise_day_matches_read_html(self):
+        html = sise_day_html([('2024.03.29', 79800, 500, 12345678), ('2024.03.28', 79300, -1200, 9876543),
+                              ('2024.03.27', 80500, (-34500, '하한가'), 55555555)])
+        df = parse_sise_day(html)
+        self.assertEqual(list(df.columns), naver_pages.SISE_DAY_COLUMNS)
+        self.assertEqual(list(df['date']), [pd.Timestamp('2024-03-29'), pd.Timestamp('2024-03-28'),
+                                            pd.Timestamp('2024-03-27')])
+        self.assertEqual(list(df['diff']), [500.0, -1200.0, -34500.0])
+        self.assertEqual(df['volume'].dtype, np.int64)
+
+        fallback = naver_pages._read_sise_day(html)
+        for col in ['date', 'close', 'open', 'high', 'low', 'volume']:
+            np.testing.assert_array_equal(df[col].to_numpy(), fallback[col].to_numpy())
+        counters = metrics.snapshot('test')['counters']
+        self.assertEqual(counters['rows_parsed'], 3)
+        self.assertEqual(counters.get('parse_fallbacks', 0), 0)
+
+    def test_frgn_columns(self):
+        html = frgn_html([('2024.03.29', 79800, 150000, -230000), ('2024.03.28', 79300, -5, 7)])
+        df = parse_frgn(html)
+        self.assertEqual(list(df.columns), naver_pages.FRGN_COLUMNS)
+        self.assertEqual(list(df['institution_net_buy']), [150000, -5])
+        self.assertEqual(list(df['foreigner_net_buy']), [-230000, 7])
+        self.assertEqual(df['foreigner_ratio'].iloc[0], 55.12)
+        self.assertEqual(df['change_pct'].iloc[0], 0.63)
+        self.assertEqual(df['close'].iloc[1], 79300.0)
+
+        fallback = naver_pages._read_frgn(html)
+        self.assertEqual(list(fallback.columns), naver_pages.FRGN_COLUMNS)
+        self.assertEqual(list(fallback['foreigner_net_buy']), [-230000, 7])
+
+    def test_falls_back_to_read_html_when_layout_changes(self):
+        # 셀 수가 바뀐 레이아웃 (전일비 컬럼 제거)
+        html = ('<html><body><table><tr><th>날짜</th><th>종가</th><th>시가</th><th>고가</th><th>저가</th><th>거래량</th></tr>'
+                '<tr><td>2024.03.29</td><td>79,800</td><td>79,700</td><td>80,000</td><td>79,500</td><td>1,000</td></tr>'
+                '</table></body></html>')
+        df = parse_sise_day(html)
+        self.assertEqual(df['close'].item(), 79800)
+        self.assertEqual(df['date'].item(), pd.Timestamp('2024-03-29'))
+        self.assertEqual(metrics.snapshot('test')['counters']['parse_fallbacks'], 1)
+
+    def test_ranking_links_in_order(self):
+        html = ranking_html([('005930', '삼성전자'), ('000660', 'SK하이닉스'), ('035420', 'NAVER')])
+        self.assertEqual(naver_pages.parse_ranking(html),
+                         [{'code': '005930', 'name': '삼성전자'}, {'code': '000660', 'name': 'SK하이닉스'},
+                          {'code': '035420', 'name': 'NAVER'}])
+        self.assertEqual([s['code'] for s in naver_pages.parse_ranking(html, limit=2)], ['005930', '000660'])
+        self.assertEqual(metrics.snapshot('test')['counters']['rows_parsed'], 5)
+
+    def test_main_page_fundamentals(self):
+        data = naver_pages.parse_main(main_html())
+        # ROE 는 추정치(2024.12(E), 12.50)가 아닌 최근 실적 (2023.12)
+        self.assertEqual(data, {'Market_Cap': 497_8012 * 100_000_000, 'ROE': 8.0, 'PER': 12.34,
+                                'EPS': -4950.0, 'PBR': 1.23, 'Dividend_Yield': 2.10})
+        self.assertEqual(naver_pages.parse_main(main_html(roe=('10.23', '-1.50', '', '')))['ROE'], -1.5)
+        # 추정치가 없는 종목은 연간 마지막 열도 실적, 열 머리가 없으면 마지막 열을 추정치로 간주
+        self.assertEqual(naver_pages.parse_main(main_html(estimate=False))['ROE'], 12.5)
+        self.assertEqual(naver_pages.parse_main(main_html(header=False))['ROE'], 8.0)
+        # 조 단위가 없는 시가총액은 디코딩 없이, N/A 지표는 생략
+        data = naver_pages.parse_main(main_html(market_sum='8,012', per='N/A', roe=('', '', '', '')))
+        self.assertEqual(data['Market_Cap'], 8012 * 100_000_000)
+        self.assertNotIn('PER', data)
+        self.assertNotIn('ROE', data)
+        self.assertEqual(naver_pages.parse_main(b'<html><body>not found</body></html>'), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_access
+import price_cube
+from price_store import PriceStore
+
+class TestPriceCube(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.store = PriceStore(os.path.join(self.dir, 'price_store'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_days(self, codes, start, periods, base=10000.0):
+        dates = pd.bdate_range(start, periods=periods)
+        prices, investor = [], []
+        for i, code in enumerate(codes):
+            close = base + i * 100 + np.arange(periods) * 0.5
+            prices.append(pd.DataFrame({'date': dates, 'close': close, 'diff': 0.5, 'open': close,
+                                        'high': close + 1, 'low': close - 1,
+                                        'volume': np.arange(periods) + 1000 * (i + 1), 'code': code, 'name': f'종목{code}'}))
+            # 수급은 일부 날짜만 존재 (없는 날은 0 으로 채워져야 함)
+            investor.append(pd.DataFrame({'date': dates[::2], 'code': code,
+                                          'institution_net_buy': np.arange(len(dates[::2])) - i,
+                                          'foreigner_net_buy': i - np.arange(len(dates[::2]))}))
+        self.store.write(pd.concat(prices))
+        data_access.save_investor_trends(pd.concat(investor), data_dir=self.dir)
+
+    def assert_matches_source(self, cube):
+        expected = data_access.load_merged(data_dir=self.dir)
+        actual = cube.frame()
+        self.assertEqual(list(actual.columns), list(expected.columns))
+        for col in expected.columns:
+            np.testing.assert_array_equal(actual[col].astype(str) if col in ('code', 'name') else actual[col],
+                                          expected[col].astype(str) if col in ('code', 'name') else expected[col])
+            if col not in ('code', 'name', 'date'):
+                self.assertEqual(actual[col].dtype, expected[col].dtype)
+
+    def test_full_then_incremental_build(self):
+        codes = ['000660', '005930', 'AAPL']
+        self.add_days(codes, '2024-01-01', 30)
+        self.assertEqual(price_cube.build(data_dir=self.dir), ('full', 90))
+        self.assertEqual(price_cube.build(data_dir=self.dir)[0], 'fresh')
+        cube = price_cube.open_fresh(data_dir=self.dir)
+        self.assert_matches_source(cube)
+        self.assertEqual(cube['close'].dtype, np.float32)
+
+        # 새 거래일 + 마지막 거래일 수정 -> 원본이 바뀌어 기존 큐브는 사용 안 함
+        self.add_days(codes, '2024-02-09', 5, base=20000.0)
+        self.assertIsNone(price_cube.open_fresh(data_dir=self.dir))
+        mode, rows = price_cube.build(data_dir=self.dir)
+        self.assertEqual((mode, rows), ('incremental', 15))
+        cube = price_cube.open_fresh(data_dir=self.dir)
+        self.assertEqual(cube.n_days, 34)
+        self.assert_matches_source(cube)
+
+        one = cube.frame(['AAPL'])
+        self.assertEqual(set(one['code'].astype(str)), {'AAPL'})
+        self.assertEqual(len(one), 34)
+
+        # 종목 구성이 바뀌면 전체 재생성
+        self.add_days(['035720'], '2024-02-12', 3)
+        self.assertEqual(price_cube.build(data_dir=self.dir)[0], 'full')
+        self.assert_matches_source(price_cube.open_fresh(data_dir=self.dir))
+
+    def test_incremental_build_rewrites_changed_past_days(self):
+        codes = ['000660', '005930']
+        self.add_days(codes, '2024-01-01', 30)
+        price_cube.build(data_dir=self.dir)
+
+        # 과거 종가/수급 수정 (수정주가/보정) + 새 거래일
+        self.store.write(pd.DataFrame({'date': pd.to_datetime(['2024-01-10']), 'code': '005930', 'close': 12345.0,
+                                       'diff': 0.5, 'open': 12345.0, 'high': 12346.0, 'low': 12344.0,
+                                       'volume': 1, 'name': '종목005930'}))
+        data_access.save_investor_trends(pd.DataFrame({'date': pd.to_datetime(['2024-01-05']), 'code': '000660',
+                                                       'institution_net_buy': 77, 'foreigner_net_buy': -77}),
+                                         data_dir=self.dir)
+        self.add_days(codes, '2024-02-12', 2)
+        mode, rows = price_cube.build(data_dir=self.dir)
+        self.assertEqual(mode, 'incremental')
+        self.assertEqual(rows, len(data_access.load_merged(start=pd.Timestamp('2024-01-05'), data_dir=self.dir)))
+        cube = price_cube.open_fresh(data_dir=self.dir)
+        self.assertEqual(cube.n_days, 32)
+        self.assert_matches_source(cube)
+        self.assertEqual(cube['close'][cube.index_of('005930'), 7], np.float32(12345.0))
+
+        # 큐브 첫 거래일 이전이 바뀌면 전체 재생성
+        self.store.write(pd.DataFrame({'date': pd.to_datetime(['2023-12-29']), 'code': '005930', 'close': 9999.0,
+                                       'diff': 0.5, 'open': 9999.0, 'high': 10000.0, 'low': 9998.0,
+                                       'volume': 1, 'name': '종목005930'}))
+        self.assertEqual(price_cube.build(data_dir=self.dir)[0], 'full')
+        self.assert_matches_source(price_cube.open_fresh(data_dir=self.dir))
+
+    def test_analyzer_reads_cube(self):
+        from analysis2 import EnhancedWaveTransitionAnalyzerV3
+        self.add_days(['000660', '005930'], '2023-01-02', 80)
+        price_cube.build(data_dir=self.dir)
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            frames = []
+            for use_cube in (False, True):
+                analyzer = EnhancedWaveTransitionAnalyzerV3(use_cube=use_cube)
+                self.assertTrue(analyzer.load_data())
+                eligible = analyzer.select_eligible()
+                latest = analyzer._calculate_latest_indicators(eligible).set_index('code', drop=False)
+                frames.append(analyzer.build_results(eligible, latest).reset_index(drop=True))
+        finally:
+            os.chdir(cwd)
+        pd.testing.assert_frame_equal(frames[0], frames[1], check_categorical=False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import price_store
+from price_store import PriceStore, market_of, SCHEMA_FILE
+from data_access import read_typed_prices, read_typed_csv
+
+class TestPriceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'price_store')
+        self.store = PriceStore(self.root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_prices(self, code, name, start, periods, base=10000.0):
+        dates = pd.bdate_range(start, periods=periods)
+        close = base + np.arange(periods)
+        return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'close': close, 'diff': 0,
+                             'open': close, 'high': close, 'low': close,
+                             'volume': np.arange(periods) + 1000, 'code': code, 'name': name})
+
+    def test_upsert_and_pushdown(self):
+        self.store.write(pd.concat([self.make_prices('005930', '삼성전자', '2024-01-01', 30),
+                                    self.make_prices('AAPL', 'Apple', '2024-01-01', 30, base=180.5)]))
+        # 겹치는 날짜는 새 값으로 교체, 새 날짜는 추가
+        self.store.write(self.make_prices('005930', '삼성전자', '2024-02-01', 10, base=20000.0))
+
+        self.assertEqual(self.store.codes('KR'), ['005930'])
+        self.assertEqual(self.store.codes('US'), ['AAPL'])
+
+        kr = self.store.read(codes=['005930'])
+        self.assertTrue(kr['date'].is_monotonic_increasing)
+        self.assertFalse(kr['date'].duplicated().any())
+        self.assertEqual(kr.loc[kr['date'] == '2024-02-01', 'close'].item(), 20000.0)
+        self.assertEqual(kr['date'].max(), pd.Timestamp('2024-02-14'))
+
+        window = self.store.read(columns=['close'], start='2024-01-10', end='2024-01-12', markets=['US'])
+        self.assertEqual(list(window.columns), ['code', 'date', 'close'])
+        self.assertEqual(list(window['code']), ['AAPL'] * 3)
+
+        with self.assertRaises(KeyError):
+            self.store.read(columns=['unknown'])
+
+    def test_retain_export_and_schema_version(self):
+        self.store.write(pd.concat([self.make_prices('000001', 'A', '2024-01-01', 5),
+                                    self.make_prices('000002', 'B', '2024-01-01', 5)]))
+        self.assertEqual(self.store.retain(['000002'], market='KR'), 1)
+
+        path = os.path.join(self.tmp.name, 'daily_prices.csv')
+        self.assertEqual(self.store.export_csv(path), 5)
+        exported = pd.read_csv(path, dtype={'code': str})
+        self.assertEqual(list(exported.columns), ['date', 'close', 'diff', 'open', 'high', 'low', 'volume', 'code', 'name'])
+        self.assertEqual(set(exported['code']), {'000002'})
+
+        with open(os.path.join(self.root, SCHEMA_FILE), encoding='utf-8') as f:
+            registry = json.load(f)
+        registry['daily_prices']['version'] = 0
+        with open(os.path.join(self.root, SCHEMA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(registry, f)
+        with self.assertRaises(ValueError):
+            self.store.read()
+
+    def test_analyzer_reads_store_like_csv(self):
+        prices = pd.concat([self.make_prices('AAPL', 'Apple', '2024-01-01', 20, base=180.25),
+                            self.make_prices('000660', 'SK하이닉스', '2024-01-03', 20)])
+        csv_path = os.path.join(self.tmp.name, 'daily_prices.csv')
+        prices.to_csv(csv_path, index=False)
+        self.store.write(prices)
+
+        from_csv = read_typed_csv(csv_path).sort_values(['code', 'date']).reset_index(drop=True)
+        from_store = read_typed_prices(self.root)
+        for col in ['close', 'volume']:
+            np.testing.assert_array_equal(from_store[col].to_numpy(), from_csv[col].to_numpy())
+        self.assertEqual(list(from_store['code'].astype(str)), list(from_csv['code'].astype(str)))
+        self.assertIsInstance(from_store['code'].dtype, pd.CategoricalDtype)
+
+    def test_segments_and_compaction(self):
+        self.store.write(self.make_prices('005930', '삼성전자', '2024-01-01', 10))
+        before = os.path.getmtime(self.store._partition_path('KR', '005930'))
+
+        # 세그먼트 추가는 기존 파티션을 건드리지 않음
+        self.store.append_segment(self.make_prices('005930', '삼성전자', '2024-01-12', 3, base=20000.0))
+        self.store.append_segment(self.make_prices('005930', '삼성전자', '2024-01-16', 2, base=30000.0))
+        self.store.append_segment(self.make_prices('AAPL', 'Apple', '2024-01-01', 5, base=180.5))
+        # 쓰다 중단된 임시 파일은 세그먼트로 취급하지 않음
+        with open(os.path.join(self.root, '_segments', '.partial.parquet.tmp'), 'wb') as f:
+            f.write(b'PAR1')
+        self.assertEqual(len(self.store.segments()), 3)
+        self.assertEqual(os.path.getmtime(self.store._partition_path('KR', '005930')), before)
+        self.assertEqual(len(self.store.read(codes=['005930'])), 10)
+        self.assertEqual(self.store.last_dates('KR')['005930'], pd.Timestamp('2024-01-17'))
+
+        self.assertEqual(self.store.compact(), 3)
+        self.assertEqual(self.store.segments(), [])
+        kr = self.store.read(codes=['005930'])
+        self.assertEqual(len(kr), 13)
+        # 겹치는 날짜(2024-01-16)는 나중 세그먼트 값
+        self.assertEqual(kr.loc[kr['date'] == '2024-01-16', 'close'].item(), 30000.0)
+        self.assertEqual(self.store.codes('US'), ['AAPL'])
+        self.assertEqual(self.store.compact(), 0)
+
+    def test_interrupted_write_leaves_no_readable_tmp(self):
+        self.store.write(self.make_prices('005930', '삼성전자', '2024-01-01', 2))
+        partition = os.path.dirname(self.store._partition_path('KR', '005930'))
+        # 이전 버전이 남긴 완성된 임시 파일과 쓰다 중단된 임시 파일
+        shutil.copy(self.store._partition_path('KR', '005930'), os.path.join(partition, 'part-0.parquet.tmp'))
+        with open(os.path.join(partition, '.part-0.parquet.123.tmp'), 'wb') as f:
+            f.write(b'PAR1')
+        self.assertEqual(len(self.store.read()), 2)
+        self.assertEqual(len(self.store.read(codes=['005930'], columns=['close'])), 2)
+
+        # 오래된 임시 파일은 compact() 가 정리
+        self.store.append_segment(self.make_prices('005930', '삼성전자', '2024-01-03', 1))
+        old = time.time() - 2 * price_store.STALE_SECONDS
+        for name in os.listdir(partition):
+            if name.endswith('.tmp'):
+                os.utime(os.path.join(partition, name), (old, old))
+        self.store.compact()
+        self.assertEqual(os.listdir(partition), ['part-0.parquet'])
+        self.assertEqual(len(self.store.read()), 3)
+
+    def test_partition_without_part_file_is_skipped(self):
+        self.store.write(self.make_prices('005930', '삼성전자', '2024-01-01', 2))
+        # 첫 write() 가 임시 파일만 남기고 중단된 종목
+        partition = os.path.dirname(self.store._partition_path('KR', '000660'))
+        os.makedirs(partition)
+        with open(os.path.join(partition, '.part-0.parquet.123.tmp'), 'wb') as f:
+            f.write(b'PAR1')
+        self.assertEqual(self.store.codes('KR'), ['005930'])
+        self.assertEqual(self.store.last_dates('KR'), {'005930': pd.Timestamp('2024-01-02')})
+        self.assertEqual(len(self.store.read()), 2)
+
+    def test_market_of(self):
+        self.assertEqual(market_of('005930'), 'KR')
+        self.assertEqual(market_of('AAPL'), 'US')
+        self.assertEqual(market_of('BRK-B'), 'US')
+
+if __name__ == '__main__':
+    unittest.main()
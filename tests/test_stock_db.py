@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stock_db import StockDB
+import data_access
+
+class TestStockDB(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = StockDB(os.path.join(self.tmp.name, 'stock_data.db'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_investor(self, code, start, periods, base=0):
+        return pd.DataFrame({'date': pd.bdate_range(start, periods=periods), 'code': code,
+                             'institution_net_buy': np.arange(periods) + base,
+                             'foreigner_net_buy': -(np.arange(periods) + base)})
+
+    def test_upsert_and_range_read(self):
+        self.db.upsert('investor_trends', pd.concat([self.make_investor('005930', '2024-01-01', 10),
+                                                     self.make_investor('000660', '2024-01-01', 10)]))
+        # 겹치는 날짜는 새 값으로 교체, 새 날짜는 추가
+        self.db.upsert('investor_trends', self.make_investor('005930', '2024-01-10', 5, base=100))
+
+        conn = self.db.connect()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        conn.close()
+
+        df = self.db.read('investor_trends', codes=['005930'])
+        self.assertEqual(len(df), 12)
+        self.assertTrue(df['date'].is_monotonic_increasing)
+        self.assertEqual(df.loc[df['date'] == '2024-01-12', 'institution_net_buy'].item(), 102)
+        self.assertTrue(pd.api.types.is_integer_dtype(df['institution_net_buy']))
+
+        window = self.db.read('investor_trends', start='2024-01-02', end='2024-01-03')
+        self.assertEqual(list(window['code']), ['000660', '000660', '005930', '005930'])
+
+        with self.assertRaises(KeyError):
+            self.db.upsert('investor_trends', pd.DataFrame({'code': ['005930']}))
+
+    def test_fundamentals_keep_missing_columns(self):
+        self.db.upsert('fundamentals', pd.DataFrame({'code': ['005930', 'AAPL'], 'name': ['삼성전자', 'Apple'],
+                                                     'PER': [12.5, np.nan], 'ROE': [np.nan, 150.0]}))
+        # DataFrame 에 없는 컬럼(name, ROE)은 기존 값 유지
+        self.db.upsert('fundamentals', pd.DataFrame({'code': ['005930'], 'PER': [11.0]}))
+        df = self.db.read('fundamentals').set_index('code')
+        self.assertEqual(df.loc['005930', 'PER'], 11.0)
+        self.assertEqual(df.loc['005930', 'name'], '삼성전자')
+        self.assertTrue(np.isnan(df.loc['AAPL', 'PER']))
+        self.assertEqual(df.loc['AAPL', 'ROE'], 150.0)
+
+    def test_facade_reads_db_like_csv(self):
+        investor = pd.concat([self.make_investor('005930', '2024-01-01', 10),
+                              self.make_investor('AAPL', '2024-01-01', 10, base=5)])
+        investor.assign(date=investor['date'].dt.strftime('%Y-%m-%d')) \
+            .to_csv(os.path.join(self.tmp.name, data_access.INVESTOR_CSV), index=False)
+        from_csv = data_access.load_investor_trends(typed=True, data_dir=self.tmp.name) \
+            .sort_values(['code', 'date']).reset_index(drop=True)
+
+        data_access.save_investor_trends(investor, data_dir=self.tmp.name)
+        from_db = data_access.load_investor_trends(typed=True, data_dir=self.tmp.name)
+        pd.testing.assert_frame_equal(from_db[from_csv.columns], from_csv, check_categorical=False)
+        self.assertIsInstance(from_db['code'].dtype, pd.CategoricalDtype)
+
+        one = data_access.load_investor_trends(codes=['AAPL'], data_dir=self.tmp.name)
+        self.assertEqual(set(one['code']), {'AAPL'})
+        self.assertTrue(data_access.load_fundamentals(data_dir=self.tmp.name).empty)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_store import PriceStore
+try:
+    import collect_us_daily_prices as us_prices
+except ImportError:  # yfinance 미설치 환경
+    us_prices = None
+
+class FakeYahoo:
+    """yf.download(group_by='ticker') 형식으로 응답 (factor 로 수정주가 변경을 흉내)"""
+    def __init__(self, end='2024-03-29'):
+        self.dates = pd.bdate_range(end=end, periods=300)
+        self.factor = {}
+        self.calls = []
+
+    def download(self, tickers, start=None, period=None, **kwargs):
+        self.calls.append((tuple(tickers), start, period))
+        # period(2y) 는 최근 300 거래일
+        dates = self.dates[-300:] if start is None else self.dates[self.dates >= pd.Timestamp(start)]
+        frames = {}
+        for ticker in tickers:
+            base = 100.0 * (1 + sorted(['AAPL', 'MSFT', 'NVDA']).index(ticker))
+            close = (base + np.arange(len(self.dates)))[-len(dates):] * self.factor.get(ticker, 1.0)
+            frames[ticker] = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1,
+                                           'Close': close, 'Volume': 1000}, index=pd.Index(dates, name='Date'))
+        return pd.concat(frames, axis=1)
+
+@unittest.skipIf(us_prices is None, "yfinance not installed")
+class TestUSDailyPrices(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        pd.DataFrame({'ticker': ['AAPL', 'MSFT', 'NVDA'], 'name': ['Apple', 'Microsoft', 'NVIDIA']}) \
+            .to_csv('us_stocks_list.csv', index=False)
+        self.yahoo = FakeYahoo()
+        patcher = mock.patch.object(us_prices.yf, 'download', self.yahoo.download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batched_full_then_incremental(self):
+        with mock.patch.object(us_prices, 'BATCH_SIZE', 2):
+            us_prices.collect_us_prices()
+            # 3개 티커를 2개씩 묶어 2번 요청
+            self.assertEqual(self.yahoo.calls, [(('AAPL', 'MSFT'), None, '2y'), (('NVDA',), None, '2y')])
+            self.assertEqual(len(PriceStore().read(codes=['NVDA'])), 300)
+
+            # 새 거래일 추가: 마지막 저장일 OVERLAP 전부터만 요청
+            self.yahoo.dates = pd.bdate_range(end='2024-04-02', periods=302)
+            self.yahoo.calls.clear()
+            us_prices.collect_us_prices()
+        self.assertEqual([start for _, start, _ in self.yahoo.calls], ['2024-03-22', '2024-03-22'])
+        aapl = PriceStore().read(codes=['AAPL'])
+        self.assertEqual(aapl['date'].max(), pd.Timestamp('2024-04-02'))
+        self.assertEqual(aapl['name'].iloc[-1], 'Apple')
+        self.assertFalse(aapl['date'].duplicated().any())
+
+    def test_refetches_history_when_adjusted_prices_change(self):
+        us_prices.collect_us_prices()
+        # MSFT 분할: 과거 수정주가가 모두 바뀜
+        self.yahoo.factor['MSFT'] = 0.5
+        self.yahoo.calls.clear()
+        us_prices.collect_us_prices()
+        # 저장된 첫 날짜부터 다시 받음
+        self.assertEqual(self.yahoo.calls[-1], (('MSFT',), self.yahoo.dates[0].strftime('%Y-%m-%d'), None))
+        msft = PriceStore().read(codes=['MSFT'])
+        self.assertEqual(msft['close'].iloc[0], 200.0 * 0.5)
+
+    def test_adjusted_refetch_replaces_history_longer_than_period(self):
+        # 저장된 MSFT 시세가 HISTORY_PERIOD 보다 긴 경우 (2y 이전 100 거래일이 더 있음)
+        self.yahoo.dates = pd.bdate_range(end='2024-03-29', periods=400)
+        us_prices.collect_us_prices()
+        store = PriceStore()
+        older = self.yahoo.download(['MSFT'], start=self.yahoo.dates[0])['MSFT'].iloc[:100]
+        store.write(pd.DataFrame({'date': older.index, 'close': older['Close'].to_numpy(), 'code': 'MSFT'}),
+                    market='US')
+        self.assertEqual(len(store.read(codes=['MSFT'])), 400)
+
+        self.yahoo.factor['MSFT'] = 0.5
+        self.yahoo.calls.clear()
+        us_prices.collect_us_prices()
+        self.assertEqual(self.yahoo.calls[-1], (('MSFT',), self.yahoo.dates[0].strftime('%Y-%m-%d'), None))
+        msft = store.read(codes=['MSFT'])
+        self.assertEqual(len(msft), 400)
+        # 전체 기간이 같은 수정주가 기준 (중간에 끊기는 가짜 급락 없음)
+        np.testing.assert_allclose(np.diff(msft['close'].to_numpy()), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
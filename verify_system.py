@@ -5,6 +5,8 @@ import sys
 # Add dashboard directory to path to import utils
 sys.path.append(os.path.join(os.getcwd(), 'dashboard'))
 from utils import load_analysis_results, load_daily_prices, load_ai_report
+from price_store import PriceStore
+from stock_db import StockDB
 
 def check_file_exists(filepath, description):
     if os.path.exists(filepath):
@@ -52,12 +54,14 @@ def main():
     
     # 1. File Existence Checks
     files_to_check = [
-        ('daily_prices.csv', 'Daily Prices Data'),
-        ('all_institutional_trend_data.csv', 'Institutional Trend Data'),
+        # 가격 저장소가 없으면 기존 CSV 확인
+        ('price_store/_schema.json' if PriceStore().exists() else 'daily_prices.csv', 'Daily Prices Data'),
+        # 수급/재무 데이터는 SQLite 저장소가 없으면 기존 CSV 확인
+        *([('stock_data.db', 'Investor/Fundamental Database')] if StockDB().exists() else
+          [('all_institutional_trend_data.csv', 'Institutional Trend Data'), ('fundamentals.csv', 'Fundamental Data')]),
         ('wave_transition_analysis_results.csv', 'Analysis Results'),
         ('korean_stocks_list.csv', 'Stock List'),
         ('us_stocks_list.csv', 'US Stock List'),
-        ('fundamentals.csv', 'Fundamental Data'),
         ('.env', 'Environment Variables')
     ]
     